@@ -10,9 +10,6 @@ import pyaudio
 import PIL.Image
 import mss
 import argparse
-import math
-import struct
-import time
 
 from google import genai
 from google.genai import types
@@ -23,6 +20,12 @@ if sys.version_info < (3, 11, 0):
     asyncio.ExceptionGroup = exceptiongroup.ExceptionGroup
 
 from tools import tools_list
+from audio_vad import VadStateMachine, create_detector
+from audio_io import CaptureEngine, PlaybackEngine
+from executors import REALTIME_AUDIO, VISION, run_in
+from cad_runner import CadJobCancelled
+from cad_params import ParameterError
+from mesh_tools import describe as describe_mesh
 
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
@@ -180,7 +183,30 @@ iterate_cad_tool = {
     "behavior": "NON_BLOCKING"
 }
 
-tools = [{'google_search': {}}, {"function_declarations": [generate_cad, run_web_agent, create_project_tool, switch_project_tool, list_projects_tool, list_smart_devices_tool, control_light_tool, discover_printers_tool, print_stl_tool, get_print_status_tool, iterate_cad_tool] + tools_list[0]['function_declarations'][1:]}]
+set_cad_parameters_tool = {
+    "name": "set_cad_parameters",
+    "description": "Changes named numeric parameters of the current CAD design (e.g. 'num_teeth' to 24, 'wall_thickness' to 2.5) and rebuilds it in about a second. Prefer this over iterate_cad when the user only asks to change a listed dimension or count.",
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "parameters": {
+                "type": "ARRAY",
+                "description": "The parameters to change.",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "name": {"type": "STRING", "description": "Parameter name, as listed for the current design."},
+                        "value": {"type": "NUMBER", "description": "The new value."}
+                    },
+                    "required": ["name", "value"]
+                }
+            }
+        },
+        "required": ["parameters"]
+    }
+}
+
+tools = [{'google_search': {}}, {"function_declarations": [generate_cad, run_web_agent, create_project_tool, switch_project_tool, list_projects_tool, list_smart_devices_tool, control_light_tool, discover_printers_tool, print_stl_tool, get_print_status_tool, iterate_cad_tool, set_cad_parameters_tool] + tools_list[0]['function_declarations'][1:]}]
 
 # --- CONFIG UPDATE: Enabled Transcription ---
 config = types.LiveConnectConfig(
@@ -211,9 +237,11 @@ from kasa_agent import KasaAgent
 from printer_agent import PrinterAgent
 
 class AudioLoop:
-    def __init__(self, video_mode=DEFAULT_MODE, on_audio_data=None, on_video_frame=None, on_cad_data=None, on_web_data=None, on_transcription=None, on_tool_confirmation=None, on_cad_status=None, on_cad_thought=None, on_project_update=None, on_device_update=None, on_error=None, input_device_index=None, input_device_name=None, output_device_index=None, kasa_agent=None):
+    def __init__(self, video_mode=DEFAULT_MODE, on_audio_data=None, on_video_frame=None, on_cad_data=None, on_web_data=None, on_transcription=None, on_tool_confirmation=None, on_cad_status=None, on_cad_thought=None, on_project_update=None, on_device_update=None, on_error=None, input_device_index=None, input_device_name=None, output_device_index=None, kasa_agent=None, vad_detector="energy", vad_options=None, on_audio_levels=None, audio_analyzer=None, playback_jitter_ms=60, playback_buffer_seconds=30, capture_mode="callback", capture_chunk_size=CHUNK_SIZE, capture_latency_ms=20, capture_overflow="drop_oldest", cad_candidates=1, cad_budget_s=180):
         self.video_mode = video_mode
         self.on_audio_data = on_audio_data
+        self.on_audio_levels = on_audio_levels
+        self.audio_analyzer = audio_analyzer # Optional AudioAnalyzer: emit levels instead of raw PCM
         self.on_video_frame = on_video_frame
         self.on_cad_data = on_cad_data
         self.on_web_data = on_web_data
@@ -228,7 +256,14 @@ class AudioLoop:
         self.input_device_name = input_device_name
         self.output_device_index = output_device_index
 
-        self.audio_in_queue = None
+        self.playback = None # PlaybackEngine, created per session in run()
+        self.playback_jitter_ms = playback_jitter_ms
+        self.playback_buffer_seconds = playback_buffer_seconds
+        self.capture = None # CaptureEngine, created per session in listen_audio() when capture_mode == "callback"
+        self.capture_mode = capture_mode # "callback" or "blocking" (legacy stream.read in a worker thread)
+        self.capture_chunk_size = capture_chunk_size
+        self.capture_latency_ms = capture_latency_ms
+        self.capture_overflow = capture_overflow
         self.out_queue = None
         self.paused = False
 
@@ -238,7 +273,6 @@ class AudioLoop:
         self._last_input_transcription = ""
         self._last_output_transcription = ""
 
-        self.audio_in_queue = None
         self.out_queue = None
         self.paused = False
 
@@ -253,7 +287,8 @@ class AudioLoop:
             if self.on_cad_status:
                 self.on_cad_status(status_info)
         
-        self.cad_agent = CadAgent(on_thought=handle_cad_thought, on_status=handle_cad_status)
+        self.cad_agent = CadAgent(on_thought=handle_cad_thought, on_status=handle_cad_status,
+                                  speculative_candidates=cad_candidates, speculative_budget=cad_budget_s)
         self.web_agent = WebAgent()
         self.kasa_agent = kasa_agent if kasa_agent else KasaAgent()
         self.printer_agent = PrinterAgent()
@@ -265,12 +300,15 @@ class AudioLoop:
         
         self.permissions = {} # Default Empty (Will treat unset as True)
         self._pending_confirmations = {}
+        self.cad_task = None # Current CAD generation/iteration; cancelling it kills the running script
 
         # Video buffering state
         self._latest_image_payload = None
-        # VAD State
-        self._is_speaking = False
-        self._silence_start_time = None
+        # VAD State (detector + hangover state machine, see audio_vad.py)
+        self.vad = VadStateMachine(
+            detector=create_detector(vad_detector, **(vad_options or {})),
+            hangover=0.5 # Seconds of silence to consider "done speaking"
+        )
         
         # Initialize ProjectManager
         from project_manager import ProjectManager
@@ -306,6 +344,44 @@ class AudioLoop:
 
     def stop(self):
         self.stop_event.set()
+        self.cancel_cad()
+        self.cad_agent.close()
+        try:
+            # Release the printer HTTP pool; stop() is called from the server's event loop
+            asyncio.get_running_loop().create_task(self.printer_agent.close())
+        except RuntimeError:
+            pass
+
+    def cancel_cad(self):
+        """Cancel the running CAD job, if any. Its build123d script process is killed."""
+        if self.cad_task and not self.cad_task.done():
+            print("[ADA DEBUG] [CAD] Cancelling running CAD job.")
+            self.cad_task.cancel()
+            if self.on_cad_status:
+                self.on_cad_status({"status": "cancelled"})
+            return True
+        return False
+
+    async def run_cad_job(self, coro):
+        """
+        Runs a CadAgent coroutine as the current CAD job, cancelling any job already running.
+        Raises CadJobCancelled if the job is cancelled via cancel_cad() or superseded.
+        """
+        self.cancel_cad()
+        task = asyncio.ensure_future(coro)
+        self.cad_task = task
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            # The caller itself was cancelled: take the job down with it
+            task.cancel()
+            raise
+        finally:
+            if self.cad_task is task:
+                self.cad_task = None
+        if task.cancelled():
+            raise CadJobCancelled()
+        return task.result()
         
     def resolve_tool_confirmation(self, request_id, confirmed):
         print(f"[ADA DEBUG] [RESOLVE] resolve_tool_confirmation called. ID: {request_id}, Confirmed: {confirmed}")
@@ -320,14 +396,14 @@ class AudioLoop:
             print(f"[ADA DEBUG] [WARN] Confirmation Request {request_id} not found in pending dict. Keys: {list(self._pending_confirmations.keys())}")
 
     def clear_audio_queue(self):
-        """Clears the queue of pending audio chunks to stop playback immediately."""
+        """Flushes pending model audio from the playback ring buffer to stop playback immediately."""
         try:
-            count = 0
-            while not self.audio_in_queue.empty():
-                self.audio_in_queue.get_nowait()
-                count += 1
-            if count > 0:
-                print(f"[ADA DEBUG] [AUDIO] Cleared {count} chunks from playback queue due to interruption.")
+            if not self.playback:
+                return
+            buffered_ms = self.playback.buffered_ms
+            dropped = self.playback.flush()
+            if dropped > 0:
+                print(f"[ADA DEBUG] [AUDIO] Flushed {dropped} bytes ({buffered_ms:.0f} ms) from playback buffer due to interruption.")
         except Exception as e:
             print(f"[ADA DEBUG] [ERR] Failed to clear audio queue: {e}")
 
@@ -345,7 +421,10 @@ class AudioLoop:
     async def send_realtime(self):
         while True:
             msg = await self.out_queue.get()
+            captured_at = msg.pop("_captured_at", None)
             await self.session.send(input=msg, end_of_turn=False)
+            if captured_at is not None and self.capture:
+                self.capture.record_latency(captured_at)
 
     async def listen_audio(self):
         mic_info = pya.get_default_input_device_info()
@@ -390,15 +469,52 @@ class AudioLoop:
         if resolved_input_device_index is None:
              print("[ADA] Using Default Input Device")
 
+        input_device_index = resolved_input_device_index if resolved_input_device_index is not None else mic_info["index"]
+        if self.capture_mode == "callback":
+            await self._listen_audio_callback(input_device_index)
+        else:
+            await self._listen_audio_blocking(input_device_index)
+
+    async def _listen_audio_callback(self, input_device_index):
+        # PyAudio's callback writes into a ring on the audio thread and wakes us when a chunk is ready,
+        # so capture never occupies the default executor.
+        self.capture = CaptureEngine(
+            pya,
+            SEND_SAMPLE_RATE,
+            channels=CHANNELS,
+            chunk_size=self.capture_chunk_size,
+            latency_ms=self.capture_latency_ms,
+            overflow=self.capture_overflow
+        )
         try:
-            self.audio_stream = await asyncio.to_thread(
+            await run_in(REALTIME_AUDIO, self.capture.start, input_device_index, asyncio.get_running_loop())
+        except OSError as e:
+            print(f"[ADA] [ERR] Failed to open audio input stream: {e}")
+            print("[ADA] [WARN] Audio features will be disabled. Please check microphone permissions.")
+            self.capture = None
+            return
+
+        while True:
+            try:
+                data, captured_at = await self.capture.read()
+                if self.paused:
+                    continue
+                await self._handle_mic_chunk(data, captured_at)
+            except Exception as e:
+                print(f"Error reading audio: {e}")
+                await asyncio.sleep(0.1)
+
+    async def _listen_audio_blocking(self, input_device_index):
+        try:
+            self.audio_stream = await run_in(
+                REALTIME_AUDIO,
                 pya.open,
                 format=FORMAT,
                 channels=CHANNELS,
                 rate=SEND_SAMPLE_RATE,
                 input=True,
-                input_device_index=resolved_input_device_index if resolved_input_device_index is not None else mic_info["index"],
-                frames_per_buffer=CHUNK_SIZE,
+                input_device_index=input_device_index,
+                frames_per_buffer=self.capture_chunk_size,
             )
         except OSError as e:
             print(f"[ADA] [ERR] Failed to open audio input stream: {e}")
@@ -410,64 +526,55 @@ class AudioLoop:
         else:
             kwargs = {}
         
-        # VAD Constants
-        VAD_THRESHOLD = 800 # Adj based on mic sensitivity (800 is conservative for 16-bit)
-        SILENCE_DURATION = 0.5 # Seconds of silence to consider "done speaking"
-        
         while True:
             if self.paused:
                 await asyncio.sleep(0.1)
                 continue
 
             try:
-                data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
-                
-                # 1. Send Audio
-                if self.out_queue:
-                    await self.out_queue.put({"data": data, "mime_type": "audio/pcm"})
-                
-                # 2. VAD Logic for Video
-                # rms = audioop.rms(data, 2)
-                # Replacement for audioop.rms(data, 2)
-                count = len(data) // 2
-                if count > 0:
-                    shorts = struct.unpack(f"<{count}h", data)
-                    sum_squares = sum(s**2 for s in shorts)
-                    rms = int(math.sqrt(sum_squares / count))
-                else:
-                    rms = 0
-                
-                if rms > VAD_THRESHOLD:
-                    # Speech Detected
-                    self._silence_start_time = None
-                    
-                    if not self._is_speaking:
-                        # NEW Speech Utterance Started
-                        self._is_speaking = True
-                        print(f"[ADA DEBUG] [VAD] Speech Detected (RMS: {rms}). Sending Video Frame.")
-                        
-                        # Send ONE frame
-                        if self._latest_image_payload and self.out_queue:
-                            await self.out_queue.put(self._latest_image_payload)
-                        else:
-                            print(f"[ADA DEBUG] [VAD] No video frame available to send.")
-                            
-                else:
-                    # Silence
-                    if self._is_speaking:
-                        if self._silence_start_time is None:
-                            self._silence_start_time = time.time()
-                        
-                        elif time.time() - self._silence_start_time > SILENCE_DURATION:
-                            # Silence confirmed, reset state
-                            print(f"[ADA DEBUG] [VAD] Silence detected. Resetting speech state.")
-                            self._is_speaking = False
-                            self._silence_start_time = None
-
+                data = await run_in(REALTIME_AUDIO, self.audio_stream.read, self.capture_chunk_size, **kwargs)
+                await self._handle_mic_chunk(data)
             except Exception as e:
                 print(f"Error reading audio: {e}")
                 await asyncio.sleep(0.1)
 
+    async def _handle_mic_chunk(self, data, captured_at=None):
+        # 1. Send Audio
+        if self.out_queue:
+            msg = {"data": data, "mime_type": "audio/pcm"}
+            if captured_at is not None:
+                msg["_captured_at"] = captured_at
+            await self.out_queue.put(msg)
+        
+        # 2. VAD Logic for Video
+        vad_event = self.vad.process(data)
+        
+        if vad_event == VadStateMachine.SPEECH_START:
+            # NEW Speech Utterance Started
+            print(f"[ADA DEBUG] [VAD] Speech Detected (RMS: {int(self.vad.level)}). Sending Video Frame.")
+            
+            # Send ONE frame
+            if self._latest_image_payload and self.out_queue:
+                await self.out_queue.put(self._latest_image_payload)
+            else:
+                print(f"[ADA DEBUG] [VAD] No video frame available to send.")
+        
+        elif vad_event == VadStateMachine.SPEECH_END:
+            # Silence confirmed
+            print(f"[ADA DEBUG] [VAD] Silence detected. Resetting speech state.")
+
+    async def describe_cad_parameters(self, cad_output_dir):
+        """One line per adjustable parameter of the current design, for the model's context."""
+        try:
+            params = await self.cad_agent.get_parameters(cad_output_dir)
+        except Exception as e:
+            print(f"[ADA DEBUG] [WARN] Could not read CAD parameters: {e}")
+            return ""
+        if not params:
+            return ""
+        lines = [f"- {p['name']} = {p['value']} ({p['type']})" + (f"  # {p['comment']}" if p['comment'] else "") for p in params]
+        return "Adjustable parameters (change them with set_cad_parameters):\n" + "\n".join(lines)
+
     async def handle_cad_request(self, prompt):
         print(f"[ADA DEBUG] [CAD] Background Task Started: handle_cad_request('{prompt}')")
         if self.on_cad_status:
@@ -495,11 +602,17 @@ class AudioLoop:
         cad_output_dir = str(self.project_manager.get_current_project_path() / "cad")
         
         # Call the secondary agent with project path
-        cad_data = await self.cad_agent.generate_prototype(prompt, output_dir=cad_output_dir)
+        try:
+            cad_data = await self.run_cad_job(self.cad_agent.generate_prototype(prompt, output_dir=cad_output_dir))
+        except CadJobCancelled:
+            print(f"[ADA DEBUG] [CAD] Generation cancelled: '{prompt}'")
+            return
         
         if cad_data:
             print(f"[ADA DEBUG] [OK] CadAgent returned data successfully.")
-            print(f"[ADA DEBUG] [INFO] Data Check: {len(cad_data.get('vertices', []))} vertices, {len(cad_data.get('edges', []))} edges.")
+            mesh = cad_data.get('mesh')
+            if mesh:
+                print(f"[ADA DEBUG] [INFO] Mesh: {mesh['triangles']} triangles, watertight={mesh.get('watertight')}")
             
             if self.on_cad_data:
                 print(f"[ADA DEBUG] [SEND] Dispatching data to frontend callback...")
@@ -515,6 +628,11 @@ class AudioLoop:
 
             # Notify the model that the task is done - this triggers speech about completion
             completion_msg = "System Notification: CAD generation is complete! The 3D model is now displayed for the user. Let them know it's ready."
+            if mesh:
+                completion_msg += "\n" + describe_mesh(mesh)
+            param_table = await self.describe_cad_parameters(cad_output_dir)
+            if param_table:
+                completion_msg += "\n" + param_table
             try:
                 await self.session.send(input=completion_msg, end_of_turn=True)
                 print(f"[ADA DEBUG] [NOTE] Sent completion notification to model.")
@@ -645,11 +763,15 @@ class AudioLoop:
                 async for response in turn:
                     # 1. Handle Audio Data
                     if data := response.data:
-                        self.audio_in_queue.put_nowait(data)
+                        self.playback.feed(data)
                         # NOTE: 'continue' removed here to allow processing transcription/tools in same packet
 
                     # 2. Handle Transcription (User & Model)
                     if response.server_content:
+                        # Barge-in: server cancelled the rest of the model turn
+                        if response.server_content.interrupted:
+                            self.clear_audio_queue()
+
                         if response.server_content.input_transcription:
                             transcript = response.server_content.input_transcription.text
                             if transcript:
@@ -718,7 +840,7 @@ class AudioLoop:
                         print("The tool was called")
                         function_responses = []
                         for fc in response.tool_call.function_calls:
-                            if fc.name in ["generate_cad", "run_web_agent", "write_file", "read_directory", "read_file", "create_project", "switch_project", "list_projects", "list_smart_devices", "control_light", "discover_printers", "print_stl", "get_print_status", "iterate_cad"]:
+                            if fc.name in ["generate_cad", "run_web_agent", "write_file", "read_directory", "read_file", "create_project", "switch_project", "list_projects", "list_smart_devices", "control_light", "discover_printers", "print_stl", "get_print_status", "iterate_cad", "set_cad_parameters"]:
                                 prompt = fc.args.get("prompt", "") # Prompt is not present for all tools
                                 
                                 # Check Permissions (Default to True if not set)
@@ -1003,7 +1125,8 @@ class AudioLoop:
 
                                 elif fc.name == "discover_printers":
                                     print(f"[ADA DEBUG] [TOOL] Tool Call: 'discover_printers'")
-                                    printers = await self.printer_agent.discover_printers()
+                                    # Answer once the network goes quiet after the first hit instead of waiting out the browse window
+                                    printers = await self.printer_agent.discover_printers(settle=1.0)
                                     # Format for model
                                     if printers:
                                         printer_list = []
@@ -1049,7 +1172,8 @@ class AudioLoop:
                                     printer = fc.args["printer"]
                                     print(f"[ADA DEBUG] [TOOL] Tool Call: 'get_print_status' Printer='{printer}'")
                                     
-                                    status = await self.printer_agent.get_print_status(printer)
+                                    # Asked by the user: query the printer even while its polls are backing off
+                                    status = await self.printer_agent.get_print_status(printer, force=True)
                                     if status:
                                         result_str = f"Printer: {status.printer}\n"
                                         result_str += f"State: {status.state}\n"
@@ -1086,7 +1210,11 @@ class AudioLoop:
                                     cad_output_dir = str(self.project_manager.get_current_project_path() / "cad")
                                     
                                     # Call CadAgent to iterate on the design
-                                    cad_data = await self.cad_agent.iterate_prototype(prompt, output_dir=cad_output_dir)
+                                    try:
+                                        cad_data = await self.run_cad_job(self.cad_agent.iterate_prototype(prompt, output_dir=cad_output_dir))
+                                    except CadJobCancelled:
+                                        print(f"[ADA DEBUG] [CAD] Iteration cancelled: '{prompt}'")
+                                        cad_data = None
                                     
                                     if cad_data:
                                         print(f"[ADA DEBUG] [OK] CadAgent iteration returned data successfully.")
@@ -1101,10 +1229,43 @@ class AudioLoop:
                                         self.project_manager.save_cad_artifact("output.stl", f"Iteration: {prompt}")
                                         
                                         result_str = f"Successfully iterated design: {prompt}. The updated 3D model is now displayed."
+                                        if cad_data.get("mesh"):
+                                            result_str += "\n" + describe_mesh(cad_data["mesh"])
+                                        if cad_data.get("diff"):
+                                            diff = cad_data["diff"]
+                                            if len(diff) > 2000:
+                                                diff = diff[:2000] + "\n... (diff truncated)"
+                                            result_str += "\nChanges:\n" + diff
+                                        param_table = await self.describe_cad_parameters(cad_output_dir)
+                                        if param_table:
+                                            result_str += "\n" + param_table
                                     else:
                                         print(f"[ADA DEBUG] [ERR] CadAgent iteration returned None.")
                                         result_str = f"Failed to iterate design with prompt: {prompt}"
                                     
+                                    function_response = types.FunctionResponse(
+                                        id=fc.id, name=fc.name, response={"result": result_str}
+                                    )
+                                    function_responses.append(function_response)
+                                elif fc.name == "set_cad_parameters":
+                                    updates = {p["name"]: p["value"] for p in fc.args.get("parameters", [])}
+                                    print(f"[ADA DEBUG] [TOOL] Tool Call: 'set_cad_parameters' {updates}")
+                                    cad_output_dir = str(self.project_manager.get_current_project_path() / "cad")
+
+                                    try:
+                                        cad_data = await self.run_cad_job(self.cad_agent.set_parameters(updates, cad_output_dir))
+                                        if self.on_cad_data:
+                                            self.on_cad_data(cad_data)
+                                        summary = ", ".join(f"{name}={value}" for name, value in updates.items())
+                                        self.project_manager.save_cad_artifact(cad_data["file_path"], f"Set {summary}")
+                                        result_str = f"Rebuilt the design with {summary}. The updated 3D model is now displayed."
+                                        if cad_data.get("mesh"):
+                                            result_str += "\n" + describe_mesh(cad_data["mesh"])
+                                    except CadJobCancelled:
+                                        result_str = "Parameter change was cancelled."
+                                    except ParameterError as e:
+                                        result_str = f"Could not change parameters: {e}"
+
                                     function_response = types.FunctionResponse(
                                         id=fc.id, name=fc.name, response={"result": result_str}
                                     )
@@ -1114,9 +1275,6 @@ class AudioLoop:
                 
                 # Turn/Response Loop Finished
                 self.flush_chat()
-
-                while not self.audio_in_queue.empty():
-                    self.audio_in_queue.get_nowait()
         except Exception as e:
             print(f"Error in receive_audio: {e}")
             traceback.print_exc()
@@ -1124,27 +1282,34 @@ class AudioLoop:
             raise e
 
     async def play_audio(self):
-        stream = await asyncio.to_thread(
-            pya.open,
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RECEIVE_SAMPLE_RATE,
-            output=True,
-            output_device_index=self.output_device_index,
-        )
-        while True:
-            bytestream = await self.audio_in_queue.get()
-            if self.on_audio_data:
-                self.on_audio_data(bytestream)
-            await asyncio.to_thread(stream.write, bytestream)
+        # Output runs in PyAudio callback mode, draining self.playback's ring buffer on the audio thread.
+        # This task only forwards audio that was actually played to the visualizer callbacks.
+        await run_in(REALTIME_AUDIO, self.playback.start, self.output_device_index)
+        try:
+            while True:
+                await asyncio.sleep(1 / 30)
+                tap = self.playback.tap
+                if not tap:
+                    continue
+                chunks = []
+                while tap:
+                    chunks.append(tap.popleft())
+                bytestream = b"".join(chunks)
+                if self.on_audio_data:
+                    self.on_audio_data(bytestream)
+                if self.audio_analyzer and self.on_audio_levels:
+                    # Reduce the chunk to a few dozen levels once, here, instead of shipping PCM to the UI
+                    self.on_audio_levels(self.audio_analyzer.analyze(bytestream))
+        finally:
+            self.playback.close()
 
     async def get_frames(self):
-        cap = await asyncio.to_thread(cv2.VideoCapture, 0, cv2.CAP_AVFOUNDATION)
+        cap = await run_in(VISION, cv2.VideoCapture, 0, cv2.CAP_AVFOUNDATION)
         while True:
             if self.paused:
                 await asyncio.sleep(0.1)
                 continue
-            frame = await asyncio.to_thread(self._get_frame, cap)
+            frame = await run_in(VISION, self._get_frame, cap)
             if frame is None:
                 break
             await asyncio.sleep(1.0)
@@ -1173,6 +1338,9 @@ class AudioLoop:
     async def run(self, start_message=None):
         retry_delay = 1
         is_reconnect = False
+
+        # Pay the build123d import now, in the background, rather than on the first CAD request
+        asyncio.create_task(self.cad_agent.warm_up())
         
         while not self.stop_event.is_set():
             try:
@@ -1183,7 +1351,13 @@ class AudioLoop:
                 ):
                     self.session = session
 
-                    self.audio_in_queue = asyncio.Queue()
+                    self.playback = PlaybackEngine(
+                        pya,
+                        RECEIVE_SAMPLE_RATE,
+                        channels=CHANNELS,
+                        buffer_seconds=self.playback_buffer_seconds,
+                        jitter_target_ms=self.playback_jitter_ms
+                    )
                     self.out_queue = asyncio.Queue(maxsize=10)
 
                     tg.create_task(self.send_realtime())
@@ -1264,6 +1438,8 @@ class AudioLoop:
                         self.audio_stream.close()
                     except: 
                         pass
+                if self.capture:
+                    self.capture.close()
 
 def get_input_devices():
     p = pyaudio.PyAudio()
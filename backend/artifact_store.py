@@ -0,0 +1,190 @@
+"""
+ArtifactStore - Serves generated files (STL meshes, ...) to the UI over HTTP.
+
+Instead of base64-encoding a mesh into the `cad_data` Socket.IO event, the
+file is registered here and the event carries only a handle:
+
+    {"format": "stl", "artifact_id": "...", "url": "/artifacts/...", "size": ..., "etag": "..."}
+
+The frontend then fetches the bytes from GET /artifacts/{artifact_id}, which
+supports ETag / If-None-Match (304) and single byte-range requests (206).
+Ids are random tokens, so only registered files can be read.
+"""
+
+import collections
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, Response
+
+from executors import FILE_IO, run_in
+
+MIME_TYPES = {
+    ".stl": "model/stl",
+    ".gcode": "text/x-gcode",
+    ".3mf": "model/3mf",
+    ".py": "text/x-python",
+}
+
+# The UI is served from a different origin than the backend
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Expose-Headers": "ETag, Content-Range, Accept-Ranges, Content-Length",
+}
+
+
+@dataclass
+class Artifact:
+    artifact_id: str
+    path: str
+    filename: str
+    mime_type: str
+    size: int
+    etag: str
+    created: float
+
+    def to_handle(self, **extra) -> Dict:
+        """The metadata sent to the frontend in place of the file contents."""
+        handle = {
+            "artifact_id": self.artifact_id,
+            "url": f"/artifacts/{self.artifact_id}",
+            "filename": self.filename,
+            "mime_type": self.mime_type,
+            "size": self.size,
+            "etag": self.etag,
+        }
+        handle.update(extra)
+        return handle
+
+
+def _etag_for(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single "bytes=" range into inclusive (start, end).
+    Returns None for headers this server ignores (multiple ranges, other units)
+    and raises ValueError for unsatisfiable ranges.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    spec = header[len("bytes="):].strip()
+    start_s, _, end_s = spec.partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        raise ValueError(f"Malformed range '{header}'")
+    if start >= size or end < start:
+        raise ValueError(f"Range '{header}' not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+class ArtifactStore:
+    """In-memory registry of served files. Keeps the `max_entries` most recent registrations."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._artifacts: "collections.OrderedDict[str, Artifact]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        # Stats
+        self.requests = 0
+        self.not_modified = 0
+        self.partial = 0
+        self.bytes_served = 0
+
+    def register(self, path: str, mime_type: Optional[str] = None, filename: Optional[str] = None) -> Artifact:
+        st = os.stat(path)
+        ext = os.path.splitext(path)[1].lower()
+        artifact = Artifact(
+            artifact_id=secrets.token_urlsafe(12),
+            path=os.path.abspath(path),
+            filename=filename or os.path.basename(path),
+            mime_type=mime_type or MIME_TYPES.get(ext, "application/octet-stream"),
+            size=st.st_size,
+            etag=_etag_for(st),
+            created=time.time(),
+        )
+        with self._lock:
+            self._artifacts[artifact.artifact_id] = artifact
+            while len(self._artifacts) > self.max_entries:
+                self._artifacts.popitem(last=False)
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        with self._lock:
+            return self._artifacts.get(artifact_id)
+
+    async def respond(self, artifact_id: str, request: Request) -> Response:
+        self.requests += 1
+        artifact = self.get(artifact_id)
+        if artifact is None:
+            return Response(status_code=404, headers=CORS_HEADERS)
+        try:
+            st = await run_in(FILE_IO, os.stat, artifact.path)
+        except OSError:
+            return Response(status_code=404, headers=CORS_HEADERS)
+
+        # The file may have been rewritten since registration; the ETag follows the file
+        etag = _etag_for(st)
+        size = st.st_size
+        headers = {**CORS_HEADERS, "ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                body = await run_in(FILE_IO, self._read_range, artifact.path, start, end - start + 1)
+                self.partial += 1
+                self.bytes_served += len(body)
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                return Response(content=body, status_code=206, media_type=artifact.mime_type, headers=headers)
+
+        self.bytes_served += size
+        return FileResponse(artifact.path, media_type=artifact.mime_type, headers=headers, stat_result=st)
+
+    @staticmethod
+    def _read_range(path: str, offset: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            registered = len(self._artifacts)
+        return {
+            "registered": registered,
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "partial": self.partial,
+            "bytes_served": self.bytes_served,
+        }
+
+
+def add_artifact_routes(app: FastAPI, store: ArtifactStore):
+    @app.get("/artifacts/{artifact_id}")
+    async def get_artifact(artifact_id: str, request: Request):
+        return await store.respond(artifact_id, request)
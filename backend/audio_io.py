@@ -0,0 +1,384 @@
+"""
+Audio I/O engines for AudioLoop.
+
+PcmRingBuffer: fixed-capacity, pre-allocated byte ring for one producer and
+one consumer thread. Positions are monotonically increasing counters and each
+side only writes its own counter, so no lock is needed under the GIL.
+
+PlaybackEngine: model audio playback. receive_audio() feeds PCM into the ring;
+a PyAudio callback-mode stream drains it on the audio thread, so there is no
+thread-pool hop per chunk. Playback waits for a jitter target before starting
+(and again after an underrun), and flush() drops all queued audio in O(1).
+
+CaptureEngine: microphone capture. A PyAudio callback-mode stream writes into
+the ring on the audio thread and wakes the asyncio side with
+loop.call_soon_threadsafe once a full send chunk is available.
+"""
+
+import asyncio
+import collections
+import time
+from typing import Deque, Dict, Optional, Tuple
+
+
+class PcmRingBuffer:
+    """
+    Single-producer / single-consumer byte ring.
+
+    write() is called only by the producer and read_into() only by the
+    consumer. flush() may be called from the producer side: it records the
+    flush point and the consumer applies it on its next read.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Ring capacity must be positive")
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._flush_pos = 0
+
+        # Counters
+        self.overruns = 0          # write() calls that could not fit all data
+        self.bytes_dropped = 0     # bytes lost to overruns
+
+    @property
+    def available(self) -> int:
+        """Bytes ready to read."""
+        return self._write_pos - max(self._read_pos, self._flush_pos)
+
+    @property
+    def free(self) -> int:
+        return self.capacity - (self._write_pos - max(self._read_pos, self._flush_pos))
+
+    def write(self, data) -> int:
+        """Copy as much of `data` as fits. Returns the number of bytes written."""
+        src = memoryview(data).cast("B")
+        n = min(len(src), self.free)
+        if n < len(src):
+            self.overruns += 1
+            self.bytes_dropped += len(src) - n
+        if n == 0:
+            return 0
+        start = self._write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = src[:first]
+        if first < n:
+            self._view[0:n - first] = src[first:n]
+        # Publish only after the bytes are in place
+        self._write_pos += n
+        return n
+
+    def read_into(self, out) -> int:
+        """Fill `out` (writable buffer) with up to len(out) bytes. Returns bytes read."""
+        if self._flush_pos > self._read_pos:
+            self._read_pos = self._flush_pos
+        dst = memoryview(out).cast("B")
+        n = min(len(dst), self._write_pos - self._read_pos)
+        if n <= 0:
+            return 0
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        dst[:first] = self._view[start:start + first]
+        if first < n:
+            dst[first:n] = self._view[0:n - first]
+        self._read_pos += n
+        return n
+
+    def flush(self):
+        """Discard everything written so far. O(1)."""
+        self._flush_pos = self._write_pos
+
+    def discard_oldest(self, n: int):
+        """Producer-side: drop the oldest `n` unread bytes to make room. O(1)."""
+        self._flush_pos = min(max(self._read_pos, self._flush_pos) + n, self._write_pos)
+
+    @property
+    def write_pos(self) -> int:
+        return self._write_pos
+
+    @property
+    def read_pos(self) -> int:
+        return self._read_pos
+
+
+class PlaybackEngine:
+    """
+    Callback-mode PyAudio output fed from a PcmRingBuffer.
+
+    Args:
+        pa: PyAudio instance.
+        rate: Sample rate of the model audio (24 kHz for Gemini native audio).
+        buffer_seconds: Ring capacity. Audio beyond this is dropped (overrun).
+        jitter_target_ms: Audio to accumulate before (re)starting playback.
+            Playback also starts once data has waited this long, so the tail
+            of a response shorter than the target still plays.
+        frames_per_buffer: PyAudio callback period in frames.
+        tap_chunks: Played chunks kept for AudioLoop's visualizer callbacks.
+    """
+
+    def __init__(self, pa, rate: int, channels: int = 1, sample_width: int = 2,
+                 buffer_seconds: float = 30.0, jitter_target_ms: float = 60.0,
+                 frames_per_buffer: int = 480, tap_chunks: int = 64):
+        self.pa = pa
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = channels * sample_width
+        self.frames_per_buffer = frames_per_buffer
+        self.bytes_per_second = rate * self.frame_bytes
+        self.jitter_target_ms = jitter_target_ms
+        self.jitter_target_bytes = int(self.bytes_per_second * jitter_target_ms / 1000) // self.frame_bytes * self.frame_bytes
+
+        capacity = int(self.bytes_per_second * buffer_seconds) // self.frame_bytes * self.frame_bytes
+        self.ring = PcmRingBuffer(capacity)
+        self._out = bytearray(frames_per_buffer * self.frame_bytes)
+        self._silence = bytes(len(self._out))
+
+        self.stream = None
+        self._priming = True
+        self._prime_since: Optional[float] = None
+        self._pa_continue = 0  # pyaudio.paContinue
+        # Played audio, read by the asyncio side for visualization (deque append/popleft are thread-safe)
+        self.tap: Deque[bytes] = collections.deque(maxlen=tap_chunks)
+
+        # Counters
+        self.underruns = 0
+        self.flushes = 0
+        self.callbacks = 0
+
+    def start(self, output_device_index: Optional[int] = None):
+        """Open the output stream. Blocking; run it in a worker thread."""
+        import pyaudio
+        self._pa_continue = pyaudio.paContinue
+        self.stream = self.pa.open(
+            format=self.pa.get_format_from_width(self.frame_bytes // self.channels),
+            channels=self.channels,
+            rate=self.rate,
+            output=True,
+            output_device_index=output_device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        self.stream.start_stream()
+
+    def feed(self, data: bytes) -> int:
+        """Queue model audio. Returns the number of bytes accepted."""
+        return self.ring.write(data)
+
+    def flush(self) -> int:
+        """Drop all queued audio (barge-in). Returns the number of bytes dropped."""
+        dropped = self.ring.available
+        self.ring.flush()
+        self.tap.clear()
+        self._priming = True
+        self._prime_since = None
+        self.flushes += 1
+        return dropped
+
+    @property
+    def buffered_ms(self) -> float:
+        return self.ring.available * 1000.0 / self.bytes_per_second
+
+    def render(self, nbytes: int) -> bytes:
+        """Produce the next `nbytes` of output. Called on the audio thread."""
+        available = self.ring.available
+        if self._priming:
+            if available == 0:
+                self._prime_since = None
+                return self._silence[:nbytes]
+            now = time.monotonic()
+            if self._prime_since is None:
+                self._prime_since = now
+            waited_ms = (now - self._prime_since) * 1000
+            if available < self.jitter_target_bytes and waited_ms < self.jitter_target_ms:
+                return self._silence[:nbytes]
+            self._priming = False
+            self._prime_since = None
+
+        out = memoryview(self._out)[:nbytes]
+        n = self.ring.read_into(out)
+        if n < nbytes:
+            out[n:] = self._silence[:nbytes - n]
+            self.underruns += 1
+            self._priming = True
+        chunk = bytes(out)
+        if n:
+            self.tap.append(chunk[:n])
+        return chunk
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.callbacks += 1
+        return (self.render(frame_count * self.frame_bytes), self._pa_continue)
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "buffered_ms": round(self.buffered_ms, 1),
+            "jitter_target_ms": self.jitter_target_ms,
+            "underruns": self.underruns,
+            "overruns": self.ring.overruns,
+            "bytes_dropped": self.ring.bytes_dropped,
+            "flushes": self.flushes,
+        }
+
+
+class CaptureEngine:
+    """
+    Callback-mode PyAudio input feeding a PcmRingBuffer.
+
+    Args:
+        pa: PyAudio instance.
+        rate: Capture sample rate (16 kHz for Gemini).
+        chunk_size: Frames per chunk handed to the asyncio side (and sent).
+        latency_ms: Target PyAudio callback period; smaller means the first
+            samples of a chunk wait less before they are available.
+        buffer_seconds: Ring capacity.
+        overflow: What to do when the asyncio side falls behind and the ring
+            is full: "drop_oldest" keeps the most recent audio,
+            "drop_newest" keeps what is already queued.
+    """
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+    def __init__(self, pa, rate: int, channels: int = 1, sample_width: int = 2,
+                 chunk_size: int = 1024, latency_ms: Optional[float] = 20.0,
+                 buffer_seconds: float = 2.0, overflow: str = "drop_oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Available: {', '.join(self.OVERFLOW_POLICIES)}")
+        self.pa = pa
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = channels * sample_width
+        self.chunk_size = chunk_size
+        self.chunk_bytes = chunk_size * self.frame_bytes
+        self.frames_per_buffer = int(rate * latency_ms / 1000) if latency_ms else chunk_size
+        self.overflow = overflow
+
+        capacity = max(int(rate * buffer_seconds), chunk_size * 2) * self.frame_bytes
+        self.ring = PcmRingBuffer(capacity)
+        self._chunk = bytearray(self.chunk_bytes)
+        # (ring end position, monotonic capture time) per callback
+        self._stamps: Deque[Tuple[int, float]] = collections.deque(maxlen=4096)
+
+        self.stream = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiter: Optional[asyncio.Future] = None
+        self._wake_scheduled = False
+        self._pa_continue = 0  # pyaudio.paContinue
+
+        # Counters / metrics (milliseconds)
+        self.callbacks = 0
+        self.overflows = 0
+        self.bytes_discarded = 0   # oldest audio dropped under "drop_oldest"
+        self.latency_count = 0
+        self.latency_last_ms = 0.0
+        self.latency_avg_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    def start(self, input_device_index: Optional[int] = None, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Open the input stream. Blocking; run it in a worker thread and pass the running loop."""
+        import pyaudio
+        self._pa_continue = pyaudio.paContinue
+        self._loop = loop
+        self.stream = self.pa.open(
+            format=self.pa.get_format_from_width(self.frame_bytes // self.channels),
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            input_device_index=input_device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        self.stream.start_stream()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.callbacks += 1
+        self.capture(in_data, time.monotonic())
+        return (None, self._pa_continue)
+
+    def capture(self, data: bytes, captured_at: float):
+        """Audio-thread side: store captured PCM and wake the reader when a chunk is ready."""
+        if len(data) > self.ring.free:
+            self.overflows += 1
+            if self.overflow == "drop_oldest":
+                excess = min(len(data), self.ring.capacity) - self.ring.free
+                self.ring.discard_oldest(excess)
+                self.bytes_discarded += excess
+        if self.ring.write(data):
+            self._stamps.append((self.ring.write_pos, captured_at))
+
+        if self._waiter is not None and not self._wake_scheduled and self.ring.available >= self.chunk_bytes:
+            self._wake_scheduled = True
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._wake)
+            else:
+                self._wake()
+
+    def _wake(self):
+        self._wake_scheduled = False
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def read(self) -> Tuple[bytes, float]:
+        """Wait for the next full chunk. Returns (pcm bytes, capture time of its last sample)."""
+        while self.ring.available < self.chunk_bytes:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                # Re-check after publishing the waiter so a wake-up cannot be lost
+                if self.ring.available >= self.chunk_bytes:
+                    break
+                await self._waiter
+            finally:
+                self._waiter = None
+        self.ring.read_into(self._chunk)
+        chunk_end = self.ring.read_pos
+        captured_at = time.monotonic()
+        stamps = self._stamps
+        while stamps and stamps[0][0] < chunk_end:
+            stamps.popleft()
+        if stamps:
+            captured_at = stamps[0][1]
+        return bytes(self._chunk), captured_at
+
+    def record_latency(self, captured_at: float, sent_at: Optional[float] = None):
+        """Record capture-to-send latency for a chunk once it has been handed to the session."""
+        ms = ((sent_at if sent_at is not None else time.monotonic()) - captured_at) * 1000
+        self.latency_count += 1
+        self.latency_last_ms = ms
+        self.latency_avg_ms += (ms - self.latency_avg_ms) / min(self.latency_count, 100)
+        self.latency_max_ms = max(self.latency_max_ms, ms)
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "chunk_size": self.chunk_size,
+            "frames_per_buffer": self.frames_per_buffer,
+            "overflow_policy": self.overflow,
+            "overflows": self.overflows,
+            "bytes_dropped": self.bytes_discarded + self.ring.bytes_dropped,
+            "capture_to_send_ms": {
+                "last": round(self.latency_last_ms, 2),
+                "avg": round(self.latency_avg_ms, 2),
+                "max": round(self.latency_max_ms, 2),
+                "count": self.latency_count,
+            },
+        }
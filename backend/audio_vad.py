@@ -0,0 +1,193 @@
+"""
+Voice activity detection for the microphone path in AudioLoop.
+
+Detectors read raw 16-bit PCM through ``np.frombuffer`` views and reuse
+pre-allocated scratch buffers, so analysing a mic chunk does not create
+per-sample Python objects or new numpy arrays.
+
+Detectors:
+- EnergyDetector: fixed RMS threshold (the original behaviour)
+- ZeroCrossingDetector: RMS gate plus a zero-crossing-rate band
+- AdaptiveNoiseFloorDetector: RMS relative to a tracked background level
+"""
+
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+
+PCM_DTYPE = np.dtype("<i2")
+
+
+class PcmDetector:
+    """
+    Base class for detectors. Subclasses implement `is_speech(samples)` on an
+    int16 numpy view; `level` holds the RMS of the last analysed chunk.
+    """
+
+    def __init__(self):
+        self.level = 0.0
+        self._scratch = np.empty(0, dtype=np.float32)
+
+    def _float_view(self, samples: np.ndarray) -> np.ndarray:
+        """Copy samples into the reusable float32 scratch buffer (grown on demand)."""
+        n = samples.shape[0]
+        if self._scratch.shape[0] < n:
+            self._scratch = np.empty(n, dtype=np.float32)
+        view = self._scratch[:n]
+        np.copyto(view, samples, casting="unsafe")
+        return view
+
+    def rms(self, samples: np.ndarray) -> float:
+        n = samples.shape[0]
+        if n == 0:
+            return 0.0
+        f = self._float_view(samples)
+        return float(np.sqrt(np.dot(f, f) / n))
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        raise NotImplementedError
+
+
+class EnergyDetector(PcmDetector):
+    """Speech when the chunk RMS exceeds a fixed threshold."""
+
+    def __init__(self, threshold: float = 800.0):
+        super().__init__()
+        self.threshold = threshold
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        self.level = self.rms(samples)
+        return self.level > self.threshold
+
+
+class ZeroCrossingDetector(PcmDetector):
+    """
+    Speech when the chunk is loud enough AND its zero-crossing rate falls in
+    the voiced range. Broadband noise (fans, hiss) crosses zero far more often
+    than voiced speech, so it is rejected even when it is loud.
+    """
+
+    def __init__(self, threshold: float = 500.0, min_rate: float = 0.01, max_rate: float = 0.25):
+        super().__init__()
+        self.threshold = threshold
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = 0.0
+        self._signs = np.empty(0, dtype=bool)
+        self._crossings = np.empty(0, dtype=bool)
+
+    def zero_crossing_rate(self, samples: np.ndarray) -> float:
+        n = samples.shape[0]
+        if n < 2:
+            return 0.0
+        if self._signs.shape[0] < n:
+            self._signs = np.empty(n, dtype=bool)
+            self._crossings = np.empty(n, dtype=bool)
+        signs = self._signs[:n]
+        crossings = self._crossings[:n - 1]
+        np.signbit(samples, out=signs)
+        np.not_equal(signs[1:], signs[:-1], out=crossings)
+        return np.count_nonzero(crossings) / (n - 1)
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        self.level = self.rms(samples)
+        if self.level <= self.threshold:
+            self.rate = 0.0
+            return False
+        self.rate = self.zero_crossing_rate(samples)
+        return self.min_rate <= self.rate <= self.max_rate
+
+
+class AdaptiveNoiseFloorDetector(PcmDetector):
+    """
+    Speech when the chunk RMS is `ratio` times above a running noise floor.
+    The floor follows the background level with an exponential moving average
+    that only updates on non-speech chunks, so it adapts to a noisy room
+    without learning the user's voice as noise.
+    """
+
+    def __init__(self, ratio: float = 3.0, min_threshold: float = 300.0,
+                 initial_floor: float = 200.0, adapt_rate: float = 0.05):
+        super().__init__()
+        self.ratio = ratio
+        self.min_threshold = min_threshold
+        self.noise_floor = initial_floor
+        self.adapt_rate = adapt_rate
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        self.level = self.rms(samples)
+        threshold = max(self.noise_floor * self.ratio, self.min_threshold)
+        speech = self.level > threshold
+        if not speech:
+            self.noise_floor += self.adapt_rate * (self.level - self.noise_floor)
+        return speech
+
+
+DETECTORS = {
+    "energy": EnergyDetector,
+    "zero_crossing": ZeroCrossingDetector,
+    "adaptive": AdaptiveNoiseFloorDetector,
+}
+
+
+def create_detector(kind: str = "energy", **kwargs) -> PcmDetector:
+    """Build a detector by name ('energy', 'zero_crossing', 'adaptive')."""
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown VAD detector '{kind}'. Available: {', '.join(DETECTORS)}")
+    return DETECTORS[kind](**kwargs)
+
+
+class VadStateMachine:
+    """
+    Turns per-chunk detector decisions into utterance start/end events.
+
+    Speech starts on the first speech chunk. It only ends after `hangover`
+    seconds without speech, so short pauses between words do not split an
+    utterance.
+    """
+
+    SPEECH_START = "speech_start"
+    SPEECH_END = "speech_end"
+
+    def __init__(self, detector: Optional[PcmDetector] = None, hangover: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.detector = detector or EnergyDetector()
+        self.hangover = hangover
+        self._clock = clock
+        self.is_speaking = False
+        self._silence_start: Optional[float] = None
+
+    @property
+    def level(self) -> float:
+        return self.detector.level
+
+    def reset(self):
+        self.is_speaking = False
+        self._silence_start = None
+
+    def process(self, data: bytes) -> Optional[str]:
+        """
+        Analyse one chunk of raw PCM bytes.
+        Returns SPEECH_START / SPEECH_END on a transition, otherwise None.
+        """
+        samples = np.frombuffer(data, dtype=PCM_DTYPE, count=len(data) // 2)
+        return self.process_samples(samples)
+
+    def process_samples(self, samples: np.ndarray) -> Optional[str]:
+        if self.detector.is_speech(samples):
+            self._silence_start = None
+            if not self.is_speaking:
+                self.is_speaking = True
+                return self.SPEECH_START
+            return None
+
+        if self.is_speaking:
+            now = self._clock()
+            if self._silence_start is None:
+                self._silence_start = now
+            elif now - self._silence_start > self.hangover:
+                self.reset()
+                return self.SPEECH_END
+        return None
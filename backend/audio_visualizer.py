@@ -0,0 +1,217 @@
+"""
+AudioVisualizerStream - Feeds model playback audio to the frontend visualizer.
+
+Playback chunks are buffered as they arrive and flushed on a fixed frame
+clock (default 30 Hz) as a single binary Socket.IO attachment, instead of one
+JSON list of integers per chunk.
+
+Modes:
+- "bands":    per-band peak amplitude as uint8 (0-255), `bands` values per frame.
+              This is what Visualizer.jsx draws, and it is a few dozen bytes.
+- "pcm":      the coalesced raw 16-bit PCM for the frame.
+- "spectrum": float32 FFT band magnitudes (0-1) computed by AudioAnalyzer in
+              AudioLoop.play_audio; no PCM reaches the server callbacks at all.
+- "envelope": float32 RMS envelope (0-1), also computed by AudioAnalyzer.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class AudioAnalyzer:
+    """
+    Reduces a playback chunk to a fixed number of levels in [0, 1].
+
+    - "spectrum": Hann-windowed rFFT magnitudes pooled into log-spaced bands
+                  between `min_freq` and `max_freq`, mapped from -60..0 dBFS.
+    - "envelope": RMS of `bands` equal time segments, relative to full scale.
+    """
+
+    MODES = ("spectrum", "envelope")
+
+    def __init__(self, mode: str = "spectrum", bands: int = 32, sample_rate: int = 24000,
+                 min_freq: float = 80.0, max_freq: float = 8000.0, floor_db: float = -60.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown analyzer mode '{mode}'. Available: {', '.join(self.MODES)}")
+        self.mode = mode
+        self.bands = bands
+        self.sample_rate = sample_rate
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.floor_db = floor_db
+        # Window and band edges depend only on chunk length; cache per length
+        self._plans: Dict[int, tuple] = {}
+
+    def _plan(self, n: int):
+        plan = self._plans.get(n)
+        if plan is None:
+            window = np.hanning(n).astype(np.float32)
+            freqs = np.fft.rfftfreq(n, d=1.0 / self.sample_rate)
+            max_freq = min(self.max_freq, self.sample_rate / 2)
+            edges = np.geomspace(self.min_freq, max_freq, self.bands + 1)
+            starts = np.searchsorted(freqs, edges[:-1])
+            ends = np.maximum(np.searchsorted(freqs, edges[1:]), starts + 1)
+            starts = np.minimum(starts, len(freqs) - 1)
+            ends = np.minimum(ends, len(freqs))
+            # Full-scale sine through the Hann window peaks at n/4 in the rFFT
+            plan = (window, starts, ends, n / 4.0)
+            self._plans[n] = plan
+        return plan
+
+    def analyze(self, pcm: bytes) -> np.ndarray:
+        samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+        n = samples.shape[0]
+        if n < 2:
+            return np.zeros(self.bands, dtype=np.float32)
+        x = samples.astype(np.float32) / 32768.0
+
+        if self.mode == "envelope":
+            if n < self.bands:
+                levels = np.zeros(self.bands, dtype=np.float32)
+                levels[:n] = np.abs(x)
+                return levels
+            usable = n - (n % self.bands)
+            seg = x[:usable].reshape(self.bands, -1)
+            return np.sqrt(np.mean(seg * seg, axis=1)).astype(np.float32)
+
+        window, starts, ends, full_scale = self._plan(n)
+        mags = np.abs(np.fft.rfft(x * window)) / full_scale
+        # Peak magnitude inside each band
+        levels = np.array([mags[a:b].max() for a, b in zip(starts, ends)], dtype=np.float32)
+        db = 20 * np.log10(np.maximum(levels, 1e-9))
+        return np.clip((db - self.floor_db) / -self.floor_db, 0.0, 1.0).astype(np.float32)
+
+
+class AudioVisualizerStream:
+    """
+    Coalesces PCM chunks and emits them on a frame clock.
+
+    `push()` is cheap and synchronous so it can be called straight from
+    AudioLoop's on_audio_data callback; `run()` is the frame-clock task.
+    """
+
+    MODES = ("bands", "pcm", "spectrum", "envelope")
+    ANALYZED_MODES = AudioAnalyzer.MODES
+
+    def __init__(self, emit: Callable[[Dict], Awaitable[None]], frame_rate: float = 30.0,
+                 mode: str = "bands", bands: int = 64, max_pending_bytes: int = 48000):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown visualizer mode '{mode}'. Available: {', '.join(self.MODES)}")
+        self.emit = emit
+        self.frame_rate = frame_rate
+        self.mode = mode
+        self.bands = bands
+        self.max_pending_bytes = max_pending_bytes
+
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._pending_levels: Optional[np.ndarray] = None
+        self._running = False
+        self._scratch = np.empty(0, dtype=np.float32)
+
+        # Stats
+        self.chunks_in = 0
+        self.frames_emitted = 0
+        self.bytes_emitted = 0
+        self.bytes_dropped = 0
+
+    def push(self, data: bytes):
+        """Queue a playback chunk for the next frame. Drops the oldest audio if the UI falls behind."""
+        self.chunks_in += 1
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        while self._pending_bytes > self.max_pending_bytes and len(self._pending) > 1:
+            dropped = self._pending.pop(0)
+            self._pending_bytes -= len(dropped)
+            self.bytes_dropped += len(dropped)
+
+    def push_levels(self, levels: np.ndarray):
+        """Queue analyzed levels (spectrum/envelope modes). Levels within one frame are max-combined."""
+        self.chunks_in += 1
+        if self._pending_levels is None:
+            self._pending_levels = np.array(levels, dtype=np.float32)
+        else:
+            np.maximum(self._pending_levels, levels, out=self._pending_levels)
+
+    @property
+    def analyzed(self) -> bool:
+        """True when levels are computed upstream by AudioAnalyzer instead of from PCM here."""
+        return self.mode in self.ANALYZED_MODES
+
+    def take_frame(self) -> Optional[bytes]:
+        """Drain pending chunks and return the frame payload, or None if nothing arrived."""
+        if self.analyzed:
+            if self._pending_levels is None:
+                return None
+            payload = self._pending_levels.astype("<f4").tobytes()
+            self._pending_levels = None
+            return payload
+        if not self._pending:
+            return None
+        pcm = b"".join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        if self.mode == "pcm":
+            return pcm
+        return self.compute_bands(pcm)
+
+    def compute_bands(self, pcm: bytes) -> bytes:
+        """Split the frame into `bands` equal segments and return each segment's peak as uint8."""
+        samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+        n = samples.shape[0]
+        if n < self.bands:
+            levels = np.zeros(self.bands, dtype=np.uint8)
+            if n:
+                levels[:n] = np.minimum(np.abs(samples.astype(np.int32)) >> 7, 255)
+            return levels.tobytes()
+
+        usable = n - (n % self.bands)
+        if self._scratch.shape[0] < usable:
+            self._scratch = np.empty(usable, dtype=np.float32)
+        f = self._scratch[:usable]
+        np.copyto(f, samples[:usable], casting="unsafe")
+        np.abs(f, out=f)
+        peaks = f.reshape(self.bands, -1).max(axis=1)
+        # 32768 full scale -> 255
+        return np.minimum(peaks / 128.0, 255).astype(np.uint8).tobytes()
+
+    async def run(self):
+        """Frame-clock loop. Emits at most one payload per frame interval."""
+        self._running = True
+        interval = 1.0 / self.frame_rate
+        next_tick = time.monotonic()
+        try:
+            while self._running:
+                next_tick += interval
+                payload = self.take_frame()
+                if payload is not None:
+                    self.frames_emitted += 1
+                    self.bytes_emitted += len(payload)
+                    try:
+                        await self.emit({"format": self.mode, "data": payload})
+                    except Exception as e:
+                        print(f"[VISUALIZER] Emit failed: {e}")
+                delay = next_tick - time.monotonic()
+                if delay < 0:
+                    # Fell behind (slow emit) - resync instead of bursting
+                    next_tick = time.monotonic()
+                    delay = 0
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._running = False
+
+    def stop(self):
+        self._running = False
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "chunks_in": self.chunks_in,
+            "frames_emitted": self.frames_emitted,
+            "bytes_emitted": self.bytes_emitted,
+            "bytes_dropped": self.bytes_dropped,
+        }
@@ -7,6 +7,7 @@ import os
 import base64
 import numpy as np
 import urllib.request
+from executors import VISION, run_in
 
 class FaceAuthenticator:
     # MediaPipe Face Landmarker model URL
@@ -148,8 +149,8 @@ class FaceAuthenticator:
         # Capture the current (main) event loop
         loop = asyncio.get_running_loop()
         
-        # Use a separate thread for blocking camera/CV operations
-        await asyncio.to_thread(self._run_cv_loop, loop)
+        # Use the vision pool for blocking camera/CV operations
+        await run_in(VISION, self._run_cv_loop, loop)
 
         print("[AUTH] Authentication loop finished.")
     
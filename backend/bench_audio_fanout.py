@@ -0,0 +1,117 @@
+"""
+Benchmark: playback audio fan-out to the frontend.
+
+Simulates a long spoken response (24 kHz 16-bit PCM arriving in chunks) and
+compares the legacy per-chunk `{'data': list(bytes)}` emit against
+AudioVisualizerStream in "bands" and "pcm" modes, and against the
+AudioAnalyzer "spectrum"/"envelope" modes used in AudioLoop.play_audio.
+
+Reports emitted bytes per second of audio and event-loop lag, measured by a
+probe task that sleeps 5 ms and records how late it wakes up.
+
+Usage:
+    python backend/bench_audio_fanout.py [--seconds 5] [--chunk-bytes 3840]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import numpy as np
+
+from audio_visualizer import AudioAnalyzer, AudioVisualizerStream
+
+RECEIVE_SAMPLE_RATE = 24000
+
+
+def make_chunk(n_bytes, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-8000, 8000, n_bytes // 2, dtype=np.int16).astype("<i2").tobytes()
+
+
+async def lag_probe(samples, stop, interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run_case(label, chunks, chunk_period, make_sink):
+    emitted = {"bytes": 0, "events": 0}
+    lag = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(lag_probe(lag, stop))
+
+    push, finish = make_sink(emitted)
+    for chunk in chunks:
+        push(chunk)
+        await asyncio.sleep(chunk_period)
+    await finish()
+
+    stop.set()
+    await probe
+    audio_seconds = len(chunks) * len(chunks[0]) / 2 / RECEIVE_SAMPLE_RATE
+    print(f"{label:<22} {emitted['bytes'] / audio_seconds:12.0f} B/s  "
+          f"{emitted['events'] / audio_seconds:7.1f} events/s  "
+          f"lag p50 {statistics.median(lag):5.2f} ms  max {max(lag):6.2f} ms")
+
+
+def legacy_sink(emitted):
+    async def emit(chunk):
+        # What python-socketio serializes for {'data': list(bytes)}
+        payload = json.dumps({"data": list(chunk)})
+        emitted["bytes"] += len(payload)
+        emitted["events"] += 1
+
+    def push(chunk):
+        asyncio.create_task(emit(chunk))
+
+    async def finish():
+        await asyncio.sleep(0)
+
+    return push, finish
+
+
+def visualizer_sink(mode):
+    def factory(emitted):
+        async def emit(payload):
+            emitted["bytes"] += len(payload["data"])
+            emitted["events"] += 1
+
+        stream = AudioVisualizerStream(emit, frame_rate=30, mode=mode)
+        task = asyncio.create_task(stream.run())
+
+        async def finish():
+            await asyncio.sleep(2 / stream.frame_rate)
+            stream.stop()
+            await task
+
+        if stream.analyzed:
+            # Mirrors AudioLoop.play_audio with an AudioAnalyzer attached
+            analyzer = AudioAnalyzer(mode=mode, bands=32, sample_rate=RECEIVE_SAMPLE_RATE)
+            return (lambda chunk: stream.push_levels(analyzer.analyze(chunk))), finish
+        return stream.push, finish
+    return factory
+
+
+async def main(seconds, chunk_bytes):
+    n_chunks = int(seconds * RECEIVE_SAMPLE_RATE * 2 / chunk_bytes)
+    chunks = [make_chunk(chunk_bytes, i) for i in range(n_chunks)]
+    # Deliver faster than real time to stress the loop
+    chunk_period = chunk_bytes / 2 / RECEIVE_SAMPLE_RATE / 4
+    print(f"{n_chunks} chunks of {chunk_bytes} bytes ({seconds}s of audio, delivered at 4x speed)\n")
+
+    await run_case("legacy list(bytes)", chunks, chunk_period, legacy_sink)
+    await run_case("visualizer bands", chunks, chunk_period, visualizer_sink("bands"))
+    await run_case("visualizer pcm", chunks, chunk_period, visualizer_sink("pcm"))
+    await run_case("analyzer spectrum", chunks, chunk_period, visualizer_sink("spectrum"))
+    await run_case("analyzer envelope", chunks, chunk_period, visualizer_sink("envelope"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audio fan-out benchmark")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--chunk-bytes", type=int, default=3840)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.chunk_bytes))
@@ -0,0 +1,87 @@
+"""
+Benchmark: cold-start subprocess vs warm worker pool for CAD scripts.
+
+Runs backend/temp_cad_gen.py (a build123d sphere) the way CadAgent does:
+the 'output.stl' path is rewritten to a temp file, then the script is run
+  - cold: a fresh interpreter per run (ScriptRunner), re-importing build123d
+  - warm: on a CadWorkerPool worker with build123d already imported
+
+Pool start-up (one import, paid in the background by CadAgent.warm_up) is
+reported separately from per-script latency.
+
+Usage:
+    python backend/bench_cad_pool.py [--runs 5] [--script backend/temp_cad_gen.py]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from cad_runner import ScriptRunner
+from cad_worker_pool import CadWorkerPool
+from executors import CAD_SCRIPTS, run_in
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_cad_gen.py")
+
+
+def prepare_script(source_path, work_dir):
+    output_stl = os.path.join(work_dir, "bench_output.stl")
+    with open(source_path) as f:
+        code = f.read().replace("output.stl", output_stl.replace("\\", "\\\\"))
+    script_path = os.path.join(work_dir, "bench_design.py")
+    with open(script_path, "w") as f:
+        f.write(code)
+    return script_path, output_stl
+
+
+def report(label, samples):
+    print(f"{label:<10} p50 {statistics.median(samples) * 1000:8.0f} ms   "
+          f"min {min(samples) * 1000:8.0f} ms   max {max(samples) * 1000:8.0f} ms   (n={len(samples)})")
+
+
+async def main(runs, source):
+    with tempfile.TemporaryDirectory() as work_dir:
+        script_path, output_stl = prepare_script(source, work_dir)
+
+        runner = ScriptRunner(timeout=300)
+        cold = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = await runner.run(script_path, cwd=work_dir)
+            cold.append(time.perf_counter() - start)
+            if not result.ok:
+                print(result.error_message)
+                return
+
+        pool = CadWorkerPool(size=1, timeout=300)
+        try:
+            start = time.perf_counter()
+            await run_in(CAD_SCRIPTS, pool.start)
+            startup = time.perf_counter() - start
+
+            warm = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = await pool.run(script_path, output_path=output_stl, cwd=work_dir)
+                warm.append(time.perf_counter() - start)
+                if not result.ok:
+                    print(result.error_message)
+                    return
+        finally:
+            pool.close()
+
+    print(f"Script: {source}\n")
+    report("cold", cold)
+    report("warm", warm)
+    print(f"\nPool start-up (once): {startup * 1000:.0f} ms")
+    print(f"Speed-up per attempt: {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CAD worker pool benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--script", default=DEFAULT_SCRIPT)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.script))
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: per-chunk VAD cost in AudioLoop.listen_audio.
+
+Compares the legacy struct.unpack + generator RMS against the numpy detectors
+in audio_vad.py on 1024-sample (2048-byte) 16-bit mono chunks.
+
+Usage:
+    python backend/bench_vad.py [--chunks 2000]
+"""
+import argparse
+import math
+import struct
+import time
+
+import numpy as np
+
+from audio_vad import VadStateMachine, create_detector
+
+CHUNK_SIZE = 1024
+
+
+def legacy_rms(data):
+    count = len(data) // 2
+    if count > 0:
+        shorts = struct.unpack(f"<{count}h", data)
+        sum_squares = sum(s**2 for s in shorts)
+        return int(math.sqrt(sum_squares / count))
+    return 0
+
+
+def make_chunks(n):
+    rng = np.random.default_rng(0)
+    t = np.arange(CHUNK_SIZE) / 16000.0
+    chunks = []
+    for i in range(n):
+        amp = 3000 if (i // 20) % 2 else 100
+        tone = amp * np.sin(2 * np.pi * 220 * t + i)
+        noise = rng.normal(0, 50, CHUNK_SIZE)
+        chunks.append((tone + noise).astype("<i2").tobytes())
+    return chunks
+
+
+def bench(label, fn, chunks):
+    start = time.perf_counter()
+    for c in chunks:
+        fn(c)
+    elapsed = time.perf_counter() - start
+    per_chunk_us = elapsed / len(chunks) * 1e6
+    print(f"{label:<28} {per_chunk_us:9.1f} us/chunk")
+    return per_chunk_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD per-chunk cost benchmark")
+    parser.add_argument("--chunks", type=int, default=2000)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    print(f"{args.chunks} chunks of {CHUNK_SIZE} samples ({CHUNK_SIZE / 16:.0f} ms of audio each)\n")
+
+    before = bench("legacy struct+generator", legacy_rms, chunks)
+    for kind in ("energy", "zero_crossing", "adaptive"):
+        vad = VadStateMachine(detector=create_detector(kind))
+        after = bench(f"numpy {kind}", vad.process, chunks)
+        print(f"{'':<28} {before / after:9.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
+import re
 import json
+import time
 import asyncio
 from datetime import datetime
 from google import genai
@@ -7,16 +9,45 @@ from google.genai import types
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from cad_runner import ScriptRunner
+from cad_worker_pool import CadWorkerPool
+from cad_cache import CadCache, prompt_key, script_key
+from cad_params import ParameterError, apply_parameters, extract_parameters
+from cad_preflight import preflight
+from cad_stream import CodeFenceExtractor
+from design_store import EDIT_INSTRUCTIONS, DesignStore, EditError, apply_edit_blocks
+import executors
+from executors import CAD_SCRIPTS, CPU_SUBPROCESS, FILE_IO, run_in
+from mesh_tools import mesh_stats
 
 load_dotenv()
 
+# Sampling temperatures for speculative candidates, cycled when there are more candidates
+SPECULATIVE_TEMPERATURES = (1.0, 0.7, 1.3, 0.4)
+
 class CadAgent:
-    def __init__(self, on_thought=None, on_status=None):
+    def __init__(self, on_thought=None, on_status=None, script_timeout=120, script_memory_mb=4096, use_worker_pool=True, use_cache=True, cache_max_mb=256,
+                 speculative_candidates=1, speculative_budget=180):
         self.client = genai.Client(http_options={"api_version": "v1beta"}, api_key=os.getenv("GEMINI_API_KEY"))
         # Using Gemini 2.5 Pro for thinking/streaming support
         self.model = "gemini-3-pro-preview"
         self.on_thought = on_thought  # Callback for streaming thoughts 
         self.on_status = on_status  # Callback for retry status info
+        # Runs generated scripts with a wall-clock/memory limit; killed if the calling task is cancelled
+        self.runner = ScriptRunner(timeout=script_timeout, memory_limit_mb=script_memory_mb)
+        # Warm workers with build123d already imported; the runner above is the fallback
+        # One warm worker per speculative candidate so they can execute side by side
+        self.worker_pool = CadWorkerPool(size=max(1, speculative_candidates), timeout=script_timeout, memory_limit_mb=script_memory_mb) if use_worker_pool else None
+        # Speculative mode: first attempt races K generations at different temperatures (1 = off)
+        self.set_speculative(speculative_candidates, speculative_budget)
+        # Content-addressed script/STL cache, one per output directory (stored in <output_dir>/.cache)
+        self.use_cache = use_cache
+        self.cache_max_mb = cache_max_mb
+        self._caches = {}
+        # Version history per output directory (stored in <output_dir>/.designs)
+        self._stores = {}
+        # Model streams being closed in the background after their code block arrived
+        self._closing = set()
         
         self.system_instruction = """
 You are a Python-based 3D CAD Engineer using the `build123d` library.
@@ -53,13 +84,471 @@ from build123d import *
 
 with BuildPart() as p:
     Box(10, 10, 10)
-    Fillet(p.edges(), radius=1)
+    fillet(p.edges(), radius=1)
 
 result_part = p.part
 export_stl(result_part, 'output.stl')
 ```
 """
 
+    async def warm_up(self):
+        """Starts the warm worker pool in the background so the first CAD request skips the build123d import."""
+        if not self.worker_pool:
+            return
+        try:
+            await run_in(CAD_SCRIPTS, self.worker_pool.start)
+            print("[CadAgent DEBUG] [POOL] Worker pool ready.")
+        except Exception as e:
+            print(f"[CadAgent DEBUG] [WARN] Worker pool failed to start, using cold subprocesses: {e}")
+            self.worker_pool = None
+
+    def close(self):
+        if self.worker_pool:
+            self.worker_pool.close()
+
+    async def _run_script(self, script_path: str, work_dir: str, output_stl: str):
+        """
+        Runs a generated script on a warm worker, or in a fresh interpreter if the pool is unavailable
+        (current Python interpreter: unified environment with build123d + mediapipe).
+        Returns (error_msg, stl_bytes): error_msg is None on success, otherwise the text for the retry prompt.
+        """
+        try:
+            if self.worker_pool:
+                result = await self.worker_pool.run(script_path, output_path=output_stl, cwd=work_dir)
+            else:
+                result = await self.runner.run(script_path, cwd=work_dir, output_path=output_stl)
+        except Exception as e:
+            print(f"[CadAgent DEBUG] [ERR] Script run failed: {e}")
+            return str(e), None
+
+        print(f"[CadAgent DEBUG] [EXEC] Script finished in {result.duration:.1f}s (exit code {result.returncode})")
+        if result.ok:
+            return None, result.output
+        if result.timed_out:
+            print(f"[CadAgent DEBUG] [ERR] Script killed after {self.runner.timeout}s time limit.")
+        return result.error_message, None
+
+    def _get_cache(self, work_dir: str) -> Optional[CadCache]:
+        if not self.use_cache:
+            return None
+        root = os.path.join(work_dir, ".cache")
+        cache = self._caches.get(root)
+        if cache is None:
+            cache = CadCache(root, max_bytes=self.cache_max_mb * 1024 * 1024)
+            self._caches[root] = cache
+        return cache
+
+    def get_cache_stats(self):
+        return {root: cache.get_stats() for root, cache in self._caches.items()}
+
+    async def _cache_get(self, work_dir: str, key: str):
+        cache = self._get_cache(work_dir)
+        if not cache:
+            return None
+        try:
+            return await run_in(FILE_IO, cache.get, key)
+        except Exception as e:
+            print(f"[CadAgent DEBUG] [WARN] Cache read failed: {e}")
+            return None
+
+    async def _cache_put(self, work_dir: str, keys, code: str, stl_data: bytes, meta: dict):
+        cache = self._get_cache(work_dir)
+        if not cache:
+            return
+
+        def put_all():
+            for key in keys:
+                cache.put(key, code, stl_data, meta)
+
+        try:
+            await run_in(FILE_IO, put_all)
+        except Exception as e:
+            print(f"[CadAgent DEBUG] [WARN] Cache write failed: {e}")
+
+    async def _request_code(self, contents: str, temperature: float = 1.0, stream_thoughts: bool = True) -> CodeFenceExtractor:
+        """
+        Streams a Gemini response, forwarding thoughts to on_thought, and returns the extractor it was fed to.
+        Returns as soon as the ```python (or ```edit) block is closed: the prose after it is never needed,
+        and the stream is closed in the background so pre-flight / execution start right away.
+        """
+        extractor = CodeFenceExtractor(languages=("python", "edit"))
+        started = time.monotonic()
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                system_instruction=self.system_instruction,
+                temperature=temperature,
+                thinking_config=types.ThinkingConfig(include_thoughts=True)
+            )
+        )
+        try:
+            async for chunk in stream:
+                if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+                    for part in chunk.candidates[0].content.parts:
+                        if not part.text:
+                            continue
+                        elif part.thought:
+                            # Stream thought to callback
+                            if self.on_thought and stream_thoughts:
+                                self.on_thought(part.text)
+                        else:
+                            # Accumulate answer text
+                            extractor.feed(part.text)
+                if extractor.done:
+                    print(f"[CadAgent DEBUG] [STREAM] Code block complete after {time.monotonic() - started:.1f}s, not waiting for the rest of the answer.")
+                    break
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose:
+                if extractor.done:
+                    task = asyncio.ensure_future(self._close_stream(aclose))
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+                else:
+                    await self._close_stream(aclose)
+        return extractor
+
+    @staticmethod
+    async def _close_stream(aclose):
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+    @classmethod
+    def _reply_code(cls, reply: CodeFenceExtractor) -> Optional[str]:
+        """The reply's closed ```python block, or (when none closed) the regex/heuristic extraction of its text."""
+        if reply.done and reply.language == "python":
+            return reply.code
+        return cls._extract_code(reply.text)
+
+    @staticmethod
+    def _extract_code(raw_content: str) -> Optional[str]:
+        code_match = re.search(r'```python(.*?)```', raw_content, re.DOTALL)
+        if code_match:
+            return code_match.group(1).strip()
+        # Fallback: assume entire text is code if no blocks, or fail
+        print("[CadAgent DEBUG] [WARN] No ```python block found. Trying heuristic...")
+        if "import build123d" in raw_content:
+            return raw_content
+        print("[CadAgent DEBUG] [ERR] Could not extract python code.")
+        return None
+
+    async def _run_candidate(self, index: int, contents: str, temperature: float, candidate_dir: str, work_dir: str):
+        """One speculative candidate: generate, write and run its own script. Raises RuntimeError on failure."""
+        # Only the first candidate streams its thoughts, so the UI shows one coherent stream
+        reply = await self._request_code(contents, temperature=temperature, stream_thoughts=(index == 0))
+        code = self._reply_code(reply) if reply.text else None
+        if code is None:
+            raise RuntimeError("No code in model response")
+        code, preflight_error = self._preflight(code)
+        if preflight_error is not None:
+            raise RuntimeError(preflight_error)
+
+        candidate_script = os.path.join(candidate_dir, f"candidate_{index}.py")
+        candidate_stl = os.path.join(candidate_dir, f"candidate_{index}.stl")
+
+        def write_script():
+            if os.path.exists(candidate_stl):
+                os.remove(candidate_stl)
+            with open(candidate_script, "w") as f:
+                f.write(code.replace("output.stl", candidate_stl.replace("\\", "\\\\")))
+
+        await run_in(FILE_IO, write_script)
+        print(f"[CadAgent DEBUG] [SPEC] Candidate {index + 1} (temperature {temperature}) running.")
+        error_msg, stl_data = await self._run_script(candidate_script, work_dir, candidate_stl)
+        if error_msg is not None:
+            raise RuntimeError(error_msg)
+        if stl_data is None:
+            if not os.path.exists(candidate_stl):
+                raise RuntimeError(f"The script executed successfully but 'output.stl' was not found.")
+            with open(candidate_stl, "rb") as f:
+                stl_data = f.read()
+        return {"index": index, "temperature": temperature, "code": code, "stl_path": candidate_stl, "stl": stl_data}
+
+    async def _speculate(self, contents: str, work_dir: str, max_retries: int):
+        """
+        Runs `speculative_candidates` generations concurrently, each executing its script as soon as it arrives.
+        The first candidate to export an STL wins and the others are cancelled (their workers are killed).
+        Returns (winner, first_error): winner is None if every candidate failed or the budget ran out.
+        """
+        k = self.speculative_candidates
+        temperatures = SPECULATIVE_TEMPERATURES
+        candidate_dir = os.path.join(work_dir, ".cache", "candidates")
+        os.makedirs(candidate_dir, exist_ok=True)
+        print(f"[CadAgent DEBUG] [SPEC] Racing {k} candidates (budget {self.speculative_budget}s)")
+
+        tasks = [asyncio.create_task(self._run_candidate(i, contents, temperatures[i % len(temperatures)], candidate_dir, work_dir))
+                 for i in range(k)]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.speculative_budget
+        pending = set(tasks)
+        winner = None
+        first_error = None
+        try:
+            while pending and winner is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    print("[CadAgent DEBUG] [SPEC] Budget exhausted.")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the lowest index if several finished together
+                for task in sorted(done, key=tasks.index):
+                    error = task.exception()
+                    if error is None:
+                        winner = task.result()
+                        break
+                    index = tasks.index(task)
+                    error_msg = str(error)
+                    first_error = first_error or error_msg
+                    print(f"[CadAgent DEBUG] [SPEC] Candidate {index + 1} failed: {error_msg.strip().splitlines()[-1] if error_msg.strip() else error}")
+                    if self.on_status:
+                        self.on_status({
+                            "status": "candidate_failed",
+                            "attempt": 1,
+                            "max_attempts": max_retries,
+                            "candidate": index,
+                            "candidates": k,
+                            "error": (error_msg.strip().split('\n')[-1][:100] if error_msg.strip() else "Unknown error")
+                        })
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if winner and self.on_status:
+            print(f"[CadAgent DEBUG] [SPEC] Candidate {winner['index'] + 1} won.")
+            self.on_status({
+                "status": "candidate_won",
+                "attempt": 1,
+                "max_attempts": max_retries,
+                "candidate": winner["index"],
+                "candidates": k,
+                "temperature": winner["temperature"],
+                "error": None
+            })
+        return winner, first_error
+
+    def _preflight(self, code: str):
+        """
+        Static checks before execution. Returns (code, error_msg): the code with
+        auto-fixes applied, and the retry-prompt text if it cannot be run as is.
+        """
+        check = preflight(code)
+        for fix in check.fixes:
+            print(f"[CadAgent DEBUG] [PREFLIGHT] {fix}")
+        if not check.ok:
+            print(f"[CadAgent DEBUG] [PREFLIGHT] Rejected in {check.duration * 1e6:.0f}us: {'; '.join(check.errors)}")
+        return check.code, check.error_message
+
+    async def _mesh_stats(self, output_stl: str, stl_data: Optional[bytes] = None) -> Optional[dict]:
+        """Indexes the exported STL (cached next to it for previews and printing) and returns its stats."""
+        try:
+            return await run_in(CPU_SUBPROCESS, mesh_stats, output_stl, stl_data)
+        except Exception as e:
+            print(f"[CadAgent DEBUG] [WARN] Could not index mesh: {e}")
+            return None
+
+    def set_speculative(self, candidates: int, budget: float):
+        """Sets K and the time budget of speculative generation, growing the pools so K candidates really run side by side."""
+        self.speculative_candidates = max(1, candidates)
+        self.speculative_budget = budget
+        # Each racing candidate holds a cad-scripts thread while its script runs, plus one spare for warm-up/fallback
+        executors.registry.reserve(CAD_SCRIPTS, self.speculative_candidates + 1)
+        if self.worker_pool:
+            self.worker_pool.reserve(self.speculative_candidates)
+
+    def _get_store(self, work_dir: str) -> DesignStore:
+        store = self._stores.get(work_dir)
+        if store is None:
+            store = DesignStore(work_dir)
+            self._stores[work_dir] = store
+        return store
+
+    async def _record_version(self, work_dir: str, code: str, stl_data: bytes, prompt: str, kind: str,
+                              started: float, meta: Optional[dict] = None) -> Optional[int]:
+        """Appends a successful build to the design history. Returns its version number."""
+        try:
+            entry = await run_in(FILE_IO, self._get_store(work_dir).record, code, stl_data, prompt, kind,
+                                 time.monotonic() - started, None, meta)
+            print(f"[CadAgent DEBUG] [DESIGNS] Recorded v{entry.version} (parent v{entry.parent})")
+            return entry.version
+        except Exception as e:
+            print(f"[CadAgent DEBUG] [WARN] Could not record design version: {e}")
+            return None
+
+    def _design_history(self, work_dir: str) -> str:
+        """The prompts that led to the current version since its design was generated, oldest first."""
+        lines = [f"- v{entry.version} ({entry.kind}): {entry.prompt}" for entry in self._get_store(work_dir).lineage()]
+        if not lines:
+            return ""
+        return "Design History (oldest first):\n" + "\n".join(lines) + "\n"
+
+    async def _version_diff(self, work_dir: str, version: Optional[int]) -> Optional[str]:
+        """Unified diff of a recorded version's script against its parent, or None."""
+        store = self._get_store(work_dir)
+        entry = store.get(version) if version else None
+        if entry is None or entry.parent is None:
+            return None
+        try:
+            return await run_in(FILE_IO, store.diff, entry.parent, entry.version)
+        except OSError as e:
+            print(f"[CadAgent DEBUG] [WARN] Could not diff v{entry.parent}..v{entry.version}: {e}")
+            return None
+
+    def get_history(self, output_dir: str) -> dict:
+        return self._get_store(output_dir).history()
+
+    async def restore_version(self, output_dir: str, action: str, version: Optional[int] = None):
+        """
+        Undo / redo / checkout without regenerating: the stored script becomes current_design.py
+        and the stored STL is written to a fresh output file. Returns a result like generate_prototype,
+        or None if there is nothing to restore.
+        """
+        store = self._get_store(output_dir)
+        if action == "undo":
+            entry = await run_in(FILE_IO, store.undo)
+        elif action == "redo":
+            entry = await run_in(FILE_IO, store.redo)
+        else:
+            entry = await run_in(FILE_IO, store.checkout, version)
+        if entry is None:
+            return None
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_stl = os.path.join(output_dir, f"output_{timestamp}_v{entry.version}.stl")
+        script_path = os.path.join(output_dir, "current_design.py")
+
+        def write_files():
+            code = store.script(entry.version)
+            stl_data = store.stl(entry.version)
+            with open(script_path, "w") as f:
+                f.write(code.replace("output.stl", output_stl.replace("\\", "\\\\")))
+            with open(output_stl, "wb") as f:
+                f.write(stl_data)
+            return stl_data
+
+        stl_data = await run_in(FILE_IO, write_files)
+        print(f"[CadAgent DEBUG] [DESIGNS] {action} -> v{entry.version}")
+        return {
+            "format": "stl",
+            "file_path": output_stl,
+            "size": len(stl_data),
+            "mesh": await self._mesh_stats(output_stl, stl_data),
+            "version": entry.version
+        }
+
+    async def _load_current_script(self, work_dir: str) -> str:
+        """The script of the current design version, or of 'current_design.py' if there is no history yet."""
+        store = self._get_store(work_dir)
+        # The stored script is the clean one, with 'output.stl' rather than an injected path
+        existing_code = await run_in(FILE_IO, store.current_script) or ""
+        if existing_code:
+            print(f"[CadAgent DEBUG] [DESIGNS] Using v{store.current}")
+            return existing_code
+
+        script_path = os.path.join(work_dir, "current_design.py")
+        if not os.path.exists(script_path):
+            return ""
+        with open(script_path, "r") as f:
+            existing_code = f.read()
+
+        # Sanitize existing code: replace any absolute paths with 'output.stl'
+        # This prevents the LLM from seeing/reproducing Windows paths that cause Unicode escape errors
+        # Match both escaped (\\) and unescaped (\) Windows paths to output.stl
+        existing_code = re.sub(
+            r"['\"]C:\\\\?Users\\\\?[^'\"]+\\\\?output[^'\"]*\.stl['\"]",
+            "'output.stl'",
+            existing_code
+        )
+        # Also handle forward-slash variants
+        existing_code = re.sub(
+            r"['\"]C:/Users/[^'\"]+/output[^'\"]*\.stl['\"]",
+            "'output.stl'",
+            existing_code
+        )
+        return existing_code
+
+    async def get_parameters(self, output_dir: str) -> List[dict]:
+        """Typed table of the current design's top-level numeric constants."""
+        code = await self._load_current_script(output_dir)
+        return [param.to_dict() for param in extract_parameters(code)] if code else []
+
+    async def set_parameters(self, updates: dict, output_dir: str):
+        """
+        Parametric fast path: rewrites the given constants in the current script and re-runs it on a
+        warm worker, without asking the model. Raises ParameterError for unknown names, bad values or
+        a script that fails with the new values (the current design is left untouched then).
+        """
+        started = time.monotonic()
+        work_dir = output_dir
+        code = await self._load_current_script(work_dir)
+        if not code:
+            raise ParameterError("There is no current design to change.")
+        new_code = apply_parameters(code, updates)
+        summary = ", ".join(f"{name}={value}" for name, value in updates.items())
+        print(f"[CadAgent DEBUG] [PARAMS] Setting {summary}")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_stl = os.path.join(work_dir, f"output_{timestamp}.stl")
+        script_path = os.path.join(work_dir, "current_design.py")
+        safe_output_path = output_stl.replace("\\", "\\\\")
+
+        cached = await self._cache_get(work_dir, script_key(new_code))
+        if cached:
+            result = await self._serve_cached(cached, script_path, output_stl)
+        else:
+            # Run a scratch copy first so a failing value does not replace the current script
+            trial_path = os.path.join(work_dir, ".cache", "parameters_trial.py")
+
+            def write_trial():
+                os.makedirs(os.path.dirname(trial_path), exist_ok=True)
+                with open(trial_path, "w") as f:
+                    f.write(new_code.replace("output.stl", safe_output_path))
+
+            await run_in(FILE_IO, write_trial)
+            error_msg, stl_data = await self._run_script(trial_path, work_dir, output_stl)
+            if error_msg is not None or stl_data is None:
+                error_lines = (error_msg or "No STL was exported").strip().split('\n')
+                raise ParameterError(f"The design failed with {summary}: {error_lines[-1][:200]}")
+
+            await run_in(FILE_IO, os.replace, trial_path, script_path)
+            await self._cache_put(work_dir, [script_key(new_code)], new_code, stl_data,
+                                  {"prompt": f"Set {summary}", "created": datetime.now().isoformat()})
+            result = {
+                "format": "stl",
+                "file_path": output_stl,
+                "size": len(stl_data),
+                "mesh": await self._mesh_stats(output_stl, stl_data)
+            }
+
+        stl_bytes = cached.stl if cached else stl_data
+        result["version"] = await self._record_version(work_dir, new_code, stl_bytes, f"Set {summary}", "parameters", started,
+                                                       {"parameters": updates})
+        result["parameters"] = [param.to_dict() for param in extract_parameters(new_code)]
+        print(f"[CadAgent DEBUG] [PARAMS] Rebuilt in {time.monotonic() - started:.2f}s")
+        return result
+
+    async def _serve_cached(self, entry, script_path: str, output_stl: str):
+        """Puts a cached script and STL in place as if they had just been generated."""
+        safe_output_path = output_stl.replace("\\", "\\\\")
+
+        def write_files():
+            with open(script_path, "w") as f:
+                f.write(entry.script.replace("output.stl", safe_output_path))
+            with open(output_stl, "wb") as f:
+                f.write(entry.stl)
+
+        await run_in(FILE_IO, write_files)
+        return {
+            "format": "stl",
+            "file_path": output_stl,
+            "size": len(entry.stl),
+            "mesh": await self._mesh_stats(output_stl, entry.stl),
+            "cached": True
+        }
+
     async def generate_prototype(self, prompt: str, output_dir: Optional[str] = None):
         """
         Generates 3D geometry by asking Gemini for a script, then running it LOCALLY.
@@ -68,6 +557,7 @@ export_stl(result_part, 'output.stl')
             output_dir: Directory to save the script and STL. If None, uses temp dir.
         """
         print(f"[CadAgent DEBUG] [START] Generation started for: '{prompt}'")
+        started = time.monotonic()
         
         try:
             # Use provided output_dir or fall back to temp
@@ -83,10 +573,62 @@ export_stl(result_part, 'output.stl')
             output_stl = os.path.join(work_dir, f"output_{timestamp}.stl")
             script_path = os.path.join(work_dir, "current_design.py")
 
+            # Same prompt, model and instructions as an earlier run: skip Gemini and build123d entirely
+            request_key = prompt_key(prompt, self.model, self.system_instruction)
+            cached = await self._cache_get(work_dir, request_key)
+            if cached:
+                print(f"[CadAgent DEBUG] [CACHE] Hit for prompt: '{prompt}'")
+                result = await self._serve_cached(cached, script_path, output_stl)
+                result["version"] = await self._record_version(work_dir, cached.script, cached.stl, prompt, "generate", started, {"cached": True})
+                return result
+
             max_retries = 3
             current_prompt = f"You are a build123d expert. Write a generic python script to create a 3D model of: {prompt}. Ensure you export to 'output.stl'. Unscaled."
+            first_attempt = 0
+
+            if self.speculative_candidates > 1:
+                # Speculative first attempt; a failure falls through to the sequential fix-up loop
+                if self.on_status:
+                    self.on_status({
+                        "status": "generating",
+                        "attempt": 1,
+                        "max_attempts": max_retries,
+                        "candidates": self.speculative_candidates,
+                        "error": None
+                    })
+                winner, first_error = await self._speculate(current_prompt, work_dir, max_retries)
+                if winner:
+                    code, stl_data = winner["code"], winner["stl"]
+
+                    def adopt():
+                        with open(script_path, "w") as f:
+                            f.write(code.replace("output.stl", output_stl.replace("\\", "\\\\")))
+                        os.replace(winner["stl_path"], output_stl)
+
+                    await run_in(FILE_IO, adopt)
+                    await self._cache_put(work_dir, [request_key, script_key(code)], code, stl_data,
+                                          {"prompt": prompt, "model": self.model, "created": datetime.now().isoformat()})
+                    return {
+                        "format": "stl",
+                        "file_path": output_stl,
+                        "size": len(stl_data),
+                        "mesh": await self._mesh_stats(output_stl, stl_data),
+                        "candidate": winner["index"],
+                        "version": await self._record_version(work_dir, code, stl_data, prompt, "generate", started,
+                                                              {"candidate": winner["index"]})
+                    }
+                first_attempt = 1
+                if first_error:
+                    current_prompt = f"""
+The Python script you generated failed to execute with the following error:
+{first_error}
+
+Please fix the code to resolve this error. Return the full corrected script. 
+Ensure you still export to 'output.stl'.
+Original request: {prompt}
+"""
             
-            for attempt in range(max_retries):
+            for attempt in range(first_attempt, max_retries):
                 print(f"[CadAgent DEBUG] Attempt {attempt + 1}/{max_retries}")
                 
                 # Emit status update
@@ -100,46 +642,16 @@ export_stl(result_part, 'output.stl')
                     self.on_status(status_info)
                 
                 # 1. Ask Gemini for the code with streaming and thinking
-                raw_content = ""
-                stream = await self.client.aio.models.generate_content_stream(
-                    model=self.model,
-                    contents=current_prompt,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self.system_instruction,
-                        temperature=1.0,
-                        thinking_config=types.ThinkingConfig(include_thoughts=True)
-                    )
-                )
-                async for chunk in stream:
-                    if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                        for part in chunk.candidates[0].content.parts:
-                            if not part.text:
-                                continue
-                            elif part.thought:
-                                # Stream thought to callback
-                                if self.on_thought:
-                                    self.on_thought(part.text)
-                            else:
-                                # Accumulate answer text
-                                raw_content += part.text
-                
-                if not raw_content:
+                reply = await self._request_code(current_prompt)
+                if not reply.text:
                     print("[CadAgent DEBUG] [ERR] Empty response from model.")
                     return None
 
-                # 2. Extract Code Block
-                import re
-                code_match = re.search(r'```python(.*?)```', raw_content, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1).strip()
-                else:
-                    # Fallback: assume entire text is code if no blocks, or fail
-                    print("[CadAgent DEBUG] [WARN] No ```python block found. Trying heuristic...")
-                    if "import build123d" in raw_content:
-                        code = raw_content
-                    else:
-                        print("[CadAgent DEBUG] [ERR] Could not extract python code.")
-                        return None
+                # 2. Extract Code Block, then repair/reject it statically before paying for a process
+                code = self._reply_code(reply)
+                if code is None:
+                    return None
+                code, preflight_error = self._preflight(code)
                 
                 # 3. Save to Local File in cad_outputs folder
                 # Fix for Windows paths in python strings: escape backslashes
@@ -153,26 +665,12 @@ export_stl(result_part, 'output.stl')
                 print(f"[CadAgent DEBUG] [EXEC] Running local script: {script_path}")
                 
                 # 4. Execute Locally
-                import subprocess
-                import sys
-                
-                # Use the current Python interpreter (unified environment with build123d + mediapipe)
-                try:
-                    proc = await asyncio.to_thread(
-                        subprocess.run,
-                        [sys.executable, script_path],
-                        capture_output=True,
-                        text=True
-                    )
-                    stdout, stderr = proc.stdout, proc.stderr
-                except Exception as e:
-                     print(f"[CadAgent DEBUG] [ERR] Subprocess run failed: {e}")
-                     proc = type('obj', (object,), {'returncode': 1})
-                     stdout = ""
-                     stderr = str(e)
+                if preflight_error is not None:
+                    error_msg, stl_data = preflight_error, None
+                else:
+                    error_msg, stl_data = await self._run_script(script_path, work_dir, output_stl)
                 
-                if proc.returncode != 0:
-                    error_msg = stderr
+                if error_msg is not None:
                     # Extract a concise error message for display
                     error_lines = error_msg.strip().split('\n')
                     short_error = error_lines[-1][:100] if error_lines else "Unknown error"
@@ -200,19 +698,24 @@ Original request: {prompt}
                 
                 print(f"[CadAgent DEBUG] [OK] Script executed successfully.")
                 
-                # 5. Read Output
-                if os.path.exists(output_stl):
+                # 5. Read Output (warm workers return the STL bytes with the result)
+                if stl_data is not None or os.path.exists(output_stl):
                     print(f"[CadAgent DEBUG] [file] '{output_stl}' found.")
-                    with open(output_stl, "rb") as f:
-                        stl_data = f.read()
+                    if stl_data is None:
+                        with open(output_stl, "rb") as f:
+                            stl_data = f.read()
                         
-                    import base64
-                    b64_stl = base64.b64encode(stl_data).decode('utf-8')
-                    
+                    await self._cache_put(work_dir, [request_key, script_key(code)], code, stl_data,
+                                          {"prompt": prompt, "model": self.model, "created": datetime.now().isoformat()})
+
+                    # The mesh is served to the UI from file_path (see artifact_store), not inlined here
                     return {
                         "format": "stl",
-                        "data": b64_stl,
-                        "file_path": output_stl
+                        "file_path": output_stl,
+                        "size": len(stl_data),
+                        "mesh": await self._mesh_stats(output_stl, stl_data),
+                        "version": await self._record_version(work_dir, code, stl_data, prompt, "generate", started,
+                                                              {"attempts": attempt + 1})
                     }
                 else:
                      print(f"[CadAgent DEBUG] [ERR] '{output_stl}' was not generated.")
@@ -240,12 +743,13 @@ Original request: {prompt}
 
     async def iterate_prototype(self, prompt: str, output_dir: Optional[str] = None):
         """
-        Iterates on the existing design by reading 'current_design.py' and applying changes.
+        Iterates on the current design version (or 'current_design.py' if there is no history yet).
         Args:
             prompt: User's description of the changes to make.
             output_dir: Directory containing existing script and where to save new STL.
         """
         print(f"[CadAgent DEBUG] [START] Iteration started for: '{prompt}'")
+        started = time.monotonic()
         
         # Use provided output_dir or fall back to temp
         if output_dir:
@@ -260,37 +764,17 @@ Original request: {prompt}
         script_path = os.path.join(work_dir, "current_design.py")
         output_stl = os.path.join(work_dir, f"output_{timestamp}.stl")
         
-        existing_code = ""
-        
-        if os.path.exists(script_path):
-            with open(script_path, "r") as f:
-                existing_code = f.read()
-            
-            # Sanitize existing code: replace any absolute paths with 'output.stl'
-            # This prevents the LLM from seeing/reproducing Windows paths that cause Unicode escape errors
-            import re
-            # Match both escaped (\\) and unescaped (\) Windows paths to output.stl
-            existing_code = re.sub(
-                r"['\"]C:\\\\?Users\\\\?[^'\"]+\\\\?output[^'\"]*\.stl['\"]",
-                "'output.stl'",
-                existing_code
-            )
-            # Also handle forward-slash variants
-            existing_code = re.sub(
-                r"['\"]C:/Users/[^'\"]+/output[^'\"]*\.stl['\"]",
-                "'output.stl'",
-                existing_code
-            )
-        else:
+        existing_code = await self._load_current_script(work_dir)
+        if not existing_code:
              print("[CadAgent DEBUG] [WARN] No existing script found. Falling back to fresh generation.")
-             return await self.generate_prototype(prompt)
+             return await self.generate_prototype(prompt, output_dir=output_dir)
 
         try:
-
             max_retries = 3
             current_prompt = f"""
 You are iterating on an existing 3D model script.
 
+{self._design_history(work_dir)}
 Current Python Code:
 ```python
 {existing_code}
@@ -300,7 +784,9 @@ User Request: {prompt}
 
 Task: Rewrite the code to satisfy the user's request while maintaining the rest of the model structure.
 Ensure you still export to 'output.stl'.
-"""
+{EDIT_INSTRUCTIONS}"""
+            # The script shown to the model in current_prompt: edit blocks must apply to exactly this text
+            base_code = existing_code
             
             for attempt in range(max_retries):
                 print(f"[CadAgent DEBUG] Iteration Attempt {attempt + 1}/{max_retries}")
@@ -316,47 +802,66 @@ Ensure you still export to 'output.stl'.
                     self.on_status(status_info)
                 
                 # 1. Ask Gemini for the code with streaming and thinking
-                raw_content = ""
-                stream = await self.client.aio.models.generate_content_stream(
-                    model=self.model,
-                    contents=current_prompt,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self.system_instruction,
-                        temperature=1.0,
-                        thinking_config=types.ThinkingConfig(include_thoughts=True)
-                    )
-                )
-                async for chunk in stream:
-                    if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                        for part in chunk.candidates[0].content.parts:
-                            if not part.text:
-                                continue
-                            elif part.thought:
-                                # Stream thought to callback
-                                if self.on_thought:
-                                    self.on_thought(part.text)
-                            else:
-                                # Accumulate answer text
-                                raw_content += part.text
-                
-                if not raw_content:
+                reply = await self._request_code(current_prompt)
+                if not reply.text:
                     print("[CadAgent DEBUG] [ERR] Empty response from model.")
                     return None
 
-                # 2. Extract Code Block
-                import re
-                code_match = re.search(r'```python(.*?)```', raw_content, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1).strip()
+                # 2. Extract Code Block (or apply the edit blocks), then repair/reject it statically before paying for a process
+                used_edits = reply.language == "edit"
+                if used_edits:
+                    try:
+                        code = apply_edit_blocks(base_code, reply.code if reply.done else reply.text)
+                        print(f"[CadAgent DEBUG] [EDIT] Applied edit blocks ({len(reply.text)} chars instead of a full script).")
+                    except EditError as e:
+                        print(f"[CadAgent DEBUG] [EDIT] Edits did not apply: {e}")
+                        current_prompt = f"""
+Your edits could not be applied to the current script: {e}
+
+Current Python Code:
+```python
+{base_code}
+```
+
+User Request: {prompt}
+
+Reply with the full updated script in a ```python block. Ensure you still export to 'output.stl'.
+"""
+                        continue
                 else:
-                    # Fallback: assume entire text is code if no blocks, or fail
-                    print("[CadAgent DEBUG] [WARN] No ```python block found. Trying heuristic...")
-                    if "import build123d" in raw_content:
-                        code = raw_content
-                    else:
-                        print("[CadAgent DEBUG] [ERR] Could not extract python code.")
+                    code = self._reply_code(reply)
+                    if code is None:
                         return None
+
+                # The current design handed back as is: the requested change was not made
+                if script_key(code) == script_key(existing_code):
+                    print("[CadAgent DEBUG] [WARN] Model returned the current script unchanged.")
+                    current_prompt = f"""
+Your answer left the script unchanged, so the requested change was not made.
+
+Current Python Code:
+```python
+{existing_code}
+```
+
+User Request: {prompt}
+
+Make the requested change. Ensure you still export to 'output.stl'.
+{EDIT_INSTRUCTIONS}"""
+                    base_code = existing_code
+                    continue
+
+                code, preflight_error = self._preflight(code)
                 
+                # Previously built code (e.g. an earlier version): reuse its mesh instead of re-running it
+                cached = await self._cache_get(work_dir, script_key(code))
+                if cached:
+                    print("[CadAgent DEBUG] [CACHE] Script matches a previous build, skipping execution.")
+                    result = await self._serve_cached(cached, script_path, output_stl)
+                    result["version"] = await self._record_version(work_dir, code, cached.stl, prompt, "iterate", started, {"cached": True})
+                    result["diff"] = await self._version_diff(work_dir, result["version"])
+                    return result
+
                 # 3. Save to Local File in cad_outputs folder
                 # Overwrite the script so the next iteration builds on this one
                 
@@ -371,58 +876,65 @@ Ensure you still export to 'output.stl'.
                 print(f"[CadAgent DEBUG] [EXEC] Running local script: {script_path}")
                 
                 # 4. Execute Locally
-                import subprocess
-                import sys
-                
-                # Use asyncio.to_thread for Windows compatibility (asyncio.create_subprocess_exec
-                # throws NotImplementedError on Windows with certain event loop policies)
-                try:
-                    proc = await asyncio.to_thread(
-                        subprocess.run,
-                        [sys.executable, script_path],
-                        capture_output=True,
-                        text=True
-                    )
-                    stdout, stderr = proc.stdout, proc.stderr
-                except Exception as e:
-                    print(f"[CadAgent DEBUG] [ERR] Subprocess run failed: {e}")
-                    proc = type('obj', (object,), {'returncode': 1})()
-                    stdout = ""
-                    stderr = str(e)
+                if preflight_error is not None:
+                    error_msg, stl_data = preflight_error, None
+                else:
+                    error_msg, stl_data = await self._run_script(script_path, work_dir, output_stl)
                 
-                if proc.returncode != 0:
-                    error_msg = stderr
+                if error_msg is not None:
                     print(f"[CadAgent DEBUG] [ERR] Script Execution Failed:\n{error_msg}")
                     
-                    # Preparing feedback for next attempt
+                    # Preparing feedback for next attempt, showing the failed script the fix must start from
                     current_prompt = f"""
 The updated Python script you generated failed to execute with the following error:
 {error_msg}
 
-Please fix the code to resolve this error. Return the full corrected script. 
-Ensure you still export to 'output.stl'.
-"""
+Failed Python Code:
+```python
+{code}
+```
+
+User Request: {prompt}
+
+Please fix the code to resolve this error. Ensure you still export to 'output.stl'.
+{EDIT_INSTRUCTIONS}"""
+                    base_code = code
                     continue # Retry loop
                 
                 print(f"[CadAgent DEBUG] [OK] Script executed successfully.")
                 
-                # 5. Read Output
-                if os.path.exists(output_stl):
+                # 5. Read Output (warm workers return the STL bytes with the result)
+                if stl_data is not None or os.path.exists(output_stl):
                     print(f"[CadAgent DEBUG] [file] '{output_stl}' found.")
-                    with open(output_stl, "rb") as f:
-                        stl_data = f.read()
+                    if stl_data is None:
+                        with open(output_stl, "rb") as f:
+                            stl_data = f.read()
                         
-                    import base64
-                    b64_stl = base64.b64encode(stl_data).decode('utf-8')
-                    
+                    await self._cache_put(work_dir, [script_key(code)], code, stl_data,
+                                          {"prompt": prompt, "model": self.model, "created": datetime.now().isoformat()})
+
+                    version = await self._record_version(work_dir, code, stl_data, prompt, "iterate", started,
+                                                         {"attempts": attempt + 1, "edits": used_edits})
+                    # The mesh is served to the UI from file_path (see artifact_store), not inlined here
                     return {
                         "format": "stl",
-                        "data": b64_stl,
-                        "file_path": output_stl
+                        "file_path": output_stl,
+                        "size": len(stl_data),
+                        "mesh": await self._mesh_stats(output_stl, stl_data),
+                        "version": version,
+                        "diff": await self._version_diff(work_dir, version)
                     }
                 else:
                      print(f"[CadAgent DEBUG] [ERR] '{output_stl}' was not generated.")
-                     current_prompt = f"The script executed successfully but '{output_stl}' was not found. Ensure you call `export_stl(result_part, 'output.stl')` at the end."
+                     current_prompt = f"""
+The script executed successfully but '{output_stl}' was not found. Ensure you call `export_stl(result_part, 'output.stl')` at the end.
+
+Current Python Code:
+```python
+{code}
+```
+{EDIT_INSTRUCTIONS}"""
+                     base_code = code
                      continue
 
             # If loop finishes without success
@@ -0,0 +1,200 @@
+"""
+CadCache - Content-addressed cache of generated CAD scripts and meshes.
+
+Two kinds of key point at the same entries:
+- prompt keys: normalized prompt + model id + hash of the system instruction,
+  so asking for the same part again skips both Gemini and build123d;
+- script keys: hash of the normalized script text, so an iteration that comes
+  back with unchanged code skips re-execution.
+
+Script text and STL bytes are stored once per content hash under
+`<root>/objects/`, and `<root>/index.json` maps keys to them. When the stored
+objects exceed `max_bytes`, the least recently used entries are evicted and
+objects no longer referenced are deleted.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Quoted STL paths ('output.stl', injected absolute paths) all hash the same
+_STL_LITERAL = re.compile(r"""(['"])[^'"\n]*\.stl\1""")
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_prompt(prompt: str) -> str:
+    text = " ".join(prompt.lower().split())
+    return text.rstrip(" .!?")
+
+
+def normalize_script(code: str) -> str:
+    code = _STL_LITERAL.sub("'output.stl'", code)
+    lines = [line.rstrip() for line in code.strip().splitlines()]
+    return "\n".join(lines)
+
+
+def prompt_key(prompt: str, model: str, system_instruction: str) -> str:
+    payload = json.dumps([normalize_prompt(prompt), model, _sha256(system_instruction.encode("utf-8"))])
+    return "prompt:" + _sha256(payload.encode("utf-8"))
+
+
+def script_key(code: str) -> str:
+    return "script:" + _sha256(normalize_script(code).encode("utf-8"))
+
+
+@dataclass
+class CacheEntry:
+    script: str
+    stl: bytes
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+class CadCache:
+    """
+    Args:
+        root: Cache directory (created on first write).
+        max_bytes: Upper bound on stored script + STL bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- index ---
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    # --- objects ---
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest)
+
+    def _write_object(self, data: bytes) -> str:
+        digest = _sha256(data)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_object(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._object_path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Content addressing doubles as an integrity check
+        return data if _sha256(data) == digest else None
+
+    # --- public API ---
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            index = self._load()
+            record = index.get(key)
+            if record is None:
+                self.misses += 1
+                return None
+            script = self._read_object(record["script"])
+            stl = self._read_object(record["stl"])
+            if script is None or stl is None:
+                # Objects went missing or were corrupted; forget the entry
+                del index[key]
+                self._save()
+                self.misses += 1
+                return None
+            record["last_used"] = time.time()
+            self._save()
+            self.hits += 1
+            return CacheEntry(script=script.decode("utf-8"), stl=stl, meta=dict(record.get("meta", {})))
+
+    def put(self, key: str, script: str, stl: bytes, meta: Optional[Dict[str, Any]] = None):
+        script_bytes = script.encode("utf-8")
+        with self._lock:
+            index = self._load()
+            index[key] = {
+                "script": self._write_object(script_bytes),
+                "stl": self._write_object(stl),
+                "meta": meta or {},
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._save()
+
+    def _object_sizes(self, index) -> Dict[str, int]:
+        sizes = {}
+        for record in index.values():
+            for digest in (record["script"], record["stl"]):
+                if digest not in sizes:
+                    try:
+                        sizes[digest] = os.path.getsize(self._object_path(digest))
+                    except OSError:
+                        sizes[digest] = 0
+        return sizes
+
+    def _evict(self):
+        index = self._index
+        sizes = self._object_sizes(index)
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes or len(index) <= 1:
+                break
+            del index[key]
+            self.evictions += 1
+            still_used = {d for record in index.values() for d in (record["script"], record["stl"])}
+            for digest in list(sizes):
+                if digest not in still_used:
+                    total -= sizes.pop(digest)
+                    try:
+                        os.remove(self._object_path(digest))
+                    except OSError:
+                        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = self._load()
+            stored = sum(self._object_sizes(index).values())
+            return {
+                "entries": len(index),
+                "bytes": stored,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
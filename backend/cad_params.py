@@ -0,0 +1,128 @@
+"""
+CAD parameters - Typed table of a script's top-level numeric constants.
+
+Generated scripts usually start with plain assignments such as
+
+    num_teeth = 20          # gear teeth
+    pitch_radius = 30.0
+
+Changing one of these does not need the model: the literal is rewritten in
+place and the script re-run on a warm worker. Only assignments of a single
+name to a number literal (optionally negated) at module level count as
+parameters; derived values (`radius = diameter / 2`) follow automatically.
+"""
+
+import ast
+import io
+import tokenize
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Union
+
+Number = Union[int, float]
+
+RESERVED = {"result_part"}
+
+
+class ParameterError(ValueError):
+    pass
+
+
+@dataclass
+class CadParameter:
+    name: str
+    value: Number
+    type: str  # "int" or "float"
+    line: int
+    comment: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _literal_value(node: ast.expr) -> Optional[Number]:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        inner = _literal_value(node.operand)
+        if inner is not None:
+            return -inner if isinstance(node.op, ast.USub) else inner
+    return None
+
+
+def _line_comments(code: str) -> Dict[int, str]:
+    comments = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.COMMENT:
+                comments[token.start[0]] = token.string.lstrip("#").strip()
+    except (tokenize.TokenError, IndentationError):
+        pass
+    return comments
+
+
+def _parameter_nodes(tree: ast.Module) -> Dict[str, ast.Assign]:
+    nodes = {}
+    for stmt in tree.body:
+        if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+                and stmt.targets[0].id not in RESERVED and _literal_value(stmt.value) is not None):
+            # A name assigned twice is ambiguous; the last literal assignment wins, as at runtime
+            nodes[stmt.targets[0].id] = stmt
+    return nodes
+
+
+def extract_parameters(code: str) -> List[CadParameter]:
+    """Top-level numeric literals of a script, in source order. Returns [] for unparsable code."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    comments = _line_comments(code)
+    params = []
+    for name, stmt in _parameter_nodes(tree).items():
+        value = _literal_value(stmt.value)
+        # A comment on the same line, or on the line just above
+        comment = comments.get(stmt.lineno) or comments.get(stmt.lineno - 1)
+        params.append(CadParameter(name=name, value=value, type=type(value).__name__, line=stmt.lineno, comment=comment))
+    return sorted(params, key=lambda p: p.line)
+
+
+def _coerce(param_type: str, name: str, value) -> Number:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ParameterError(f"'{name}' must be a number, got {value!r}")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ParameterError(f"'{name}' must be a number, got {value!r}")
+    if number != number or number in (float("inf"), float("-inf")):
+        raise ParameterError(f"'{name}' must be a finite number")
+    if param_type == "int":
+        if not number.is_integer():
+            raise ParameterError(f"'{name}' must be a whole number, got {value!r}")
+        return int(number)
+    return number
+
+
+def apply_parameters(code: str, updates: Dict[str, Number]) -> str:
+    """Returns `code` with the given parameters' literals replaced. Raises ParameterError for unknown names or bad values."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise ParameterError(f"Script does not parse: {e.msg} (line {e.lineno})")
+    nodes = _parameter_nodes(tree)
+    unknown = sorted(set(updates) - set(nodes))
+    if unknown:
+        raise ParameterError(f"Unknown parameter(s): {', '.join(unknown)}. Available: {', '.join(nodes) or 'none'}")
+
+    lines = code.splitlines(keepends=True)
+    # Rewrite from the bottom up so earlier positions stay valid
+    for name in sorted(updates, key=lambda n: (nodes[n].value.lineno, nodes[n].value.col_offset), reverse=True):
+        value_node = nodes[name].value
+        current = _literal_value(value_node)
+        new_value = _coerce(type(current).__name__, name, updates[name])
+        if value_node.lineno != value_node.end_lineno:
+            raise ParameterError(f"'{name}' spans several lines and cannot be rewritten")
+        line = lines[value_node.lineno - 1]
+        raw = line.encode("utf-8")
+        literal = repr(new_value).encode("utf-8")
+        lines[value_node.lineno - 1] = (raw[:value_node.col_offset] + literal + raw[value_node.end_col_offset:]).decode("utf-8")
+    return "".join(lines)
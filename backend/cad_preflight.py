@@ -0,0 +1,255 @@
+"""
+CAD pre-flight - Static checks and auto-fixes for generated build123d scripts.
+
+Runs on the extracted code before a worker or subprocess is used. Mistakes
+the system prompt already warns about are repaired in place:
+
+- PascalCase operations (`Extrude(...)`, `Fillet(...)`) -> `extrude(...)`, `fillet(...)`
+- missing `from build123d import *` (e.g. only `import build123d`)
+- missing `result_part` (taken from the export call or the BuildPart context)
+- missing or misnamed `export_stl(result_part, 'output.stl')`
+- viewer calls (`show`, `show_object`) and their imports, which fail headless
+
+Problems that cannot be repaired (syntax errors, no part to export) are
+returned as errors for the retry prompt, so no process is launched.
+Fixes are applied as text edits at AST node positions, so comments and
+formatting are kept.
+"""
+
+import ast
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+OUTPUT_NAME = "output.stl"
+
+# Legacy/PascalCase names -> build123d functions
+PASCAL_FIXES = {
+    "MakeFace": "make_face",
+    "Extrude": "extrude",
+    "Fillet": "fillet",
+    "Chamfer": "chamfer",
+    "Revolve": "revolve",
+    "Loft": "loft",
+    "Sweep": "sweep",
+    "Offset": "offset",
+    "Mirror": "mirror",
+    "Split": "split",
+    "Scale": "scale",
+    "Section": "section",
+    "Thicken": "thicken",
+    "MakeHull": "make_hull",
+    "ExportSTL": "export_stl",
+    "ExportStl": "export_stl",
+}
+
+VIEWER_MODULES = ("ocp_vscode", "cq_editor", "jupyter_cadquery")
+VIEWER_CALLS = ("show", "show_object", "show_all", "set_port")
+
+
+@dataclass
+class PreflightResult:
+    code: str
+    fixes: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def error_message(self) -> Optional[str]:
+        """Text for the retry prompt, in the place of a traceback."""
+        if self.ok:
+            return None
+        return "Pre-flight check failed (the script was not run):\n" + "\n".join(f"- {e}" for e in self.errors)
+
+
+class _Edits:
+    """Collects text replacements addressed by AST (lineno, col_offset) positions."""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.lines = code.splitlines(keepends=True)
+        self.starts = [0]
+        for line in self.lines:
+            self.starts.append(self.starts[-1] + len(line))
+        self.edits: List[Tuple[int, int, str]] = []
+        self._terminated = False
+
+    def offset(self, lineno: int, col: int) -> int:
+        if lineno > len(self.lines):
+            return len(self.code)
+        # col_offset counts UTF-8 bytes
+        line = self.lines[lineno - 1]
+        return self.starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def replace(self, node: ast.AST, text: str):
+        self.edits.append((self.offset(node.lineno, node.col_offset), self.offset(node.end_lineno, node.end_col_offset), text))
+
+    def remove_statement(self, node: ast.stmt):
+        start = self.starts[node.lineno - 1]
+        end = self.starts[node.end_lineno] if node.end_lineno < len(self.starts) else len(self.code)
+        self.edits.append((start, end, ""))
+
+    def insert_line(self, lineno: int, text: str):
+        """Inserts `text` as a new line before line `lineno` (1-based; past the end appends)."""
+        pos = self.starts[min(lineno - 1, len(self.lines))]
+        if pos == len(self.code) and self.code and not self.code.endswith("\n") and not self._terminated:
+            # First append to a file without a final newline
+            text = "\n" + text
+            self._terminated = True
+        self.edits.append((pos, pos, text + "\n"))
+
+    def source(self, node: ast.AST) -> str:
+        return self.code[self.offset(node.lineno, node.col_offset):self.offset(node.end_lineno, node.end_col_offset)]
+
+    def apply(self) -> str:
+        code = self.code
+        # Back to front, so earlier offsets stay valid; inserts at the same spot keep the order they were added in
+        order = sorted(range(len(self.edits)), key=lambda i: (self.edits[i][0], self.edits[i][1], i), reverse=True)
+        for start, end, text in (self.edits[i] for i in order):
+            code = code[:start] + text + code[end:]
+        return code
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _defined_names(tree: ast.Module) -> set:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != "*":
+                    names.add((alias.asname or alias.name).split(".")[0])
+    return names
+
+
+def _is_viewer_import(node: ast.stmt) -> bool:
+    if isinstance(node, ast.ImportFrom):
+        return (node.module or "").split(".")[0] in VIEWER_MODULES
+    if isinstance(node, ast.Import):
+        return all(alias.name.split(".")[0] in VIEWER_MODULES for alias in node.names)
+    return False
+
+
+def _import_position(tree: ast.Module) -> int:
+    """Line before which a new import goes: after the module docstring and __future__ imports."""
+    lineno = 1
+    for i, node in enumerate(tree.body):
+        is_docstring = i == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+        is_future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+        if not (is_docstring or is_future):
+            break
+        lineno = node.end_lineno + 1
+    return lineno
+
+
+def preflight(code: str) -> PreflightResult:
+    """Checks (and where possible repairs) a generated build123d script. Pure and fast: no imports, no execution."""
+    start = time.perf_counter()
+    result = PreflightResult(code=code)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        result.errors.append(f"SyntaxError: {e.msg} (line {e.lineno})")
+        result.duration = time.perf_counter() - start
+        return result
+
+    edits = _Edits(code)
+    defined = _defined_names(tree)
+    calls = [node for node in ast.walk(tree) if isinstance(node, ast.Call)]
+
+    # 1. PascalCase operations, unless the script defines that name itself
+    renamed = set()
+    for call in calls:
+        if isinstance(call.func, ast.Name) and call.func.id in PASCAL_FIXES and call.func.id not in defined:
+            edits.replace(call.func, PASCAL_FIXES[call.func.id])
+            renamed.add(call.func.id)
+    for name in sorted(renamed):
+        result.fixes.append(f"Renamed {name}() to {PASCAL_FIXES[name]}()")
+
+    # 2. Viewer calls and imports (top-level statements only, so no block is left empty)
+    for node in tree.body:
+        if _is_viewer_import(node):
+            edits.remove_statement(node)
+            result.fixes.append(f"Removed viewer import on line {node.lineno}")
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and _call_name(node.value) in VIEWER_CALLS:
+            edits.remove_statement(node)
+            result.fixes.append(f"Removed {_call_name(node.value)}() call on line {node.lineno}")
+
+    # 3. Star import
+    has_star = any(isinstance(node, ast.ImportFrom) and node.module == "build123d" and any(a.name == "*" for a in node.names)
+                   for node in ast.walk(tree))
+    if not has_star:
+        edits.insert_line(_import_position(tree), "from build123d import *")
+        result.fixes.append("Added missing `from build123d import *`")
+
+    # 4. result_part and the export
+    exports = [call for call in calls if _call_name(call) == "export_stl" or (isinstance(call.func, ast.Name) and PASCAL_FIXES.get(call.func.id) == "export_stl")]
+    has_result_part = "result_part" in defined
+
+    if not has_result_part:
+        part_source = None
+        anchor = None
+        if exports and exports[0].args and not (isinstance(exports[0].args[0], ast.Name) and exports[0].args[0].id == "result_part"):
+            part_source = edits.source(exports[0].args[0])
+            anchor = next((stmt for stmt in tree.body if stmt.lineno <= exports[0].lineno <= stmt.end_lineno), None)
+        else:
+            for stmt in reversed(tree.body):
+                if isinstance(stmt, ast.With):
+                    builder = next((item for item in stmt.items if isinstance(item.context_expr, ast.Call)
+                                    and _call_name(item.context_expr) == "BuildPart" and isinstance(item.optional_vars, ast.Name)), None)
+                    if builder:
+                        part_source = f"{builder.optional_vars.id}.part"
+                        break
+                if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+                        and isinstance(stmt.value, (ast.Call, ast.BinOp, ast.Attribute))):
+                    part_source = stmt.targets[0].id
+                    break
+            anchor = next((stmt for stmt in tree.body if any(n is exports[0] for n in ast.walk(stmt))), None) if exports else None
+
+        if part_source is None:
+            result.errors.append("No `result_part` is assigned and no final part could be found. Assign the final solid to `result_part`.")
+        else:
+            insert_at = anchor.lineno if anchor is not None and anchor.col_offset == 0 else len(edits.lines) + 1
+            edits.insert_line(insert_at, f"result_part = {part_source}")
+            result.fixes.append(f"Added `result_part = {part_source}`")
+            has_result_part = True
+
+    if not exports:
+        if has_result_part:
+            edits.insert_line(len(edits.lines) + 1, f"export_stl(result_part, '{OUTPUT_NAME}')")
+            result.fixes.append(f"Added missing `export_stl(result_part, '{OUTPUT_NAME}')`")
+        else:
+            result.errors.append(f"The script never exports the part. End it with `export_stl(result_part, '{OUTPUT_NAME}')`.")
+    else:
+        for call in exports:
+            target = call.args[1] if len(call.args) > 1 else next((kw.value for kw in call.keywords if kw.arg in ("file_path", "path")), None)
+            if isinstance(target, ast.Constant) and isinstance(target.value, str) and OUTPUT_NAME not in target.value:
+                edits.replace(target, repr(OUTPUT_NAME))
+                result.fixes.append(f"Export path {target.value!r} changed to '{OUTPUT_NAME}'")
+
+    if edits.edits:
+        fixed = edits.apply()
+        try:
+            ast.parse(fixed)
+            result.code = fixed
+        except SyntaxError as e:
+            # Should not happen; keep the original rather than make things worse
+            result.fixes = []
+            result.errors.append(f"Auto-fix produced invalid code ({e.msg}); fix the script manually.")
+
+    result.duration = time.perf_counter() - start
+    return result
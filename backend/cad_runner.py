@@ -0,0 +1,278 @@
+"""
+ScriptRunner - Runs generated build123d scripts in a child Python process.
+
+- Hard wall-clock timeout: the process (and its process group on POSIX) is
+  killed when it runs too long.
+- Memory limit: RLIMIT_AS is applied in the child on POSIX, so a runaway
+  script fails with MemoryError instead of swapping the machine.
+- Cancellation: cancelling the awaiting asyncio task kills the child.
+- Streamed stderr: stderr is read line by line and the first complete
+  traceback is kept for the retry prompt. A script that prints a traceback
+  and keeps running (a hang after an error) is stopped after `error_grace`
+  seconds; one that exits on its own is judged by its exit code alone, so a
+  traceback a library logs and handles does not fail the script.
+- Success means exit code 0 and, when an output path is given, the output
+  file written; its bytes are returned in ScriptResult.output.
+
+On POSIX the runner uses asyncio.create_subprocess_exec. Where that is not
+available (Windows with a selector event loop) it falls back to
+subprocess.Popen on the "cad-scripts" executor pool.
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from executors import CAD_SCRIPTS, run_in
+
+
+class CadJobCancelled(Exception):
+    """Raised to the caller of a CAD job that was cancelled or superseded by a newer one."""
+
+
+@dataclass
+class ScriptResult:
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+    first_error: Optional[str] = None  # First complete traceback seen on stderr
+    output: Optional[bytes] = None  # Output file contents, when the runner was given an output path
+    missing_output: bool = False  # Exited cleanly but did not write the expected output file
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.missing_output
+
+    @property
+    def memory_exceeded(self) -> bool:
+        return "MemoryError" in (self.first_error or self.stderr)
+
+    @property
+    def error_message(self) -> str:
+        """The text to show the model in a retry prompt."""
+        if self.timed_out:
+            return "The script was stopped because it exceeded the time limit. Simplify the geometry or avoid long loops."
+        if self.memory_exceeded:
+            return f"The script ran out of memory (MemoryError). Reduce model complexity.\n{self.first_error or ''}".strip()
+        if self.missing_output and self.returncode == 0:
+            return "The script executed successfully but did not export the output file."
+        return self.first_error or self.stderr or f"Script exited with code {self.returncode}"
+
+
+class TracebackCollector:
+    """Collects stderr lines and recognises when the first traceback is complete."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self._tb_start: Optional[int] = None
+        self.first_error: Optional[str] = None
+
+    def feed(self, line: str) -> bool:
+        """Add a line. Returns True when this line completed the first traceback."""
+        line = line.rstrip("\r\n")
+        self.lines.append(line)
+        if self.first_error is not None:
+            return False
+        if self._tb_start is None:
+            if line.startswith("Traceback (most recent call last)"):
+                self._tb_start = len(self.lines) - 1
+            return False
+        # Frames, source lines and carets are indented; the "SomeError: message" line is not
+        if line and not line[0].isspace():
+            self.first_error = "\n".join(self.lines[self._tb_start:])
+            return True
+        return False
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class ScriptRunner:
+    """
+    Args:
+        timeout: Wall-clock limit in seconds.
+        memory_limit_mb: Address-space limit for the child (POSIX only). None disables it.
+        stop_on_first_error: Kill the child if it is still running `error_grace` seconds after a full traceback.
+        error_grace: Seconds a child may keep running after printing a traceback.
+        python: Interpreter used to run scripts.
+    """
+
+    def __init__(self, timeout: float = 120.0, memory_limit_mb: Optional[int] = 4096,
+                 stop_on_first_error: bool = True, error_grace: float = 2.0, python: str = sys.executable):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.stop_on_first_error = stop_on_first_error
+        self.error_grace = error_grace
+        self.python = python
+
+    def _preexec(self):
+        # Runs in the child between fork and exec
+        if self.memory_limit_mb:
+            import resource
+            limit = self.memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    async def run(self, script_path: str, cwd: Optional[str] = None,
+                  on_stderr: Optional[Callable[[str], None]] = None,
+                  output_path: Optional[str] = None) -> ScriptResult:
+        """
+        Run `script_path` and return its ScriptResult. If `output_path` is given, the script must write it
+        (relative paths are resolved against `cwd`). Raises CancelledError (after killing the child) if cancelled.
+        """
+        args = [self.python, script_path]
+        result = None
+        if os.name == "posix":
+            try:
+                result = await self._run_async(args, cwd, on_stderr)
+            except NotImplementedError:
+                pass
+        if result is None:
+            result = await self._run_threaded(args, cwd, on_stderr)
+        if output_path and result.returncode == 0 and not result.timed_out:
+            path = os.path.join(cwd or "", output_path)
+            try:
+                with open(path, "rb") as f:
+                    result.output = f.read()
+            except OSError:
+                result.missing_output = True
+        return result
+
+    # --- asyncio subprocess (POSIX) ---
+
+    async def _run_async(self, args, cwd, on_stderr) -> ScriptResult:
+        start = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=self._preexec,
+            start_new_session=True,
+        )
+        collector = TracebackCollector()
+        stdout_task = asyncio.ensure_future(proc.stdout.read())
+        grace = None  # Kills the child if it keeps running after a traceback
+
+        async def read_stderr():
+            nonlocal grace
+            while True:
+                raw = await proc.stderr.readline()
+                if not raw:
+                    return
+                line = raw.decode("utf-8", errors="replace")
+                if on_stderr:
+                    on_stderr(line.rstrip("\r\n"))
+                if collector.feed(line) and self.stop_on_first_error:
+                    grace = asyncio.get_running_loop().call_later(self.error_grace, self._kill_async, proc)
+
+        timed_out = False
+        try:
+            try:
+                await asyncio.wait_for(read_stderr(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self._kill_async(proc)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=max(self.timeout - (time.monotonic() - start), 0.1))
+            except asyncio.TimeoutError:
+                # stderr closed but the process lingers (e.g. closed its stderr, then hung)
+                timed_out = True
+                self._kill_async(proc)
+                await proc.wait()
+            stdout = await stdout_task
+        except asyncio.CancelledError:
+            print(f"[CAD RUNNER] Cancelled, killing pid {proc.pid}")
+            self._kill_async(proc)
+            stdout_task.cancel()
+            raise
+        finally:
+            if grace:
+                grace.cancel()
+
+        return ScriptResult(
+            returncode=proc.returncode,
+            stdout=stdout.decode("utf-8", errors="replace"),
+            stderr=collector.text,
+            duration=time.monotonic() - start,
+            timed_out=timed_out,
+            first_error=collector.first_error,
+        )
+
+    @staticmethod
+    def _kill_async(proc):
+        if proc.returncode is not None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+
+    # --- thread fallback ---
+
+    async def _run_threaded(self, args, cwd, on_stderr) -> ScriptResult:
+        holder = {}
+        cancelled = threading.Event()
+
+        def target():
+            start = time.monotonic()
+            proc = subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True, errors="replace")
+            holder["proc"] = proc
+            if cancelled.is_set():
+                proc.kill()
+
+            out: List[str] = []
+            reader = threading.Thread(target=lambda: out.append(proc.stdout.read()), daemon=True)
+            reader.start()
+
+            state = {"timed_out": False}
+
+            def on_timeout():
+                state["timed_out"] = True
+                proc.kill()
+
+            timer = threading.Timer(self.timeout, on_timeout)
+            timer.start()
+            grace = threading.Timer(self.error_grace, proc.kill)
+            collector = TracebackCollector()
+            try:
+                for line in proc.stderr:
+                    if on_stderr:
+                        on_stderr(line.rstrip("\r\n"))
+                    if collector.feed(line) and self.stop_on_first_error:
+                        grace.start()
+                proc.wait()
+            finally:
+                timer.cancel()
+                grace.cancel()
+            reader.join(timeout=1.0)
+            return ScriptResult(
+                returncode=proc.returncode,
+                stdout="".join(out),
+                stderr=collector.text,
+                duration=time.monotonic() - start,
+                timed_out=state["timed_out"],
+                first_error=collector.first_error,
+            )
+
+        try:
+            return await run_in(CAD_SCRIPTS, target)
+        except asyncio.CancelledError:
+            cancelled.set()
+            proc = holder.get("proc")
+            if proc is not None and proc.poll() is None:
+                print(f"[CAD RUNNER] Cancelled, killing pid {proc.pid}")
+                proc.kill()
+            raise
@@ -0,0 +1,84 @@
+"""
+CodeFenceExtractor - Finds the ```python block in a streamed LLM answer as it arrives.
+
+The answer text is fed chunk by chunk. Each chunk is scanned once (plus a
+few characters carried over, so a fence split across chunks is still found),
+and text is collected in list / io.StringIO buffers instead of by repeated
+string concatenation. As soon as the closing fence is seen, `feed` returns
+the code, so the caller can stop reading the stream and check / run the
+script without waiting for the prose the model writes after it.
+
+Extraction matches CadAgent's regex: the text between the first "```python"
+and the next "```", stripped. Other fence languages (e.g. "edit" for
+iteration edit blocks) can be accepted too; `language` tells which matched.
+CadAgent uses the finished extractor as the model's reply: `code` when a
+block closed, `text` for the fallback extraction when none did.
+"""
+
+import io
+from typing import List, Optional, Sequence
+
+CLOSE_FENCE = "```"
+
+
+class CodeFenceExtractor:
+    def __init__(self, languages: Sequence[str] = ("python",)):
+        self._open_fences = [CLOSE_FENCE + language for language in languages]
+        self._longest_fence = max(len(fence) for fence in self._open_fences)
+        self._text = io.StringIO()
+        self._code_parts: List[str] = []
+        self._carry = ""
+        self._state = "prose"  # prose -> code -> done
+        self.language: Optional[str] = None
+        self.code: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    @property
+    def in_code(self) -> bool:
+        return self._state == "code"
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._text.getvalue()
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Adds a chunk. Returns the code once, on the chunk that closes the block."""
+        if not chunk:
+            return None
+        self._text.write(chunk)
+        if self._state == "done":
+            return None
+
+        data = self._carry + chunk
+        self._carry = ""
+        if self._state == "prose":
+            matches = [(data.find(fence), fence) for fence in self._open_fences]
+            matches = [(index, fence) for index, fence in matches if index >= 0]
+            if not matches:
+                # Keep a partial "```pyth" for the next chunk
+                self._carry = data[-(self._longest_fence - 1):]
+                return None
+            index, fence = min(matches)
+            self._state = "code"
+            self.language = fence[len(CLOSE_FENCE):]
+            data = data[index + len(fence):]
+
+        index = data.find(CLOSE_FENCE)
+        if index < 0:
+            keep = len(CLOSE_FENCE) - 1
+            if len(data) > keep:
+                self._code_parts.append(data[:-keep])
+                self._carry = data[-keep:]
+            else:
+                self._carry = data
+            return None
+
+        self._code_parts.append(data[:index])
+        self._state = "done"
+        self.code = "".join(self._code_parts).strip()
+        self._code_parts = []
+        return self.code
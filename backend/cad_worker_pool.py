@@ -0,0 +1,295 @@
+"""
+CadWorkerPool - Warm, pre-imported Python workers for build123d scripts.
+
+Importing build123d/OCP takes several seconds and used to be paid by every
+CAD attempt, since each one started a fresh interpreter. The pool keeps
+worker processes that have build123d imported already and runs each script
+in a fresh namespace with runpy.
+
+On POSIX the workers are forked from a forkserver that preloads build123d, so
+replacing a recycled worker is fast too. Elsewhere workers are spawned and
+import build123d on start-up.
+
+Workers are recycled after `max_jobs` scripts or once their peak RSS passes
+`max_rss_mb`, because scripts can leave global state and memory behind. A
+worker that times out or is cancelled is killed and replaced.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional, Sequence
+
+from cad_runner import ScriptResult
+from executors import CAD_SCRIPTS, run_in
+
+PRELOAD_MODULES = ("build123d",)
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _worker_main(conn, preload: Sequence[str], memory_limit_mb: Optional[int]):
+    """Worker process loop: run scripts sent over `conn` until told to exit."""
+    for name in preload:
+        try:
+            __import__(name)
+        except Exception as e:
+            print(f"[CAD WORKER] Preload of {name} failed: {e}", file=sys.stderr)
+    if memory_limit_mb and os.name == "posix":
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    import runpy
+    conn.send({"ready": True})
+    base_cwd = os.getcwd()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        script_path, output_path, cwd = job
+        out, err = io.StringIO(), io.StringIO()
+        start = time.monotonic()
+        error = None
+        try:
+            os.chdir(cwd or base_cwd)
+            with redirect_stdout(out), redirect_stderr(err):
+                runpy.run_path(script_path, run_name="__main__")
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                error = f"SystemExit: {e.code}"
+        except BaseException:
+            error = traceback.format_exc()
+        finally:
+            os.chdir(base_cwd)
+
+        output = None
+        if error is None and output_path and os.path.exists(output_path):
+            with open(output_path, "rb") as f:
+                output = f.read()
+        conn.send({
+            "error": error,
+            "output": output,
+            "stdout": out.getvalue(),
+            "stderr": err.getvalue(),
+            "duration": time.monotonic() - start,
+            "rss_mb": _peak_rss_mb(),
+        })
+
+
+class _Worker:
+    def __init__(self, ctx, preload, memory_limit_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, tuple(preload), memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.rss_mb = 0.0
+
+    def wait_ready(self, timeout: float) -> bool:
+        if self.conn.poll(timeout):
+            try:
+                return bool(self.conn.recv().get("ready"))
+            except (EOFError, OSError):
+                return False
+        return False
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.kill()
+
+
+class CadWorkerPool:
+    """
+    Args:
+        size: Number of warm workers.
+        max_jobs: Recycle a worker after this many scripts.
+        max_rss_mb: Recycle a worker once its peak RSS exceeds this.
+        memory_limit_mb: Hard address-space limit inside workers (POSIX only).
+        timeout: Per-script wall-clock limit; the worker is killed when it is hit.
+    """
+
+    def __init__(self, size: int = 1, max_jobs: int = 25, max_rss_mb: float = 1500,
+                 memory_limit_mb: Optional[int] = 4096, timeout: float = 120.0,
+                 preload: Sequence[str] = PRELOAD_MODULES, start_timeout: float = 60.0):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.memory_limit_mb = memory_limit_mb
+        self.timeout = timeout
+        self.preload = tuple(preload)
+        self.start_timeout = start_timeout
+
+        if os.name == "posix":
+            self._ctx = multiprocessing.get_context("forkserver")
+            # Only takes effect if the forkserver has not been started yet in this process
+            self._ctx.set_forkserver_preload(list(self.preload))
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._available: Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+        # Stats
+        self.jobs_run = 0
+        self.workers_started = 0
+        self.workers_recycled = 0
+        self.workers_killed = 0
+
+    def reserve(self, size: int):
+        """Raises the number of warm workers (and of scripts run at once) to at least `size`. Workers start on demand."""
+        with self._lock:
+            if size <= self.size:
+                return
+            added, self.size = size - self.size, size
+        if self._available is not None:
+            for _ in range(added):
+                self._available.release()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.preload, self.memory_limit_mb)
+        if not worker.wait_ready(self.start_timeout):
+            worker.kill()
+            raise RuntimeError("CAD worker failed to start")
+        self.workers_started += 1
+        return worker
+
+    def start(self):
+        """Start workers up to `size`. Blocking (pays the build123d import once); run it in a worker thread."""
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) >= self.size:
+                    return
+            worker = self._spawn()
+            with self._lock:
+                if self._closed:
+                    worker.close()
+                    return
+                self._idle.append(worker)
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._spawn()
+
+    def _checkin(self, worker: _Worker):
+        if worker.jobs >= self.max_jobs or worker.rss_mb >= self.max_rss_mb:
+            print(f"[CAD POOL] Recycling worker after {worker.jobs} jobs ({worker.rss_mb:.0f} MB peak RSS)")
+            self.workers_recycled += 1
+            worker.close()
+            # Replace it now so the next job does not pay the start-up
+            try:
+                self.start()
+            except Exception as e:
+                print(f"[CAD POOL] [WARN] Could not replace worker: {e}")
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(worker)
+                return
+        worker.close()
+
+    def _roundtrip(self, worker: _Worker, job, timeout: float):
+        worker.conn.send(job)
+        if not worker.conn.poll(timeout):
+            return None
+        return worker.conn.recv()
+
+    async def run(self, script_path: str, output_path: Optional[str] = None,
+                  cwd: Optional[str] = None, timeout: Optional[float] = None) -> ScriptResult:
+        """Run a script on a warm worker. The STL at `output_path` is returned in ScriptResult.output."""
+        if self._closed:
+            raise RuntimeError("CadWorkerPool is closed")
+        if self._available is None:
+            self._available = asyncio.Semaphore(self.size)
+        timeout = timeout or self.timeout
+
+        async with self._available:
+            worker = await run_in(CAD_SCRIPTS, self._checkout)
+            start = time.monotonic()
+            try:
+                reply = await run_in(CAD_SCRIPTS, self._roundtrip, worker,
+                                     (os.path.abspath(script_path), output_path, cwd), timeout)
+            except asyncio.CancelledError:
+                # Killing the worker also unblocks the thread waiting on its pipe
+                print(f"[CAD POOL] Cancelled, killing worker pid {worker.process.pid}")
+                self.workers_killed += 1
+                worker.kill()
+                raise
+            except (EOFError, OSError) as e:
+                # Worker died mid-job (segfault in OCP, hard memory limit, ...)
+                self.workers_killed += 1
+                worker.kill()
+                return ScriptResult(returncode=worker.process.exitcode, stdout="", stderr=str(e) or "CAD worker exited unexpectedly",
+                                    duration=time.monotonic() - start)
+
+            if reply is None:
+                self.workers_killed += 1
+                worker.kill()
+                return ScriptResult(returncode=None, stdout="", stderr="", duration=time.monotonic() - start, timed_out=True)
+
+            self.jobs_run += 1
+            worker.jobs += 1
+            worker.rss_mb = reply["rss_mb"]
+            await run_in(CAD_SCRIPTS, self._checkin, worker)
+
+        error = reply["error"]
+        return ScriptResult(
+            returncode=0 if error is None else 1,
+            stdout=reply["stdout"],
+            stderr=(reply["stderr"] + (error or "")),
+            duration=reply["duration"],
+            first_error=error,
+            output=reply["output"],
+            missing_output=error is None and output_path is not None and reply["output"] is None,
+        )
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.close()
+
+    def get_stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            "size": self.size,
+            "idle": idle,
+            "jobs_run": self.jobs_run,
+            "workers_started": self.workers_started,
+            "workers_recycled": self.workers_recycled,
+            "workers_killed": self.workers_killed,
+        }
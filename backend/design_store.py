@@ -0,0 +1,265 @@
+"""
+DesignStore - Versioned history of a project's CAD designs.
+
+Every successful generation or iteration is appended as a version:
+
+    <cad_dir>/.designs/log.jsonl     one JSON record per version (append-only)
+    <cad_dir>/.designs/objects/<sha> script text and STL bytes, stored once per content hash
+    <cad_dir>/.designs/head.json     current version and redo stack
+
+Records hold the prompt, parent version, script/STL hashes and timings.
+Versions are numbered from 1 and kept in a list, so any version is an O(1)
+lookup. Every version's parent is the version that was current when it was
+recorded, so undo also steps back across a fresh generation; `kind` marks
+where a new design starts. Undo moves to the parent version and redo back
+again, restoring the stored script and STL without regenerating anything.
+
+Iteration can also take the model's answer as SEARCH/REPLACE edit blocks
+(see apply_edit_blocks) instead of a full rewrite of the script.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class DesignVersion:
+    version: int
+    parent: Optional[int]
+    kind: str  # "generate", "iterate" or "parameters"
+    prompt: str
+    script: str  # sha256 of the script text
+    stl: str  # sha256 of the STL bytes
+    created: float
+    duration: float = 0.0
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if k not in ("script", "stl")}
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class DesignStore:
+    def __init__(self, cad_dir: str):
+        self.root = os.path.join(cad_dir, ".designs")
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.log_path = os.path.join(self.root, "log.jsonl")
+        self.head_path = os.path.join(self.root, "head.json")
+        self._lock = threading.Lock()
+        self._versions: List[DesignVersion] = []
+        self.current: Optional[int] = None
+        self._redo: List[int] = []
+        self._load()
+
+    # --- persistence ---
+
+    def _load(self):
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append; everything before it is intact
+                        print(f"[DESIGNS] [WARN] Skipping unreadable record in {self.log_path}")
+                        continue
+                    self._versions.append(DesignVersion(**record))
+        except OSError:
+            pass
+        try:
+            with open(self.head_path, "r", encoding="utf-8") as f:
+                head = json.load(f)
+            self.current = head.get("current")
+            self._redo = list(head.get("redo", []))
+        except (OSError, ValueError):
+            self.current = self._versions[-1].version if self._versions else None
+
+    def _save_head(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.head_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"current": self.current, "redo": self._redo}, f)
+        os.replace(tmp_path, self.head_path)
+
+    def _write_object(self, data: bytes) -> str:
+        digest = _sha256(data)
+        path = os.path.join(self.objects_dir, digest)
+        if not os.path.exists(path):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_object(self, digest: str) -> bytes:
+        with open(os.path.join(self.objects_dir, digest), "rb") as f:
+            return f.read()
+
+    # --- versions ---
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def get(self, version: int) -> Optional[DesignVersion]:
+        if 1 <= version <= len(self._versions):
+            return self._versions[version - 1]
+        return None
+
+    def record(self, script: str, stl: bytes, prompt: str, kind: str, duration: float = 0.0,
+               parent: Optional[int] = None, meta: Optional[Dict[str, Any]] = None) -> DesignVersion:
+        """Appends a version and makes it current. The parent defaults to the current version."""
+        with self._lock:
+            if parent is None:
+                parent = self.current
+            entry = DesignVersion(
+                version=len(self._versions) + 1,
+                parent=parent,
+                kind=kind,
+                prompt=prompt,
+                script=self._write_object(script.encode("utf-8")),
+                stl=self._write_object(stl),
+                created=time.time(),
+                duration=round(duration, 3),
+                meta=meta or {},
+            )
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(entry)) + "\n")
+            self._versions.append(entry)
+            self.current = entry.version
+            # A new edit forks history: nothing left to redo
+            self._redo = []
+            self._save_head()
+            return entry
+
+    def script(self, version: int) -> str:
+        return self._read_object(self._versions[version - 1].script).decode("utf-8")
+
+    def stl(self, version: int) -> bytes:
+        return self._read_object(self._versions[version - 1].stl)
+
+    def current_script(self) -> Optional[str]:
+        if self.current is None:
+            return None
+        try:
+            return self.script(self.current)
+        except (OSError, IndexError):
+            return None
+
+    def undo(self) -> Optional[DesignVersion]:
+        """Moves to the parent of the current version. Returns it, or None at the start of history."""
+        with self._lock:
+            entry = self.get(self.current) if self.current else None
+            if entry is None or entry.parent is None:
+                return None
+            self._redo.append(entry.version)
+            self.current = entry.parent
+            self._save_head()
+            return self.get(self.current)
+
+    def redo(self) -> Optional[DesignVersion]:
+        with self._lock:
+            if not self._redo:
+                return None
+            self.current = self._redo.pop()
+            self._save_head()
+            return self.get(self.current)
+
+    def checkout(self, version: int) -> Optional[DesignVersion]:
+        """Makes any version current (e.g. picked from the history list)."""
+        with self._lock:
+            entry = self.get(version)
+            if entry is None:
+                return None
+            self.current = version
+            self._redo = []
+            self._save_head()
+            return entry
+
+    def lineage(self, version: Optional[int] = None) -> List[DesignVersion]:
+        """The chain from the generation that started the design to `version` (default: current)."""
+        chain = []
+        entry = self.get(version or self.current or 0)
+        while entry is not None:
+            chain.append(entry)
+            if entry.kind == "generate":
+                break
+            entry = self.get(entry.parent) if entry.parent else None
+        return chain[::-1]
+
+    def history(self) -> Dict[str, Any]:
+        return {
+            "current": self.current,
+            "can_undo": bool(self.current and self.get(self.current).parent),
+            "can_redo": bool(self._redo),
+            "versions": [v.summary() for v in self._versions],
+        }
+
+    def diff(self, old: int, new: int, context: int = 3) -> str:
+        """Unified diff between the scripts of two versions."""
+        return "".join(difflib.unified_diff(
+            self.script(old).splitlines(keepends=True),
+            self.script(new).splitlines(keepends=True),
+            fromfile=f"v{old}", tofile=f"v{new}", n=context,
+        ))
+
+
+# --- SEARCH/REPLACE edits ---
+
+_EDIT_BLOCK = re.compile(r"<<<<<<< SEARCH\n(.*?)\n?=======\n(.*?)\n?>>>>>>> REPLACE", re.DOTALL)
+
+EDIT_INSTRUCTIONS = """
+For small changes you may reply with only the edits instead of the full script,
+as one or more SEARCH/REPLACE blocks inside a single ```edit block:
+
+```edit
+<<<<<<< SEARCH
+exact lines from the current script
+=======
+the lines that replace them
+>>>>>>> REPLACE
+```
+
+Each SEARCH section must match the current script exactly and only once.
+For larger changes, reply with the full script in a ```python block as usual.
+"""
+
+
+class EditError(ValueError):
+    pass
+
+
+
+def apply_edit_blocks(script: str, text: str) -> str:
+    """Applies the SEARCH/REPLACE blocks in `text` to `script`. Raises EditError if any block does not apply."""
+    blocks = _EDIT_BLOCK.findall(text)
+    if not blocks:
+        raise EditError("No SEARCH/REPLACE blocks found in the ```edit block.")
+    for search, replace in blocks:
+        count = script.count(search)
+        if count == 1:
+            script = script.replace(search, replace, 1)
+            continue
+        if count > 1:
+            raise EditError(f"SEARCH text matches {count} places, it must be unique:\n{search}")
+        # Tolerate trailing-whitespace differences, line by line
+        lines = script.split("\n")
+        needle = [line.rstrip() for line in search.split("\n")]
+        hits = [i for i in range(len(lines) - len(needle) + 1)
+                if [line.rstrip() for line in lines[i:i + len(needle)]] == needle]
+        if len(hits) != 1:
+            raise EditError(f"SEARCH text not found in the current script:\n{search}")
+        i = hits[0]
+        lines[i:i + len(needle)] = replace.split("\n")
+        script = "\n".join(lines)
+    return script
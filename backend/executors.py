@@ -0,0 +1,225 @@
+"""
+Executors - Named, bounded thread pools per workload class.
+
+asyncio.to_thread() shares one default executor across everything, so a long
+slicer run or build123d script could hold threads that audio I/O needs. Each
+workload class gets its own pool instead:
+
+- "realtime-audio": PyAudio stream setup and blocking reads/writes.
+- "vision":         camera capture, frame encoding, the face-auth CV loop.
+- "cpu-subprocess": the slicer, mesh analysis and other CPU-heavy work.
+- "cad-scripts":    threads waiting on build123d script children (warm workers
+                    or one-shot runs); at least one per speculative candidate.
+- "file-io":        blocking file reads/writes.
+
+Every pool has a worker count and a queue-depth limit. Work submitted while
+`max_workers + max_queue` jobs are already pending is rejected with
+ExecutorSaturatedError instead of queueing without bound.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+REALTIME_AUDIO = "realtime-audio"
+VISION = "vision"
+CPU_SUBPROCESS = "cpu-subprocess"
+CAD_SCRIPTS = "cad-scripts"
+FILE_IO = "file-io"
+
+# name -> (max_workers, max_queue)
+DEFAULT_POOLS = {
+    REALTIME_AUDIO: (4, 4),
+    VISION: (3, 4),
+    CPU_SUBPROCESS: (2, 8),
+    CAD_SCRIPTS: (4, 16),
+    FILE_IO: (4, 64),
+}
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a pool's queue-depth limit is reached."""
+
+
+class BoundedExecutor:
+    """A ThreadPoolExecutor with a pending-work limit and utilization counters."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"pool-{name}")
+        self._lock = threading.Lock()
+        self._created = time.monotonic()
+
+        # Counters
+        self.active = 0
+        self.queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.peak_pending = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self.active + self.queued
+
+    def _wrap(self, fn: Callable, submitted_at: float) -> Callable:
+        def job():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.wait_seconds += started - submitted_at
+            ok = False
+            try:
+                result = fn()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.busy_seconds += time.monotonic() - started
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+        return job
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Submit work. Returns a concurrent.futures.Future."""
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturatedError(
+                    f"Executor '{self.name}' is saturated ({self.active} running, {self.queued} queued)"
+                )
+            self.queued += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        call = functools.partial(fn, *args, **kwargs)
+        with self._lock:
+            # Under the lock so resize() cannot shut the pool down in between
+            try:
+                return self._pool.submit(self._wrap(call, time.monotonic()))
+            except RuntimeError:
+                self.queued -= 1
+                raise
+
+    def resize(self, max_workers: int):
+        """
+        Changes the worker count of a running pool. New work goes to a fresh pool of that size;
+        jobs already queued on the old one still run there, so for a moment both pools' workers may be busy.
+        """
+        with self._lock:
+            if max_workers == self.max_workers:
+                return
+            old, self._pool = self._pool, ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"pool-{self.name}")
+            self.max_workers = max_workers
+        old.shutdown(wait=False)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Async equivalent of asyncio.to_thread() on this pool (context variables are propagated)."""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        future = self.submit(ctx.run, fn, *args, **kwargs)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busy = self.busy_seconds
+            elapsed = max(time.monotonic() - self._created, 1e-9)
+            done = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": self.queued,
+                "peak_pending": self.peak_pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                # Share of worker-time spent on finished jobs since the pool was created
+                "utilization": round(min(busy / (elapsed * self.max_workers), 1.0), 4),
+                "avg_wait_ms": round(self.wait_seconds * 1000 / done, 2) if done else 0.0,
+            }
+
+
+class ExecutorRegistry:
+    """Creates pools lazily from their configured limits and reports their stats."""
+
+    def __init__(self, pools: Optional[Dict[str, tuple]] = None):
+        self._config: Dict[str, tuple] = dict(pools if pools is not None else DEFAULT_POOLS)
+        self._executors: Dict[str, BoundedExecutor] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, name: str, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        """Set limits for a pool. Takes effect the next time the pool is created."""
+        workers, queue = self._config.get(name, DEFAULT_POOLS.get(name, (2, 8)))
+        self._config[name] = (max_workers or workers, queue if max_queue is None else max_queue)
+
+    def reserve(self, name: str, min_workers: int):
+        """Raises a pool's worker count to at least `min_workers`, resizing the pool if it is already running."""
+        with self._lock:
+            workers, queue = self._config.get(name, DEFAULT_POOLS.get(name, (2, 8)))
+            if min_workers <= workers:
+                return
+            self._config[name] = (min_workers, queue)
+            executor = self._executors.get(name)
+        if executor is not None and executor.max_workers < min_workers:
+            print(f"[EXECUTORS] Growing pool '{name}' from {executor.max_workers} to {min_workers} workers")
+            executor.resize(min_workers)
+
+    def get(self, name: str) -> BoundedExecutor:
+        executor = self._executors.get(name)
+        if executor is not None:
+            return executor
+        with self._lock:
+            executor = self._executors.get(name)
+            if executor is None:
+                if name not in self._config:
+                    raise ValueError(f"Unknown executor '{name}'. Available: {', '.join(self._config)}")
+                max_workers, max_queue = self._config[name]
+                executor = BoundedExecutor(name, max_workers, max_queue)
+                self._executors[name] = executor
+            return executor
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        stats = {}
+        for name, (max_workers, max_queue) in self._config.items():
+            executor = self._executors.get(name)
+            if executor is not None:
+                stats[name] = executor.get_stats()
+            else:
+                stats[name] = {"max_workers": max_workers, "max_queue": max_queue, "active": 0, "queued": 0, "submitted": 0}
+        return stats
+
+
+# Process-wide registry used by the agents
+registry = ExecutorRegistry()
+
+
+async def run_in(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the named pool of the process-wide registry."""
+    return await registry.run(name, fn, *args, **kwargs)
@@ -0,0 +1,194 @@
+"""
+GcodeCache - Content-addressed cache of sliced G-code.
+
+A slice is fully determined by the model and the slicer setup, so the key
+hashes together:
+- the STL bytes;
+- each profile handed to the slicer, resolved through its `inherits` chain,
+  so editing a shared base profile invalidates everything built on it;
+- the slicer fingerprint (executable path, size and mtime: upgrading the
+  slicer changes its output even with identical settings).
+
+G-code is stored once per content hash under `<root>/objects/<sha>.gcode`,
+and `<root>/index.json` maps keys to it. When the stored files exceed
+`max_bytes`, the least recently used entries are evicted and files no longer
+referenced are deleted. Reprinting a part, or printing it on a second
+identical printer, then copies the stored G-code instead of re-slicing.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def profile_hash(chain: Iterable[str]) -> str:
+    """Hash of a profile together with everything it inherits from (paths leaf first)."""
+    digest = hashlib.sha256()
+    for path in chain:
+        digest.update(file_sha256(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def slicer_fingerprint(slicer_path: str) -> str:
+    """Stands in for the slicer version: changes whenever the executable is replaced."""
+    stat = os.stat(slicer_path)
+    return f"{os.path.basename(slicer_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def slice_key(stl_hash: str, profile_hashes: Dict[str, str], slicer: str) -> str:
+    payload = json.dumps([stl_hash, sorted(profile_hashes.items()), slicer])
+    return "gcode:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GcodeCache:
+    """
+    Args:
+        root: Cache directory (created on first write).
+        max_bytes: Upper bound on stored G-code bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- index ---
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    # --- objects ---
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest + ".gcode")
+
+    def _copy(self, src: str, dest: str) -> str:
+        """Copies src to dest (atomically) and returns the sha256 of the bytes copied."""
+        digest = hashlib.sha256()
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        tmp_path = dest + ".tmp"
+        with open(src, "rb") as f_in, open(tmp_path, "wb") as f_out:
+            for chunk in iter(lambda: f_in.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                f_out.write(chunk)
+        os.replace(tmp_path, dest)
+        return digest.hexdigest()
+
+    # --- public API ---
+
+    def get(self, key: str, dest_path: str) -> bool:
+        """Copies the cached G-code for `key` to dest_path. Returns False on a miss."""
+        with self._lock:
+            index = self._load()
+            record = index.get(key)
+            if record is None:
+                self.misses += 1
+                return False
+            try:
+                # Content addressing doubles as an integrity check
+                ok = self._copy(self._object_path(record["gcode"]), dest_path) == record["gcode"]
+            except OSError:
+                ok = False
+            if not ok:
+                # File went missing or was corrupted; forget the entry
+                del index[key]
+                self._save()
+                self.misses += 1
+                return False
+            record["last_used"] = time.time()
+            self._save()
+            self.hits += 1
+            return True
+
+    def put(self, key: str, gcode_path: str, meta: Optional[Dict[str, Any]] = None):
+        digest = file_sha256(gcode_path)
+        with self._lock:
+            index = self._load()
+            path = self._object_path(digest)
+            if not os.path.exists(path):
+                self._copy(gcode_path, path)
+            index[key] = {
+                "gcode": digest,
+                "meta": meta or {},
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._save()
+
+    def _object_sizes(self, index) -> Dict[str, int]:
+        sizes = {}
+        for record in index.values():
+            digest = record["gcode"]
+            if digest not in sizes:
+                try:
+                    sizes[digest] = os.path.getsize(self._object_path(digest))
+                except OSError:
+                    sizes[digest] = 0
+        return sizes
+
+    def _evict(self):
+        index = self._index
+        sizes = self._object_sizes(index)
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes or len(index) <= 1:
+                break
+            del index[key]
+            self.evictions += 1
+            still_used = {record["gcode"] for record in index.values()}
+            for digest in list(sizes):
+                if digest not in still_used:
+                    total -= sizes.pop(digest)
+                    try:
+                        os.remove(self._object_path(digest))
+                    except OSError:
+                        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            index = self._load()
+            stored = sum(self._object_sizes(index).values())
+            return {
+                "entries": len(index),
+                "bytes": stored,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
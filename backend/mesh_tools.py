@@ -0,0 +1,361 @@
+"""
+Mesh tools - numpy STL reading/writing and preview decimation.
+
+Generated parts with fillets, threads or gears can have hundreds of thousands
+of triangles. The CAD window only needs a light mesh for its first render, so
+after export a preview is built by vertex clustering:
+
+1. weld identical vertices into an indexed mesh,
+2. snap vertices to a uniform grid and replace each occupied cell by the mean
+   of its vertices,
+3. drop triangles that collapsed and duplicates.
+
+The grid resolution is found by bisection so the preview stays under a
+triangle budget. The full-resolution STL is left untouched for slicing.
+
+Internally meshes are kept indexed (IndexedMesh: unique float32 vertices and
+uint32 triangle indices). The indexed form of an STL is cached next to it as
+a raw `.mesh` file that is memory-mapped on load, so previews, mesh stats and
+print checks do not re-parse the STL:
+
+    offset 0   b"LOUMESH1"
+    offset 8   uint32 vertex count, uint32 triangle count
+    offset 16  float32 vertices (V, 3), then uint32 faces (F, 3)
+
+mesh_stats also runs a printability analysis (watertightness, volume, surface
+area, overhang area, filament estimate) once per STL and caches the report
+as JSON beside the `.mesh` file. Units are the STL's, i.e. millimetres.
+"""
+
+import json
+import math
+import os
+import re
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+PREVIEW_TRIANGLES = 20000
+OVERHANG_ANGLE = 45.0  # degrees from vertical that print without support
+PLA_DENSITY = 1.24  # g/cm^3
+FILAMENT_DIAMETER = 1.75  # mm
+_ANALYSIS_VERSION = 1
+
+_STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+_ASCII_VERTEX = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+_MESH_MAGIC = b"LOUMESH1"
+_MESH_HEADER = struct.Struct("<8sII")
+
+
+def read_stl(data: bytes) -> np.ndarray:
+    """Parses binary or ASCII STL into a float32 array of shape (n, 3, 3)."""
+    if len(data) >= 84:
+        (count,) = struct.unpack_from("<I", data, 80)
+        if len(data) == 84 + count * _STL_RECORD.itemsize:
+            records = np.frombuffer(data, dtype=_STL_RECORD, count=count, offset=84)
+            return records["vertices"].copy()
+    if data.lstrip()[:5].lower() == b"solid":
+        coords = np.array(_ASCII_VERTEX.findall(data), dtype=np.float32)
+        return coords.reshape(-1, 3, 3)
+    raise ValueError("Not a valid STL file")
+
+
+def face_normals(triangles: np.ndarray) -> np.ndarray:
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def write_stl(triangles: np.ndarray, header: bytes = b"Lou preview mesh") -> bytes:
+    """Encodes (n, 3, 3) triangles as binary STL."""
+    triangles = np.asarray(triangles, dtype=np.float32)
+    records = np.zeros(len(triangles), dtype=_STL_RECORD)
+    records["vertices"] = triangles
+    records["normal"] = face_normals(triangles)
+    return header[:80].ljust(80, b"\0") + struct.pack("<I", len(triangles)) + records.tobytes()
+
+
+def weld(triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges bit-identical vertices. Returns (vertices (m, 3) float32, faces (n, 3) uint32)."""
+    flat = np.ascontiguousarray(triangles.reshape(-1, 3), dtype=np.float32)
+    # Compare 12-byte rows as opaque keys: much faster than np.unique(axis=0)
+    keys = flat.view(np.dtype((np.void, flat.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return flat[first], inverse.reshape(-1, 3).astype(np.uint32)
+
+
+@dataclass
+class IndexedMesh:
+    vertices: np.ndarray  # (V, 3) float32
+    faces: np.ndarray  # (F, 3) uint32
+
+    @classmethod
+    def from_triangles(cls, triangles: np.ndarray) -> "IndexedMesh":
+        vertices, faces = weld(triangles)
+        return cls(vertices, faces)
+
+    @classmethod
+    def from_stl(cls, data: bytes) -> "IndexedMesh":
+        return cls.from_triangles(read_stl(data))
+
+    @property
+    def triangle_count(self) -> int:
+        return len(self.faces)
+
+    def triangles(self) -> np.ndarray:
+        return self.vertices[self.faces]
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        if len(self.vertices) == 0:
+            return np.zeros(3, np.float32), np.zeros(3, np.float32)
+        return self.vertices.min(axis=0), self.vertices.max(axis=0)
+
+    def volume(self) -> float:
+        """Enclosed volume by the divergence theorem (meaningful for closed, consistently wound meshes)."""
+        tri = self.triangles().astype(np.float64)
+        return float(abs(np.einsum("ij,ij->i", tri[:, 0], np.cross(tri[:, 1], tri[:, 2])).sum()) / 6.0)
+
+    def surface_area(self) -> float:
+        tri = self.triangles().astype(np.float64)
+        return float(np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum() / 2.0)
+
+    def stats(self) -> Dict:
+        lo, hi = self.bounds()
+        return {
+            "triangles": self.triangle_count,
+            "vertices": len(self.vertices),
+            "bounds": [lo.tolist(), hi.tolist()],
+            "size": (hi - lo).tolist(),
+            "volume": self.volume(),
+        }
+
+
+def _edge_counts(faces: np.ndarray) -> Tuple[int, int, int]:
+    """(boundary edges, non-manifold edges, edges shared with inconsistent winding)."""
+    directed = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]).astype(np.int64)
+    undirected = np.sort(directed, axis=1)
+    _, counts = np.unique(undirected, axis=0, return_counts=True)
+    # A consistently wound closed surface uses each directed edge exactly once
+    _, directed_counts = np.unique(directed, axis=0, return_counts=True)
+    return int((counts == 1).sum()), int((counts > 2).sum()), int((directed_counts > 1).sum())
+
+
+def analyze(mesh: IndexedMesh, overhang_angle: float = OVERHANG_ANGLE, density: float = PLA_DENSITY,
+            filament_diameter: float = FILAMENT_DIAMETER) -> Dict:
+    """
+    Geometry and printability report for a mesh in millimetres. The filament
+    estimate is for a solid print, an upper bound for the usual sparse infill.
+    """
+    report = mesh.stats()
+    if mesh.triangle_count == 0:
+        report.update(watertight=False, boundary_edges=0, non_manifold_edges=0, surface_area=0.0,
+                      overhang_area=0.0, filament_g=0.0, filament_m=0.0)
+        return report
+
+    tri = mesh.triangles().astype(np.float64)
+    cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    double_areas = np.linalg.norm(cross, axis=1)
+    normal_z = np.divide(cross[:, 2], double_areas, out=np.zeros(len(tri)), where=double_areas > 0)
+
+    # Downward-facing triangles steeper than the overhang limit, except those resting on the bed
+    bed_z = float(tri[:, :, 2].min())
+    on_bed = (tri[:, :, 2].max(axis=1) - bed_z) < 1e-3
+    overhang = (normal_z < -math.sin(math.radians(overhang_angle))) & ~on_bed
+
+    boundary, non_manifold, misoriented = _edge_counts(np.asarray(mesh.faces))
+    volume = report["volume"]
+    report.update(
+        watertight=boundary == 0 and non_manifold == 0 and misoriented == 0,
+        boundary_edges=boundary,
+        non_manifold_edges=non_manifold,
+        surface_area=float(double_areas.sum() / 2.0),
+        overhang_area=float(double_areas[overhang].sum() / 2.0),
+        filament_g=volume / 1000.0 * density,
+        filament_m=volume / (math.pi * (filament_diameter / 2) ** 2) / 1000.0,
+    )
+    return report
+
+
+def describe(report: Dict) -> str:
+    """One-line summary of an analysis report, for the voice model."""
+    size = " x ".join(f"{v:.1f}" for v in report["size"])
+    text = (f"Size {size} mm, volume {report['volume'] / 1000:.1f} cm^3, surface area {report['surface_area'] / 100:.1f} cm^2, "
+            f"about {report['filament_g']:.0f} g of PLA if printed solid.")
+    if not report.get("watertight"):
+        text += " Warning: the mesh is not watertight, slicing may fail."
+    if report.get("overhang_area", 0) > 0:
+        text += f" {report['overhang_area'] / 100:.1f} cm^2 of overhangs will need support."
+    return text
+
+
+def _tmp_path(path: str) -> str:
+    """A temporary file beside `path` private to this writer: the same STL may be processed by several jobs at once."""
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def save_mesh(mesh: IndexedMesh, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(_MESH_HEADER.pack(_MESH_MAGIC, len(mesh.vertices), len(mesh.faces)))
+        f.write(np.ascontiguousarray(mesh.vertices, dtype="<f4").tobytes())
+        f.write(np.ascontiguousarray(mesh.faces, dtype="<u4").tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_mesh(path: str) -> IndexedMesh:
+    """Memory-maps a `.mesh` file; the arrays are read-only views of the file."""
+    with open(path, "rb") as f:
+        magic, vertex_count, face_count = _MESH_HEADER.unpack(f.read(_MESH_HEADER.size))
+    if magic != _MESH_MAGIC:
+        raise ValueError(f"Not a mesh file: {path}")
+    expected = _MESH_HEADER.size + vertex_count * 12 + face_count * 12
+    if os.path.getsize(path) != expected:
+        raise ValueError(f"Truncated mesh file: {path}")
+    if vertex_count == 0 or face_count == 0:
+        return IndexedMesh(np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32))
+    vertices = np.memmap(path, dtype="<f4", mode="r", offset=_MESH_HEADER.size, shape=(vertex_count, 3))
+    faces = np.memmap(path, dtype="<u4", mode="r", offset=_MESH_HEADER.size + vertex_count * 12, shape=(face_count, 3))
+    return IndexedMesh(vertices, faces)
+
+
+def _cache_dir(stl_path: str, kind: str) -> Tuple[str, str]:
+    folder, name = os.path.split(os.path.abspath(stl_path))
+    return os.path.join(folder, ".cache", kind), os.path.splitext(name)[0]
+
+
+def mesh_path_for(stl_path: str) -> str:
+    folder, stem = _cache_dir(stl_path, "meshes")
+    return os.path.join(folder, stem + ".mesh")
+
+
+def _is_fresh(derived_path: str, source_path: str) -> bool:
+    return os.path.exists(derived_path) and os.path.getmtime(derived_path) >= os.path.getmtime(source_path)
+
+
+def load_indexed(stl_path: str, stl_data: Optional[bytes] = None) -> IndexedMesh:
+    """
+    Returns the indexed mesh for an STL file, memory-mapped from its cached
+    `.mesh` file. The cache is (re)built when missing or older than the STL;
+    pass `stl_data` when the STL bytes are already in memory.
+    """
+    mesh_path = mesh_path_for(stl_path)
+    if _is_fresh(mesh_path, stl_path):
+        try:
+            return load_mesh(mesh_path)
+        except (OSError, ValueError) as e:
+            print(f"[MESH] [WARN] Rebuilding unreadable mesh cache {mesh_path}: {e}")
+    if stl_data is None:
+        with open(stl_path, "rb") as f:
+            stl_data = f.read()
+    save_mesh(IndexedMesh.from_stl(stl_data), mesh_path)
+    return load_mesh(mesh_path)
+
+
+def _cluster(vertices: np.ndarray, faces: np.ndarray, resolution: int) -> Tuple[np.ndarray, np.ndarray]:
+    lo = vertices.min(axis=0)
+    extent = float((vertices.max(axis=0) - lo).max()) or 1.0
+    cell = extent / resolution
+    grid = np.minimum(((vertices - lo) / cell).astype(np.int64), resolution)
+    n = resolution + 1
+    cell_ids = grid[:, 0] + n * (grid[:, 1] + n * grid[:, 2])
+    _, cluster = np.unique(cell_ids, return_inverse=True)
+    counts = np.bincount(cluster).astype(np.float64)
+    centers = np.stack([np.bincount(cluster, weights=vertices[:, axis]) for axis in range(3)], axis=1) / counts[:, None]
+
+    new_faces = cluster[faces].astype(np.uint32)
+    keep = (new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2]) & (new_faces[:, 0] != new_faces[:, 2])
+    new_faces = new_faces[keep]
+    # Two triangles on the same three clusters are duplicates, whatever their winding
+    _, unique_rows = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+    new_faces = new_faces[np.sort(unique_rows)]
+    return centers.astype(np.float32), new_faces
+
+
+def decimate_indexed(mesh: IndexedMesh, target_triangles: int) -> IndexedMesh:
+    """Vertex-clustering decimation to at most `target_triangles` triangles."""
+    if mesh.triangle_count <= target_triangles:
+        return mesh
+    vertices = np.asarray(mesh.vertices)
+    faces = np.asarray(mesh.faces)
+
+    # Largest grid resolution whose result fits the budget
+    lo, hi = 1, 2048
+    best = IndexedMesh(np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32))
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        centers, clustered = _cluster(vertices, faces, mid)
+        if len(clustered) <= target_triangles:
+            best = IndexedMesh(centers, clustered)
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+def decimate(triangles: np.ndarray, target_triangles: int) -> np.ndarray:
+    """Like decimate_indexed, for an (n, 3, 3) triangle soup."""
+    if len(triangles) <= target_triangles:
+        return triangles
+    return decimate_indexed(IndexedMesh.from_triangles(triangles), target_triangles).triangles()
+
+
+def preview_path_for(stl_path: str) -> str:
+    """Derived files live in a hidden cache folder next to the source, so slicing and project listings ignore them."""
+    folder, stem = _cache_dir(stl_path, "previews")
+    return os.path.join(folder, stem + ".preview.stl")
+
+
+def ensure_preview(stl_path: str, target_triangles: int = PREVIEW_TRIANGLES) -> Optional[Tuple[str, int, int]]:
+    """
+    Builds (or reuses) the decimated preview for `stl_path`.
+    Returns (preview_path, preview_triangles, full_triangles), or None if the
+    mesh is already within budget and needs no preview.
+    """
+    full = load_indexed(stl_path)
+    if full.triangle_count <= target_triangles:
+        return None
+
+    preview_path = preview_path_for(stl_path)
+    if _is_fresh(preview_path, stl_path):
+        with open(preview_path, "rb") as f:
+            f.seek(80)
+            (count,) = struct.unpack("<I", f.read(4))
+        return preview_path, count, full.triangle_count
+
+    preview = decimate_indexed(full, target_triangles)
+    os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+    tmp_path = _tmp_path(preview_path)
+    with open(tmp_path, "wb") as f:
+        f.write(write_stl(preview.triangles()))
+    os.replace(tmp_path, preview_path)
+    return preview_path, preview.triangle_count, full.triangle_count
+
+
+def analysis_path_for(stl_path: str) -> str:
+    folder, stem = _cache_dir(stl_path, "meshes")
+    return os.path.join(folder, stem + ".analysis.json")
+
+
+def mesh_stats(stl_path: str, stl_data: Optional[bytes] = None) -> Dict:
+    """Stats and printability analysis of an STL (see analyze), computed once and cached beside its indexed mesh."""
+    analysis_path = analysis_path_for(stl_path)
+    if _is_fresh(analysis_path, stl_path):
+        try:
+            with open(analysis_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.pop("analysis_version", None) == _ANALYSIS_VERSION:
+                return cached
+        except (OSError, ValueError) as e:
+            print(f"[MESH] [WARN] Rebuilding unreadable analysis {analysis_path}: {e}")
+
+    report = analyze(load_indexed(stl_path, stl_data))
+    os.makedirs(os.path.dirname(analysis_path), exist_ok=True)
+    tmp_path = _tmp_path(analysis_path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(report, analysis_version=_ANALYSIS_VERSION), f)
+    os.replace(tmp_path, analysis_path)
+    return report
@@ -8,17 +8,29 @@ Supported Printer Types:
 """
 
 import asyncio
+import contextlib
 import os
 import subprocess
 import json
 import platform
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 
 import aiohttp
+from executors import CPU_SUBPROCESS, FILE_IO, run_in
+from gcode_cache import GcodeCache, file_sha256, profile_hash, slice_key, slicer_fingerprint
+from mesh_tools import mesh_stats
+from slicer_profiles import ProfileIndex
 from zeroconf import Zeroconf, ServiceBrowser, ServiceListener
 
+# Probes of unknown hosts must fail fast; uploads of large G-code files may take minutes
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=2.0, connect=1.0)
+DISCOVERY_CONCURRENCY = 16  # Hosts probed at once during discovery
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
 
 class PrinterType(Enum):
     OCTOPRINT = "octoprint"
@@ -58,11 +70,197 @@ class PrintStatus:
         return asdict(self)
 
 
+class StatusScheduler:
+    """
+    Decides when each printer's status is fetched and shares the results.
+
+    - Concurrent requests for one printer join the same in-flight call, and a
+      result younger than `max_age` is reused (voice tool + monitor loop).
+    - Printing / paused printers are due every `active_interval` seconds,
+      others every `idle_interval`.
+    - Unreachable printers (no status, or an "Error: ..." state) back off
+      exponentially up to `max_backoff`; meanwhile the last result is returned.
+      The backoff paces background polls only: `force` fetches anyway (e.g. a
+      user asking for the status right after the printer came back).
+    """
+
+    def __init__(self, active_interval: float = 2.0, idle_interval: float = 15.0,
+                 base_backoff: float = 2.0, max_backoff: float = 300.0):
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._last: Dict[str, Optional[PrintStatus]] = {}  # host -> last result
+        self._fetched_at: Dict[str, float] = {}  # host -> monotonic time of the last result
+        self._failures: Dict[str, int] = {}  # host -> consecutive failed fetches
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _failed(status: Optional[PrintStatus]) -> bool:
+        return status is None or status.state.startswith("Error")
+
+    @staticmethod
+    def is_active(status: Optional[PrintStatus]) -> bool:
+        state = (status.state if status else "").lower()
+        return "print" in state or "paus" in state
+
+    def interval(self, host: str) -> float:
+        """Seconds between fetches for this host in its current state."""
+        failures = self._failures.get(host, 0)
+        if failures:
+            return min(self.base_backoff * 2 ** (failures - 1), self.max_backoff)
+        return self.active_interval if self.is_active(self._last.get(host)) else self.idle_interval
+
+    def due(self, host: str) -> bool:
+        if host in self._inflight:
+            return False
+        fetched_at = self._fetched_at.get(host)
+        return fetched_at is None or time.monotonic() - fetched_at >= self.interval(host)
+
+    def record(self, host: str, status: Optional[PrintStatus]):
+        """Stores a result, e.g. one pushed by a websocket subscription."""
+        self._last[host] = status
+        self._fetched_at[host] = time.monotonic()
+        if self._failed(status):
+            self._failures[host] = self._failures.get(host, 0) + 1
+        else:
+            self._failures.pop(host, None)
+
+    def forget(self, host: str):
+        for table in (self._last, self._fetched_at, self._failures):
+            table.pop(host, None)
+
+    async def get(self, host: str, fetch: Callable[[], Awaitable[Optional[PrintStatus]]],
+                  max_age: float = 1.0, force: bool = False) -> Optional[PrintStatus]:
+        task = self._inflight.get(host)
+        if task is None:
+            fetched_at = self._fetched_at.get(host)
+            if fetched_at is not None and not force:
+                age = time.monotonic() - fetched_at
+                # Fresh enough, or the host is unreachable and not yet due for a retry
+                if age < max_age or (self._failures.get(host) and age < self.interval(host)):
+                    return self._last.get(host)
+            # The fetch runs as its own task: cancelling one caller does not cancel it for the others
+            task = asyncio.ensure_future(self._fetch(host, fetch))
+            self._inflight[host] = task
+            task.add_done_callback(lambda t: self._fetched(host, t))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, host: str, fetch: Callable[[], Awaitable[Optional[PrintStatus]]]) -> Optional[PrintStatus]:
+        status = await fetch()
+        self.record(host, status)
+        return status
+
+    def _fetched(self, host: str, task: asyncio.Future):
+        if self._inflight.get(host) is task:
+            del self._inflight[host]
+        # Every caller may have been cancelled meanwhile; keep a failure from being reported as unretrieved
+        if not task.cancelled():
+            task.exception()
+
+
+class DiscoveryCache:
+    """
+    Persisted identities of discovered printers, keyed by host, port and mDNS name:
+    probed type, camera URL, when the printer was last seen and last verified.
+    An entry younger than `ttl` is trusted without probing; an older one is still
+    used right away but re-verified in the background. Entries not seen for
+    `max_age` are dropped on load.
+    """
+
+    def __init__(self, path: Optional[str], ttl: float = 24 * 3600, max_age: float = 30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._sequence = 0  # Snapshots taken
+        self._written = 0  # Newest snapshot on disk
+        self._write_lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(host: str, port: int, name: str) -> str:
+        return f"{host}:{port}/{name}"
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[PRINTER] [WARN] Ignoring unreadable discovery cache {self.path}: {e}")
+            return
+        cutoff = time.time() - self.max_age
+        self.entries = {k: v for k, v in entries.items() if v.get("last_seen", 0) >= cutoff}
+
+    def snapshot(self) -> Optional[Tuple[int, str]]:
+        """
+        Serializes unsaved changes as (sequence, json), or None if there are none.
+        Call it on the thread that modifies the cache; write() may then run elsewhere.
+        """
+        if not self.path or not self._dirty:
+            return None
+        self._dirty = False
+        self._sequence += 1
+        return self._sequence, json.dumps(self.entries, indent=2)
+
+    def write(self, snapshot: Tuple[int, str]):
+        sequence, payload = snapshot
+        with self._write_lock:
+            # A slower writer must not overwrite a newer snapshot
+            if sequence <= self._written:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+            self._written = sequence
+
+    def save(self):
+        snapshot = self.snapshot()
+        if snapshot:
+            self.write(snapshot)
+
+    def get(self, host: str, port: int, name: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(self.key(host, port, name))
+
+    def find(self, host: str, port: int) -> Optional[Dict[str, Any]]:
+        """Any entry for this address, whatever its mDNS name (e.g. for manually added printers)."""
+        for entry in self.entries.values():
+            if entry["host"] == host and entry["port"] == port:
+                return entry
+        return None
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("verified", 0) < self.ttl
+
+    def put(self, printer: Printer, verified: bool = True):
+        now = time.time()
+        key = self.key(printer.host, printer.port, printer.name)
+        entry = self.entries.get(key, {})
+        entry.update(name=printer.name, host=printer.host, port=printer.port,
+                     printer_type=printer.printer_type.value, camera_url=printer.camera_url, last_seen=now)
+        if verified or "verified" not in entry:
+            entry["verified"] = now if verified else 0.0
+        self.entries[key] = entry
+        self._dirty = True
+
+    @staticmethod
+    def to_printer(entry: Dict[str, Any]) -> Printer:
+        return Printer(name=entry["name"], host=entry["host"], port=entry["port"],
+                       printer_type=PrinterType(entry["printer_type"]), camera_url=entry.get("camera_url"))
+
+
 class PrinterDiscoveryListener(ServiceListener):
     """mDNS listener for printer discovery."""
     
-    def __init__(self):
+    def __init__(self, on_printer: Optional[Callable[[Printer], None]] = None):
         self.printers: List[Printer] = []
+        # Called from Zeroconf's thread for every hit
+        self.on_printer = on_printer
     
     def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
         info = zc.get_service_info(type_, name)
@@ -89,6 +287,8 @@ class PrinterDiscoveryListener(ServiceListener):
                 )
                 self.printers.append(printer)
                 print(f"[PRINTER] Discovered: {printer.name} at {printer.host}:{printer.port} ({printer.printer_type.value})")
+                if self.on_printer:
+                    self.on_printer(printer)
 
     def remove_service(self, zc: Zeroconf, type_: str, name: str) -> None:
         pass
@@ -102,19 +302,72 @@ class PrinterAgent:
     Handles 3D printer discovery, profile management, slicing, and print job submission.
     """
     
-    def __init__(self, profiles_dir: str = "printer_profiles"):
+    def __init__(self, profiles_dir: str = "printer_profiles", request_timeout: float = 10.0,
+                 connect_timeout: float = 3.0, upload_timeout: float = 600.0,
+                 connections_per_host: int = 4, dns_cache_ttl: int = 300,
+                 discovery_cache_path: Optional[str] = os.path.join(BACKEND_DIR, "printer_cache.json"), discovery_ttl: float = 24 * 3600,
+                 profile_index_path: Optional[str] = os.path.join(BACKEND_DIR, "slicer_profile_index.json"),
+                 gcode_cache_dir: Optional[str] = os.path.join(BACKEND_DIR, ".cache", "gcode"), gcode_cache_max_mb: int = 1024):
         self.printers: Dict[str, Printer] = {}  # host -> Printer
         self.profiles_dir = profiles_dir
         self._zeroconf: Optional[Zeroconf] = None
         self._error_tracker = set() # Track hosts with errors to prevent log spam
+
+        # Identities of printers seen before, so they are not re-probed on every discovery
+        self.discovery_cache = DiscoveryCache(discovery_cache_path, ttl=discovery_ttl)
+        self._revalidations: Dict[str, asyncio.Task] = {}  # cache key -> background re-probe
+
+        # One keep-alive connection pool for every printer API call (see _get_session)
+        self.request_timeout = aiohttp.ClientTimeout(total=request_timeout, connect=connect_timeout)
+        self.upload_timeout = aiohttp.ClientTimeout(total=upload_timeout, connect=connect_timeout)
+        self.connections_per_host = connections_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Shared, rate-limited status results (see StatusScheduler)
+        self.status_scheduler = StatusScheduler()
         
         # Detect slicer path and profiles directory
         self.slicer_path = self._detect_slicer_path()
         self._orca_profiles_dir = self._detect_orca_profiles_dir()
+        # Built on first use, then kept up to date from folder mtimes (see ProfileIndex)
+        self.profile_index = ProfileIndex(self._orca_profiles_dir, profile_index_path)
+
+        # Sliced G-code by STL content, resolved profiles and slicer build (see GcodeCache); None disables it
+        self.gcode_cache = GcodeCache(gcode_cache_dir, max_bytes=gcode_cache_max_mb * 1024 * 1024) if gcode_cache_dir else None
+        self._slice_locks: Dict[str, list] = {}  # cache key -> [lock, users]
         
         # Ensure profiles directory exists
         os.makedirs(profiles_dir, exist_ok=True)
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        The shared HTTP session, created on first use. Status polls every few seconds
+        reuse its keep-alive connections instead of paying TCP setup each time.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=0,  # Bounded per host instead
+                limit_per_host=self.connections_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.request_timeout)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Stops background re-verification and closes the shared HTTP session and its pooled connections."""
+        for task in self._revalidations.values():
+            task.cancel()
+        self._revalidations.clear()
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
     def _detect_orca_profiles_dir(self) -> Optional[str]:
         """Detect OrcaSlicer profiles directory."""
         system = platform.system()
@@ -137,43 +390,7 @@ class PrinterAgent:
         Get all available OrcaSlicer profiles from the system folder.
         Returns dict with 'machines', 'processes', 'filaments' lists.
         """
-        profiles = {"machines": [], "processes": [], "filaments": []}
-        
-        if not self._orca_profiles_dir:
-            return profiles
-        
-        system_dir = os.path.join(self._orca_profiles_dir, "system")
-        if not os.path.isdir(system_dir):
-            return profiles
-        
-        # Scan all vendor folders (Creality, Custom, etc.)
-        for vendor in os.listdir(system_dir):
-            vendor_path = os.path.join(system_dir, vendor)
-            if not os.path.isdir(vendor_path):
-                continue
-            
-            # Machine profiles
-            machine_dir = os.path.join(vendor_path, "machine")
-            if os.path.isdir(machine_dir):
-                for f in os.listdir(machine_dir):
-                    if f.endswith(".json"):
-                        profiles["machines"].append(f"system/{vendor}/machine/{f}")
-            
-            # Process profiles
-            process_dir = os.path.join(vendor_path, "process")
-            if os.path.isdir(process_dir):
-                for f in os.listdir(process_dir):
-                    if f.endswith(".json"):
-                        profiles["processes"].append(f"system/{vendor}/process/{f}")
-            
-            # Filament profiles
-            filament_dir = os.path.join(vendor_path, "filament")
-            if os.path.isdir(filament_dir):
-                for f in os.listdir(filament_dir):
-                    if f.endswith(".json"):
-                        profiles["filaments"].append(f"system/{vendor}/filament/{f}")
-        
-        return profiles
+        return self.profile_index.available()
     
     def _find_matching_profile(self, printer_name: str, profile_type: str) -> Optional[str]:
         """
@@ -183,105 +400,13 @@ class PrinterAgent:
         if not self._orca_profiles_dir:
             return None
         
-        # Normalize printer name for matching
-        # e.g., "Creality K1" -> search for "k1"
-        search_terms = printer_name.lower().split()
-        
-        # Common brand keywords to identify vendor folder
-        vendor_map = {
-            "creality": "Creality",
-            "ender": "Creality",
-            "cr-": "Creality",
-            "k1": "Creality",
-        }
-        
-        # Try to identify vendor
-        vendor = None
-        for term in search_terms:
-            for key, val in vendor_map.items():
-                if key in term:
-                    vendor = val
-                    break
-            if vendor:
-                break
-        
-        if not vendor:
-            vendor = "Creality"  # Default fallback
-        
-        system_dir = os.path.join(self._orca_profiles_dir, "system", vendor)
-        if not os.path.isdir(system_dir):
-            print(f"[PRINTER] Vendor folder not found: {vendor}")
-            return None
-        
-        target_dir = os.path.join(system_dir, profile_type)
-        if not os.path.isdir(target_dir):
+        match = self.profile_index.match(printer_name, profile_type)
+        if not match:
             return None
         
-        # Score-based matching
-        best_match = None
-        best_score = 0
-        
-        for filename in os.listdir(target_dir):
-            if not filename.endswith(".json"):
-                continue
-            
-            name_lower = filename.lower()
-            score = 0
-            
-            # Score based on matching search terms
-            for term in search_terms:
-                if term in name_lower:
-                    score += 10
-                    # Bonus for exact model match at word boundary
-                    # e.g., "k1 " or "k1." matches but "k1c" should score lower
-                    if profile_type == "machine":
-                        # Check if there's a character after the term that extends it (like C in K1C)
-                        idx = name_lower.find(term)
-                        if idx >= 0:
-                            after_idx = idx + len(term)
-                            if after_idx < len(name_lower):
-                                next_char = name_lower[after_idx]
-                                if next_char.isalpha():
-                                    # This is a variant like K1C - penalize it
-                                    score -= 8
-                                elif next_char in ' .(-':
-                                    # Direct match followed by delimiter - bonus
-                                    score += 5
-            
-            # Bonus for "0.4 nozzle" (most common)
-            if "0.4" in name_lower:
-                score += 2
-            
-            # Bonus for "standard" or "optimal" process profiles
-            if profile_type == "process":
-                if "standard" in name_lower:
-                    score += 5
-                elif "optimal" in name_lower:
-                    score += 3
-            
-            # Bonus for generic PLA filament (non-silk preferred for general use)
-            if profile_type == "filament":
-                if "pla" in name_lower and "generic" in name_lower:
-                    score += 5
-                    # Penalize specialty variants
-                    if "-cf" in name_lower or "-gf" in name_lower:
-                        score -= 5  # Carbon fiber / glass fiber variants
-                    if "silk" in name_lower or "matte" in name_lower:
-                        score -= 2  # Specialty finishes
-                    if "high speed" in name_lower:
-                        score -= 1  # Less common
-                    # Plain PLA gets a bonus
-                    if "@k1" in name_lower and "-" not in name_lower.split("pla")[-1].split("@")[0]:
-                        score += 3  # Plain PLA for K1
-            
-            if score > best_score:
-                best_score = score
-                best_match = os.path.join(target_dir, filename)
-        
-        if best_match:
-            print(f"[PRINTER] Matched {profile_type} profile: {os.path.basename(best_match)} (score: {best_score})")
-        
-        return best_match
+        path, score = match
+        print(f"[PRINTER] Matched {profile_type} profile: {os.path.basename(path)} (score: {score})")
+        return path
     
     def get_profiles_for_printer(self, printer_name: str) -> Dict[str, Optional[str]]:
         """
@@ -349,15 +474,25 @@ class PrinterAgent:
         print("[PRINTER] Warning: No Slicer (Orca/Prusa) found. Slicing will fail.")
         return None
 
-    async def discover_printers(self, timeout: float = 5.0) -> List[Dict]:
+    async def discover_printers_iter(self, timeout: float = 5.0,
+                                     max_concurrency: int = DISCOVERY_CONCURRENCY) -> AsyncIterator[Printer]:
         """
-        Discovers 3D printers on the local network via mDNS.
-        Returns list of discovered printers.
+        Discovers 3D printers on the local network via mDNS, yielding each one as soon
+        as it is identified. Every mDNS hit starts its type and camera probes right
+        away (all endpoints concurrently), with at most `max_concurrency` hosts being
+        probed at once. Browsing stops after `timeout` seconds; the iterator ends once
+        the remaining probes finish. Yielded printers are added to self.printers.
         """
         print(f"[PRINTER] Starting printer discovery (timeout: {timeout}s)...")
-        
+        loop = asyncio.get_running_loop()
+        hits: asyncio.Queue = asyncio.Queue()
+        found: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        probes = set()
+
         self._zeroconf = Zeroconf()
-        listener = PrinterDiscoveryListener()
+        listener = PrinterDiscoveryListener(on_printer=lambda p: loop.call_soon_threadsafe(hits.put_nowait, p))
         
         # Browse for common 3D printer services
         services = [
@@ -366,104 +501,237 @@ class PrinterAgent:
             "_klipper._tcp.local.", # Some Klipper installs use this
             "_http._tcp.local."  # Generic HTTP - critical for some Creality/Prusa setups
         ]
-        
-        browsers = []
-        for service in services:
-            browser = ServiceBrowser(self._zeroconf, service, listener)
-            browsers.append(browser)
-        
-        # Wait for discovery
-        await asyncio.sleep(timeout)
-        
-        # Cleanup
-        self._zeroconf.close()
-        
-        # PROBE UNKNOWN PRINTERS
-        # Many printers show up as _http._tcp with generic names
-        # We try to identify them by hitting known endpoints
-        for printer in listener.printers:
-            if printer.printer_type == PrinterType.UNKNOWN:
-                print(f"[PRINTER] Probing unknown printer: {printer.host}...")
-                ptype = await self._probe_printer_type(printer.host, printer.port)
-                if ptype != PrinterType.UNKNOWN:
-                    printer.printer_type = ptype
-                    print(f"[PRINTER] Identified {printer.name} as {ptype.value}")
-        
-        # PROBE CAMERAS
-        for printer in listener.printers:
-            if not printer.camera_url:
-                # Try discovery
-                cam_url = await self._probe_camera(printer.host, printer.port)
-                if cam_url:
-                    printer.camera_url = cam_url
-        
-        # Store discovered printers
-        for printer in listener.printers:
-            # Avoid duplicates if we found same host on multiple services
-            self.printers[printer.host] = printer
-        
-        print(f"[PRINTER] Discovery complete. Found {len(self.printers)} printers.")
+        browsers = [ServiceBrowser(self._zeroconf, service, listener) for service in services]
+
+        async def identify(printer: Printer):
+            try:
+                # Known printers are yielded from the cache right away (and re-verified later if stale)
+                if not self._apply_cached_identity(printer):
+                    async with semaphore:
+                        await self._identify_printer(printer)
+                    # A failed probe (offline, or not a printer) is not cached, so the next discovery probes again
+                    if printer.printer_type != PrinterType.UNKNOWN:
+                        self.discovery_cache.put(printer)
+            except Exception as e:
+                print(f"[PRINTER] Probe error for {printer.host}: {e}")
+            found.put_nowait(printer)
+
+        async def browse():
+            seen = {}
+            try:
+                deadline = loop.time() + timeout
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        printer = await asyncio.wait_for(hits.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    # The same host is often announced on several services: probe it once
+                    earlier = seen.get(printer.host)
+                    if earlier:
+                        if earlier.printer_type == PrinterType.UNKNOWN and printer.printer_type != PrinterType.UNKNOWN:
+                            earlier.printer_type = printer.printer_type
+                        continue
+                    seen[printer.host] = printer
+                    probes.add(asyncio.ensure_future(identify(printer)))
+            finally:
+                await run_in(FILE_IO, self._zeroconf.close)
+                if probes:
+                    await asyncio.gather(*probes, return_exceptions=True)
+                await self._save_discovery_cache()
+                found.put_nowait(finished)
+
+        browse_task = asyncio.ensure_future(browse())
+        count = 0
+        try:
+            while True:
+                printer = await found.get()
+                if printer is finished:
+                    break
+                # Avoid duplicates if we found same host on multiple services
+                self.printers[printer.host] = printer
+                count += 1
+                yield printer
+        finally:
+            tasks = [browse_task, *probes]
+            for task in tasks:
+                task.cancel()
+            # Let browse() close Zeroconf and the probes unwind before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+            print(f"[PRINTER] Discovery complete. Found {count} printers.")
+
+    async def discover_printers(self, timeout: float = 5.0, settle: Optional[float] = None) -> List[Dict]:
+        """
+        Discovers 3D printers on the local network via mDNS.
+        Returns all known printers. With `settle`, returns early once that many
+        seconds pass without a new printer after the first one was found.
+        """
+        results = self.discover_printers_iter(timeout)
+        try:
+            waiting_for_first = True
+            while True:
+                try:
+                    if waiting_for_first or settle is None:
+                        await results.__anext__()
+                    else:
+                        await asyncio.wait_for(results.__anext__(), settle)
+                    waiting_for_first = False
+                except (StopAsyncIteration, asyncio.TimeoutError):
+                    break
+        finally:
+            await results.aclose()
         return [p.to_dict() for p in self.printers.values()]
 
+    async def _save_discovery_cache(self):
+        snapshot = self.discovery_cache.snapshot()
+        if not snapshot:
+            return
+        try:
+            await run_in(FILE_IO, self.discovery_cache.write, snapshot)
+        except OSError as e:
+            print(f"[PRINTER] [WARN] Could not save discovery cache: {e}")
+
+    def _apply_cached_identity(self, printer: Printer) -> bool:
+        """Fills type and camera from the discovery cache. Returns False if the printer is not cached (or never identified)."""
+        entry = self.discovery_cache.get(printer.host, printer.port, printer.name)
+        if not entry or entry["printer_type"] == PrinterType.UNKNOWN.value:
+            return False
+        if printer.printer_type == PrinterType.UNKNOWN:
+            printer.printer_type = PrinterType(entry["printer_type"])
+        if not printer.camera_url:
+            printer.camera_url = entry.get("camera_url")
+        self.discovery_cache.put(printer, verified=False)
+        if not self.discovery_cache.is_fresh(entry):
+            self._schedule_revalidation(printer)
+        return True
+
+    def _schedule_revalidation(self, printer: Printer):
+        key = DiscoveryCache.key(printer.host, printer.port, printer.name)
+        task = self._revalidations.get(key)
+        if task is None or task.done():
+            self._revalidations[key] = asyncio.ensure_future(self._revalidate(printer))
+
+    async def _revalidate(self, printer: Printer):
+        """Re-probes a cached printer in the background and updates it and the cache."""
+        probe = Printer(name=printer.name, host=printer.host, port=printer.port, printer_type=PrinterType.UNKNOWN)
+        try:
+            await self._identify_printer(probe)
+        except Exception as e:
+            print(f"[PRINTER] Re-verifying {printer.name} failed: {e}")
+            return
+        if probe.printer_type == PrinterType.UNKNOWN:
+            # Offline (or no longer a printer): keep the cached identity and try again next time
+            print(f"[PRINTER] Could not re-verify {printer.name} at {printer.host}:{printer.port}")
+            return
+        printer.printer_type = probe.printer_type
+        printer.camera_url = probe.camera_url
+        self.discovery_cache.put(printer)
+        await self._save_discovery_cache()
+
+    def restore_cached_printers(self) -> List[Printer]:
+        """
+        Makes every cached printer usable immediately (e.g. at startup), without
+        waiting for discovery. Stale entries are re-verified in the background, so
+        call this from the event loop. Printers already known (saved in settings)
+        are left alone.
+        """
+        restored = []
+        for entry in self.discovery_cache.entries.values():
+            if entry["host"] in self.printers or entry["printer_type"] == PrinterType.UNKNOWN.value:
+                continue
+            printer = DiscoveryCache.to_printer(entry)
+            self.printers[printer.host] = printer
+            restored.append(printer)
+            if not self.discovery_cache.is_fresh(entry):
+                self._schedule_revalidation(printer)
+        if restored:
+            print(f"[PRINTER] Restored {len(restored)} printers from the discovery cache")
+        return restored
+
+    async def _identify_printer(self, printer: Printer):
+        """Runs the type probe (for generic HTTP hits) and the camera probe concurrently."""
+        type_probe = (self._probe_printer_type(printer.host, printer.port)
+                      if printer.printer_type == PrinterType.UNKNOWN else None)
+        camera_probe = self._probe_camera(printer.host, printer.port) if not printer.camera_url else None
+        results = await asyncio.gather(*[probe for probe in (type_probe, camera_probe) if probe])
+        if type_probe:
+            ptype = results.pop(0)
+            if ptype != PrinterType.UNKNOWN:
+                printer.printer_type = ptype
+                print(f"[PRINTER] Identified {printer.name} as {ptype.value}")
+        if camera_probe and results[0]:
+            printer.camera_url = results[0]
+
     async def _probe_printer_type(self, host: str, port: int) -> PrinterType:
-        """Probe a host to check if it's running Moonraker or OctoPrint."""
+        """Probe a host to check if it's running Moonraker or OctoPrint (all endpoints at once)."""
         print(f"[PRINTER DEBUG] Probing http://{host}:{port}...")
         try:
-            # Short timeout to avoid hangs on unreachable ports
-            timeout = aiohttp.ClientTimeout(total=2.0, connect=1.0)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                # Check Moonraker (Creality K1, Klipper)
-                # /printer/info is a standard Moonraker public endpoint
-                try:
-                    url = f"http://{host}:{port}/printer/info"
-                    async with session.get(url) as resp:
-                        print(f"[PRINTER DEBUG] {url} -> {resp.status}")
-                        if resp.status == 200:
-                            data = await resp.json()
-                            if "result" in data or "hostname" in data:
-                                print(f"[PRINTER DEBUG] Found MOONRAKER at {host}:{port}")
-                                return PrinterType.MOONRAKER
-                except asyncio.TimeoutError:
-                    print(f"[PRINTER DEBUG] Timeout probing {host}:{port}")
-                except Exception as e:
-                    print(f"[PRINTER DEBUG] Error probing {host}:{port}: {e}")
-
-                # Check OctoPrint
-                # /api/version usually requires key, but returns 401 or 200
-                try:
-                     url = f"http://{host}:{port}/api/version"
-                     async with session.get(url) as resp:
-                         print(f"[PRINTER DEBUG] {url} -> {resp.status}")
-                         # 200 (if public), 403 (needs key) - both mean it IS OctoPrint
-                         if resp.status in (200, 403, 401):
-                             print(f"[PRINTER DEBUG] Found OCTOPRINT at {host}:{port}")
-                             return PrinterType.OCTOPRINT
-                except asyncio.TimeoutError:
-                     pass
-                except Exception:
-                     pass
-                     
-                # Fallback: Check root for identification
-                try:
-                    url = f"http://{host}:{port}/"
-                    async with session.get(url) as resp:
-                        content = await resp.text()
-                        print(f"[PRINTER DEBUG] Root {url} -> {resp.status}")
-                        if "<title>" in content:
-                            title = content.split("<title>")[1].split("</title>")[0]
-                            print(f"[PRINTER DEBUG] Page Title: {title}")
-                        if "Server" in resp.headers:
-                            print(f"[PRINTER DEBUG] Server Header: {resp.headers['Server']}")
-                except:
-                    pass
-                    
+            # Short per-request timeout to avoid hangs on unreachable ports
+            session = await self._get_session()
+            is_moonraker, is_octoprint, _ = await asyncio.gather(
+                self._probe_moonraker(session, host, port),
+                self._probe_octoprint(session, host, port),
+                self._probe_root(session, host, port),
+            )
         except Exception as e:
             print(f"[PRINTER] Probe error for {host}:{port}: {e}")
-        
+            return PrinterType.UNKNOWN
+
+        # Moonraker also emulates parts of the OctoPrint API, so it wins a tie
+        if is_moonraker:
+            print(f"[PRINTER DEBUG] Found MOONRAKER at {host}:{port}")
+            return PrinterType.MOONRAKER
+        if is_octoprint:
+            print(f"[PRINTER DEBUG] Found OCTOPRINT at {host}:{port}")
+            return PrinterType.OCTOPRINT
         return PrinterType.UNKNOWN
 
+    async def _probe_moonraker(self, session: aiohttp.ClientSession, host: str, port: int) -> bool:
+        # Check Moonraker (Creality K1, Klipper)
+        # /printer/info is a standard Moonraker public endpoint
+        url = f"http://{host}:{port}/printer/info"
+        try:
+            async with session.get(url, timeout=PROBE_TIMEOUT) as resp:
+                print(f"[PRINTER DEBUG] {url} -> {resp.status}")
+                if resp.status == 200:
+                    data = await resp.json()
+                    return "result" in data or "hostname" in data
+        except asyncio.TimeoutError:
+            print(f"[PRINTER DEBUG] Timeout probing {host}:{port}")
+        except Exception as e:
+            print(f"[PRINTER DEBUG] Error probing {host}:{port}: {e}")
+        return False
+
+    async def _probe_octoprint(self, session: aiohttp.ClientSession, host: str, port: int) -> bool:
+        # /api/version usually requires key, but returns 401 or 200
+        url = f"http://{host}:{port}/api/version"
+        try:
+            async with session.get(url, timeout=PROBE_TIMEOUT) as resp:
+                print(f"[PRINTER DEBUG] {url} -> {resp.status}")
+                # 200 (if public), 403 (needs key) - both mean it IS OctoPrint
+                return resp.status in (200, 403, 401)
+        except Exception:
+            return False
+
+    async def _probe_root(self, session: aiohttp.ClientSession, host: str, port: int):
+        # Root page, for identification in the log only
+        url = f"http://{host}:{port}/"
+        try:
+            async with session.get(url, timeout=PROBE_TIMEOUT) as resp:
+                content = await resp.text()
+                print(f"[PRINTER DEBUG] Root {url} -> {resp.status}")
+                if "<title>" in content:
+                    title = content.split("<title>")[1].split("</title>")[0]
+                    print(f"[PRINTER DEBUG] Page Title: {title}")
+                if "Server" in resp.headers:
+                    print(f"[PRINTER DEBUG] Server Header: {resp.headers['Server']}")
+        except Exception:
+            pass
+
     async def _probe_camera(self, host: str, port: int) -> Optional[str]:
-        """Probe for common camera stream URLs."""
+        """Probe for common camera stream URLs (all at once; the first path in the list that answers wins)."""
         # Common stream paths
         paths = [
             "/webcam/?action=stream",      # OctoPrint / mjpg-streamer default
@@ -472,27 +740,27 @@ class PrinterAgent:
             "/stream",
             ":8080/?action=stream",        # mjpg-streamer standalone port
         ]
-        
-        timeout = aiohttp.ClientTimeout(total=2.0, connect=1.0)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            for path in paths:
-                try:
-                    target = path if path.startswith(":") else f":{port}{path}"
-                    # Handle raw port case
-                    if target.startswith(":"):
-                        url = f"http://{host}{target}"
-                    else:
-                        url = f"http://{host}{target}"
-                        
-                    async with session.get(url) as resp:
-                        if resp.status == 200:
-                            # Verify content type is a stream
-                            ctype = resp.headers.get("Content-Type", "")
-                            if "multipart/x-mixed-replace" in ctype or "image" in ctype:
-                                print(f"[PRINTER] Found Camera: {url}")
-                                return url
-                except:
-                    continue
+        session = await self._get_session()
+
+        async def check(path: str) -> Optional[str]:
+            # Handle raw port case
+            target = path if path.startswith(":") else f":{port}{path}"
+            url = f"http://{host}{target}"
+            try:
+                async with session.get(url, timeout=PROBE_TIMEOUT) as resp:
+                    if resp.status == 200:
+                        # Verify content type is a stream
+                        ctype = resp.headers.get("Content-Type", "")
+                        if "multipart/x-mixed-replace" in ctype or "image" in ctype:
+                            return url
+            except Exception:
+                pass
+            return None
+
+        for url in await asyncio.gather(*[check(path) for path in paths]):
+            if url:
+                print(f"[PRINTER] Found Camera: {url}")
+                return url
         return None
     
     def add_printer_manually(self, name: str, host: str, port: int = 80, 
@@ -500,6 +768,10 @@ class PrinterAgent:
                              camera_url: Optional[str] = None) -> Printer:
         """Manually add a printer (useful when mDNS discovery fails)."""
         ptype = PrinterType(printer_type) if printer_type in [e.value for e in PrinterType] else PrinterType.UNKNOWN
+        if not camera_url:
+            # A camera found by an earlier discovery of the same address
+            cached = self.discovery_cache.find(host, port)
+            camera_url = cached.get("camera_url") if cached else None
         printer = Printer(name=name, host=host, port=port, printer_type=ptype, api_key=api_key, camera_url=camera_url)
         self.printers[host] = printer
         print(f"[PRINTER] Manually added: {name} at {host}:{port}")
@@ -581,6 +853,21 @@ class PrinterAgent:
             print(f"[PRINTER] Error: STL file not found: {stl_path} (root: {root_path})")
             return None
         stl_path = resolved_path
+
+        # Check the mesh before paying for a slicer run (uses the cached indexed mesh when there is one)
+        if stl_path.lower().endswith(".stl"):
+            try:
+                stats = await run_in(CPU_SUBPROCESS, mesh_stats, stl_path)
+            except (OSError, ValueError) as e:
+                print(f"[PRINTER] Error: Could not read STL {stl_path}: {e}")
+                return None
+            if stats["triangles"] == 0:
+                print(f"[PRINTER] Error: STL has no triangles: {stl_path}")
+                return None
+            width, depth, height = stats["size"]
+            print(f"[PRINTER] Mesh: {stats['triangles']} triangles, {width:.1f} x {depth:.1f} x {height:.1f} mm")
+            if not stats.get("watertight", True):
+                print(f"[PRINTER] [WARN] Mesh is not watertight ({stats['boundary_edges']} open edges); the slicer may repair or reject it")
         
         # Default output path - save to project's gcode folder if root_path is provided
         if not output_path:
@@ -595,6 +882,7 @@ class PrinterAgent:
         
         # Build command
         is_orca = "OrcaSlicer" in self.slicer_path
+        profiles = None
         
         if is_orca:
             # OrcaSlicer CLI: orca-slicer [OPTIONS] [file.stl]
@@ -611,9 +899,9 @@ class PrinterAgent:
             ]
             
             # Auto-detect profiles if printer_name is provided
-            profiles = None
             if printer_name:
-                profiles = self.get_profiles_for_printer(printer_name)
+                # The first lookup may build the profile index
+                profiles = await run_in(FILE_IO, self.get_profiles_for_printer, printer_name)
             
             # Build settings string: "machine.json;process.json"
             settings_files = []
@@ -663,15 +951,74 @@ class PrinterAgent:
                 cmd.insert(1, "--load")
                 cmd.insert(2, profile_path)
         
+        # Same model, same resolved profiles, same slicer: reuse the G-code sliced before
+        cache_key = None
+        if self.gcode_cache:
+            used_profiles = {kind: path for kind, path in (profiles or {}).items() if path}
+            if profile_path and os.path.exists(profile_path):
+                used_profiles["legacy"] = profile_path
+            try:
+                cache_key = await run_in(FILE_IO, self._gcode_cache_key, stl_path, used_profiles)
+            except OSError as e:
+                print(f"[PRINTER] [WARN] Could not compute G-code cache key: {e}")
+        
+        if not cache_key:
+            return await self._run_slicer(cmd, stl_path, output_path, is_orca, progress_callback)
+        
+        # Concurrent jobs for the same part (e.g. two identical printers) slice it once
+        async with self._slice_lock(cache_key):
+            if await run_in(FILE_IO, self.gcode_cache.get, cache_key, output_path):
+                print(f"[PRINTER] G-code cache hit, skipping slicer: {output_path}")
+                if progress_callback:
+                    await progress_callback(100, "Slicing Complete (cached)")
+                return output_path
+            
+            gcode_path = await self._run_slicer(cmd, stl_path, output_path, is_orca, progress_callback)
+            if gcode_path and os.path.exists(gcode_path):
+                meta = {"stl": os.path.basename(stl_path), "printer": printer_name,
+                        "profiles": {kind: os.path.basename(path) for kind, path in used_profiles.items()}}
+                try:
+                    await run_in(FILE_IO, self.gcode_cache.put, cache_key, gcode_path, meta)
+                except OSError as e:
+                    print(f"[PRINTER] [WARN] Could not cache G-code: {e}")
+            return gcode_path
+    
+    def _gcode_cache_key(self, stl_path: str, profiles: Dict[str, str]) -> str:
+        """Cache key of a slice: STL content, each profile with its inherits chain, and the slicer build."""
+        profile_hashes = {kind: profile_hash(self.profile_index.inheritance(path) or [path])
+                          for kind, path in profiles.items()}
+        return slice_key(file_sha256(stl_path), profile_hashes, slicer_fingerprint(self.slicer_path))
+    
+    @contextlib.asynccontextmanager
+    async def _slice_lock(self, key: str):
+        entry = self._slice_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._slice_locks[key]
+    
+    async def _run_slicer(self, cmd: List[str], stl_path: str, output_path: str, is_orca: bool,
+                          progress_callback: Optional[Any] = None) -> Optional[str]:
+        """Runs the slicer command and moves its output to output_path. Returns output_path, or None on failure."""
         print(f"[PRINTER] Slicing: {stl_path}")
         print(f"[PRINTER] Command: {' '.join(cmd)}")
         
+        # G-code left from an earlier slice must not pass for this one's output
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            pass
+        
         try:
             # Notify slicing start
             if progress_callback:
                 await progress_callback(5, "Starting slicer...")
             
-            # Use asyncio.to_thread for Windows compatibility (asyncio.create_subprocess_exec
+            # Run in a worker thread for Windows compatibility (asyncio.create_subprocess_exec
             # throws NotImplementedError on Windows with certain event loop policies)
             import subprocess
             
@@ -679,7 +1026,8 @@ class PrinterAgent:
                 await progress_callback(10, "Running slicer...")
             
             try:
-                result = await asyncio.to_thread(
+                result = await run_in(
+                    CPU_SUBPROCESS,
                     subprocess.run,
                     cmd,
                     capture_output=True,
@@ -723,8 +1071,10 @@ class PrinterAgent:
                             import shutil
                             shutil.move(actual_gcode, output_path)
                             print(f"[PRINTER] Renamed {os.path.basename(actual_gcode)} -> {os.path.basename(output_path)}")
-                    elif not os.path.exists(output_path):
-                        print(f"[PRINTER] Warning: Expected G-code not found in {output_dir}")
+                
+                if not os.path.exists(output_path):
+                    print(f"[PRINTER] Slicing failed: no G-code at {output_path}")
+                    return None
 
                 print(f"[PRINTER] Slicing complete: {output_path}")
                 if progress_callback:
@@ -782,20 +1132,20 @@ class PrinterAgent:
         filename = os.path.basename(gcode_path)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                with open(gcode_path, 'rb') as f:
-                    data = aiohttp.FormData()
-                    data.add_field('file', f, filename=filename)
-                    if start_print:
-                        data.add_field('print', 'true')
-                    
-                    async with session.post(url, data=data, headers=headers) as resp:
-                        if resp.status in (200, 201, 202, 204):
-                            print(f"[PRINTER] Uploaded {filename} to OctoPrint at {printer.host}")
-                            return True
-                        else:
-                            print(f"[PRINTER] OctoPrint upload failed ({resp.status})")
-                            return False
+            session = await self._get_session()
+            with open(gcode_path, 'rb') as f:
+                data = aiohttp.FormData()
+                data.add_field('file', f, filename=filename)
+                if start_print:
+                    data.add_field('print', 'true')
+                
+                async with session.post(url, data=data, headers=headers, timeout=self.upload_timeout) as resp:
+                    if resp.status in (200, 201, 202, 204):
+                        print(f"[PRINTER] Uploaded {filename} to OctoPrint at {printer.host}")
+                        return True
+                    else:
+                        print(f"[PRINTER] OctoPrint upload failed ({resp.status})")
+                        return False
         except Exception as e:
             print(f"[PRINTER] OctoPrint upload error: {e}")
             return False
@@ -808,30 +1158,30 @@ class PrinterAgent:
         filename = os.path.basename(gcode_path)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                with open(gcode_path, 'rb') as f:
-                    data = aiohttp.FormData()
-                    data.add_field('file', f, filename=filename)
-                    # Explicitly set root if needed, but default is usually fine?
-                    
-                    async with session.post(url, data=data) as resp:
-                        if resp.status in (200, 201):
-                            print(f"[PRINTER] Uploaded {filename} to Moonraker at {printer.host}")
-                            
-                            if start_print:
-                                # Trigger print
-                                print_url = f"http://{printer.host}:{printer.port}/printer/print/start"
-                                data_print = {"filename": filename}
-                                async with session.post(print_url, json=data_print) as resp_print:
-                                    if resp_print.status == 200:
-                                        print(f"[PRINTER] Started print on Moonraker")
-                                        return True
-                                    else:
-                                        print(f"[PRINTER] Moonraker start print failed ({resp_print.status})")
-                                        return False
-                            return True
-                        else:
-                            print(f"[PRINTER] Moonraker upload failed ({resp.status}). Trying OctoPrint compatibility layer...")
+            session = await self._get_session()
+            with open(gcode_path, 'rb') as f:
+                data = aiohttp.FormData()
+                data.add_field('file', f, filename=filename)
+                # Explicitly set root if needed, but default is usually fine?
+                
+                async with session.post(url, data=data, timeout=self.upload_timeout) as resp:
+                    if resp.status in (200, 201):
+                        print(f"[PRINTER] Uploaded {filename} to Moonraker at {printer.host}")
+                        
+                        if start_print:
+                            # Trigger print
+                            print_url = f"http://{printer.host}:{printer.port}/printer/print/start"
+                            data_print = {"filename": filename}
+                            async with session.post(print_url, json=data_print) as resp_print:
+                                if resp_print.status == 200:
+                                    print(f"[PRINTER] Started print on Moonraker")
+                                    return True
+                                else:
+                                    print(f"[PRINTER] Moonraker start print failed ({resp_print.status})")
+                                    return False
+                        return True
+                    else:
+                        print(f"[PRINTER] Moonraker upload failed ({resp.status}). Trying OctoPrint compatibility layer...")
 
             # Fallback to OctoPrint API (as Moonraker usually supports it and Creality K1 definitely does)
             return await self._upload_octoprint(printer, gcode_path, start_print)
@@ -839,24 +1189,24 @@ class PrinterAgent:
         except Exception as e:
             print(f"[PRINTER] Moonraker upload error: {e}")
             return False
-        except Exception as e:
-            print(f"[PRINTER] Moonraker upload error: {e}")
-            return False
 
-    async def get_print_status(self, target: str) -> Optional[PrintStatus]:
+    async def get_print_status(self, target: str, max_age: float = 1.0, force: bool = False) -> Optional[PrintStatus]:
         """
-        Get current status of a printer.
+        Get current status of a printer. Concurrent callers share one request, and a
+        result younger than `max_age` seconds is reused; unreachable printers are
+        retried with exponential backoff (see StatusScheduler) unless `force` is set.
         """
         printer = self._resolve_printer(target)
         if not printer:
             return None
             
         if printer.printer_type == PrinterType.OCTOPRINT:
-            return await self._status_octoprint(printer)
+            fetch = self._status_octoprint
         elif printer.printer_type == PrinterType.MOONRAKER:
-            return await self._status_moonraker(printer)
+            fetch = self._status_moonraker
         else:
             return None
+        return await self.status_scheduler.get(printer.host, lambda: fetch(printer), max_age=max_age, force=force)
             
     async def _status_octoprint(self, printer: Printer) -> Optional[PrintStatus]:
         """Get status from OctoPrint."""
@@ -867,46 +1217,46 @@ class PrinterAgent:
             headers["X-Api-Key"] = printer.api_key
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Fetch Job Status
-                job_data = {}
-                async with session.get(job_url, headers=headers) as resp:
-                    if resp.status == 200:
-                        job_data = await resp.json()
+            session = await self._get_session()
+            # Fetch Job Status
+            job_data = {}
+            async with session.get(job_url, headers=headers) as resp:
+                if resp.status == 200:
+                    job_data = await resp.json()
+            
+            # Fetch Printer Status (Temps)
+            temps = {}
+            async with session.get(printer_url, headers=headers) as resp:
+                if resp.status == 200:
+                    printer_data = await resp.json()
+                    # OctoPrint structure: temperature -> tool0, bed
+                    temp_data = printer_data.get("temperature", {})
+                    if "tool0" in temp_data:
+                        temps["hotend"] = {
+                            "current": temp_data["tool0"].get("actual", 0),
+                            "target": temp_data["tool0"].get("target", 0)
+                        }
+                    if "bed" in temp_data:
+                        temps["bed"] = {
+                            "current": temp_data["bed"].get("actual", 0),
+                            "target": temp_data["bed"].get("target", 0)
+                        }
+
+            if job_data:
+                progress = job_data.get("progress", {})
+                job = job_data.get("job", {})
                 
-                # Fetch Printer Status (Temps)
-                temps = {}
-                async with session.get(printer_url, headers=headers) as resp:
-                    if resp.status == 200:
-                        printer_data = await resp.json()
-                        # OctoPrint structure: temperature -> tool0, bed
-                        temp_data = printer_data.get("temperature", {})
-                        if "tool0" in temp_data:
-                            temps["hotend"] = {
-                                "current": temp_data["tool0"].get("actual", 0),
-                                "target": temp_data["tool0"].get("target", 0)
-                            }
-                        if "bed" in temp_data:
-                            temps["bed"] = {
-                                "current": temp_data["bed"].get("actual", 0),
-                                "target": temp_data["bed"].get("target", 0)
-                            }
-
-                if job_data:
-                    progress = job_data.get("progress", {})
-                    job = job_data.get("job", {})
-                    
-                    return PrintStatus(
-                        printer=printer.name,
-                        state=job_data.get("state", "unknown").lower(),
-                        progress_percent=progress.get("completion") or 0,
-                        time_remaining=self._format_time(progress.get("printTimeLeft")),
-                        time_elapsed=self._format_time(progress.get("printTime")),
-                        filename=job.get("file", {}).get("name"),
-                        temperatures=temps
-                    )
-                else:
-                    return None
+                return PrintStatus(
+                    printer=printer.name,
+                    state=job_data.get("state", "unknown").lower(),
+                    progress_percent=progress.get("completion") or 0,
+                    time_remaining=self._format_time(progress.get("printTimeLeft")),
+                    time_elapsed=self._format_time(progress.get("printTime")),
+                    filename=job.get("file", {}).get("name"),
+                    temperatures=temps
+                )
+            else:
+                return None
 
         except Exception as e:
             print(f"[PRINTER] OctoPrint status error: {e}")
@@ -917,42 +1267,19 @@ class PrinterAgent:
         url = f"http://{printer.host}:{printer.port}/printer/objects/query?print_stats&display_status&heater_bed&extruder"
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        # Clear error state on success
-                        self._error_tracker.discard(printer.host)
-                        
-                        data = await resp.json()
-                        status = data.get("result", {}).get("status", {})
-                        stats = status.get("print_stats", {})
-                        display = status.get("display_status", {})
-                        extruder = status.get("extruder", {})
-                        bed = status.get("heater_bed", {})
-                        
-                        return PrintStatus(
-                            printer=printer.name,
-                            state=stats.get("state", "unknown"),
-                            progress_percent=(display.get("progress") or 0) * 100,
-                            time_remaining=None,  # Moonraker doesn't provide this directly
-                            time_elapsed=self._format_time(stats.get("print_duration")),
-                            filename=stats.get("filename"),
-                            temperatures={
-                                "hotend": {
-                                    "current": extruder.get("temperature", 0),
-                                    "target": extruder.get("target", 0)
-                                },
-                                "bed": {
-                                    "current": bed.get("temperature", 0),
-                                    "target": bed.get("target", 0)
-                                }
-                            }
-                        )
-                    else:
-                         if printer.host not in self._error_tracker:
-                            print(f"[PRINTER] Moonraker status failed ({resp.status})")
-                            self._error_tracker.add(printer.host)
-                         return None
+            session = await self._get_session()
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    # Clear error state on success
+                    self._error_tracker.discard(printer.host)
+                    
+                    data = await resp.json()
+                    return self._moonraker_status(printer, data.get("result", {}).get("status", {}))
+                else:
+                     if printer.host not in self._error_tracker:
+                        print(f"[PRINTER] Moonraker status failed ({resp.status})")
+                        self._error_tracker.add(printer.host)
+                     return None
         except Exception as e:
             msg = str(e)
             if printer.host not in self._error_tracker:
@@ -972,6 +1299,32 @@ class PrinterAgent:
                 temperatures={}
             )
 
+    def _moonraker_status(self, printer: Printer, status: Dict[str, Dict[str, Any]]) -> PrintStatus:
+        """Builds a PrintStatus from Moonraker's print_stats / display_status / extruder / heater_bed objects."""
+        stats = status.get("print_stats", {})
+        display = status.get("display_status", {})
+        extruder = status.get("extruder", {})
+        bed = status.get("heater_bed", {})
+
+        return PrintStatus(
+            printer=printer.name,
+            state=stats.get("state", "unknown"),
+            progress_percent=(display.get("progress") or 0) * 100,
+            time_remaining=None,  # Moonraker doesn't provide this directly
+            time_elapsed=self._format_time(stats.get("print_duration")),
+            filename=stats.get("filename"),
+            temperatures={
+                "hotend": {
+                    "current": extruder.get("temperature", 0),
+                    "target": extruder.get("target", 0)
+                },
+                "bed": {
+                    "current": bed.get("temperature", 0),
+                    "target": bed.get("target", 0)
+                }
+            }
+        )
+
     def _format_time(self, seconds: Optional[float]) -> Optional[str]:
         if seconds is None:
             return None
@@ -1029,5 +1382,6 @@ if __name__ == "__main__":
             status = await agent.get_print_status(printer['host'])
             if status:
                 print(f"Status: {status.to_dict()}")
+        await agent.close()
     
     asyncio.run(main())
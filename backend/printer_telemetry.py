@@ -0,0 +1,249 @@
+"""
+PrinterTelemetry - Pushes printer status to the UI only when it changes.
+
+Moonraker printers get one persistent JSON-RPC websocket each, subscribed to
+print_stats, display_status, extruder and heater_bed. The subscribe reply is
+the full state; after that Moonraker sends `notify_status_update` deltas,
+which are merged into an in-memory snapshot per printer.
+
+OctoPrint / PrusaLink printers, and Moonraker printers whose websocket is
+down, are polled over HTTP (PrinterAgent.get_print_status) whenever the
+agent's StatusScheduler says they are due: fast while printing or paused,
+slow while idle, backing off while unreachable. Pushed statuses are recorded
+in the scheduler too, so get_print_status callers reuse them.
+
+Either way a status is published only if it differs from the last one sent
+for that printer, so an idle printer costs nothing on the socket. Changes
+within `min_interval` of the last publish (temperatures and progress arrive
+several times a second while printing) are held back and merged into one
+pending status; a new state or file name is published at once.
+"""
+
+import asyncio
+import itertools
+import json
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+from printer_agent import Printer, PrinterAgent, PrinterType, PrintStatus
+
+SUBSCRIBED_OBJECTS = ("print_stats", "display_status", "extruder", "heater_bed")
+
+StatusCallback = Callable[[dict], Awaitable[None]]
+
+
+class MoonrakerSubscription:
+    """One persistent websocket to a Moonraker printer, keeping a merged snapshot of the subscribed objects."""
+
+    def __init__(self, agent: PrinterAgent, printer: Printer, on_change: Callable[[Printer], Awaitable[None]],
+                 max_backoff: float = 30.0):
+        self.agent = agent
+        self.printer = printer
+        self.on_change = on_change
+        self.max_backoff = max_backoff
+        self.snapshot: Dict[str, Dict] = {}
+        self.connected = False
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.printer.host}:{self.printer.port}/websocket"
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.connected = False
+
+    def status(self) -> PrintStatus:
+        return self.agent._moonraker_status(self.printer, self.snapshot)
+
+    def _merge(self, delta: Dict[str, Dict]):
+        for name, fields in delta.items():
+            if isinstance(fields, dict):
+                self.snapshot.setdefault(name, {}).update(fields)
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                await self._session()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connected or backoff == 1.0:
+                    print(f"[TELEMETRY] Websocket to {self.printer.name} unavailable: {e}")
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _session(self):
+        session = await self.agent._get_session()
+        async with session.ws_connect(self.url, heartbeat=30) as ws:
+            subscribe_id = next(self._ids)
+            await ws.send_json({
+                "jsonrpc": "2.0",
+                "method": "printer.objects.subscribe",
+                "params": {"objects": {name: None for name in SUBSCRIBED_OBJECTS}},
+                "id": subscribe_id,
+            })
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    if msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                        break
+                    continue
+                try:
+                    data = json.loads(msg.data)
+                except ValueError:
+                    continue
+                if data.get("id") == subscribe_id:
+                    if "error" in data:
+                        raise RuntimeError(f"subscribe failed: {data['error']}")
+                    # The reply holds the full state of every subscribed object
+                    self.snapshot = {}
+                    self._merge(data.get("result", {}).get("status", {}))
+                    if not self.connected:
+                        print(f"[TELEMETRY] Subscribed to {self.printer.name} at {self.url}")
+                    self.connected = True
+                    await self.on_change(self.printer)
+                elif data.get("method") == "notify_status_update" and self.connected:
+                    params = data.get("params") or [{}]
+                    self._merge(params[0])
+                    await self.on_change(self.printer)
+                elif data.get("method") == "notify_klippy_disconnected":
+                    # Klippy restarting: the subscription must be renewed once it is back
+                    break
+
+
+class PrinterTelemetry:
+    """
+    Drives status updates for every known printer. Call tick() periodically
+    (the server does so every second); it starts/stops websocket subscriptions
+    as printers come and go and runs the HTTP polls that are due.
+    """
+
+    def __init__(self, agent: PrinterAgent, on_status: StatusCallback, min_interval: float = 1.0):
+        self.agent = agent
+        self.on_status = on_status
+        self.min_interval = min_interval
+        self.subscriptions: Dict[str, MoonrakerSubscription] = {}  # host -> subscription
+        self._last_sent: Dict[str, dict] = {}  # host -> last published status
+        self._sent_at: Dict[str, float] = {}  # host -> loop time of the last publish
+        self._pending: Dict[str, dict] = {}  # host -> newest status held back until min_interval has passed
+        self._flushes: Dict[str, asyncio.Task] = {}  # host -> task publishing the pending status
+        self._polls: Dict[str, asyncio.Task] = {}  # host -> in-flight poll
+
+    @staticmethod
+    def _is_milestone(last: dict, payload: dict) -> bool:
+        return last["state"] != payload["state"] or last["filename"] != payload["filename"]
+
+    async def _publish(self, host: str, status: Optional[PrintStatus]):
+        if status is None:
+            return
+        payload = status.to_dict()
+        last = self._last_sent.get(host)
+        if last == payload:
+            self._pending.pop(host, None)
+            return
+        wait = self._sent_at.get(host, 0.0) + self.min_interval - asyncio.get_running_loop().time()
+        if last is None or wait <= 0 or self._is_milestone(last, payload):
+            await self._send(host, payload)
+            return
+        self._pending[host] = payload
+        flush = self._flushes.get(host)
+        if flush is None or flush.done():
+            self._flushes[host] = asyncio.ensure_future(self._flush(host))
+
+    async def _flush(self, host: str):
+        loop = asyncio.get_running_loop()
+        while host in self._pending:
+            wait = self._sent_at.get(host, 0.0) + self.min_interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await self._send(host, self._pending[host])
+            except Exception as e:
+                print(f"[TELEMETRY] Publishing status of {host} failed: {e}")
+
+    async def _send(self, host: str, payload: dict):
+        self._pending.pop(host, None)
+        self._last_sent[host] = payload
+        self._sent_at[host] = asyncio.get_running_loop().time()
+        await self.on_status(payload)
+
+    def _drop(self, host: str):
+        self._last_sent.pop(host, None)
+        self._sent_at.pop(host, None)
+        self._pending.pop(host, None)
+        flush = self._flushes.pop(host, None)
+        if flush:
+            flush.cancel()
+
+    async def _on_subscription_change(self, printer: Printer):
+        subscription = self.subscriptions.get(printer.host)
+        if subscription:
+            status = subscription.status()
+            self.agent.status_scheduler.record(printer.host, status)
+            await self._publish(printer.host, status)
+
+    async def _poll(self, host: str):
+        try:
+            status = await self.agent.get_print_status(host)
+            await self._publish(host, status)
+        except Exception as e:
+            print(f"[TELEMETRY] Status poll of {host} failed: {e}")
+
+    async def tick(self):
+        printers = {host: p for host, p in self.agent.printers.items() if p.printer_type != PrinterType.UNKNOWN}
+
+        # Subscriptions follow the set of Moonraker printers
+        for host in list(self.subscriptions):
+            if host not in printers or printers[host].printer_type != PrinterType.MOONRAKER:
+                await self.subscriptions.pop(host).stop()
+        for host, printer in printers.items():
+            if printer.printer_type == PrinterType.MOONRAKER and host not in self.subscriptions:
+                subscription = MoonrakerSubscription(self.agent, printer, self._on_subscription_change)
+                self.subscriptions[host] = subscription
+                subscription.start()
+        for host in list(self._last_sent):
+            if host not in printers:
+                self._drop(host)
+                self.agent.status_scheduler.forget(host)
+
+        for host in printers:
+            subscription = self.subscriptions.get(host)
+            if subscription and subscription.connected:
+                continue
+            if not self.agent.status_scheduler.due(host):
+                continue
+            poll = self._polls.get(host)
+            if poll and not poll.done():
+                continue
+            self._polls[host] = asyncio.ensure_future(self._poll(host))
+
+    def latest(self):
+        """The last published status of every printer, e.g. to refill a freshly loaded printer list."""
+        return list(self._last_sent.values())
+
+    async def close(self):
+        for subscription in self.subscriptions.values():
+            await subscription.stop()
+        self.subscriptions.clear()
+        for poll in self._polls.values():
+            poll.cancel()
+        self._polls.clear()
+        for flush in self._flushes.values():
+            flush.cancel()
+        self._flushes.clear()
+        self._pending.clear()
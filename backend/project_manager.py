@@ -104,6 +104,8 @@ class ProjectManager:
         # List all files recursively
         all_files = []
         for root, dirs, files in os.walk(project_path):
+            # Skip hidden folders such as the CAD cache (cad/.cache)
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
             for f in files:
                 rel_path = os.path.relpath(os.path.join(root, f), project_path)
                 all_files.append(rel_path)
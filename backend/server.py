@@ -10,6 +10,7 @@ import socketio
 import uvicorn
 from fastapi import FastAPI
 import asyncio
+import copy
 import threading
 import sys
 import os
@@ -25,12 +26,59 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import ada
 from authenticator import FaceAuthenticator
 from kasa_agent import KasaAgent
+from audio_visualizer import AudioAnalyzer, AudioVisualizerStream
+from artifact_store import ArtifactStore, add_artifact_routes
+from mesh_tools import PREVIEW_TRIANGLES, ensure_preview, mesh_stats
+from printer_telemetry import PrinterTelemetry
+import executors
 
 # Create a Socket.IO server
 sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
 app = FastAPI()
 app_socketio = socketio.ASGIApp(sio, app)
 
+# Generated files (STL meshes) are served over HTTP; cad_data events only carry a handle
+artifact_store = ArtifactStore()
+add_artifact_routes(app, artifact_store)
+
+async def cad_payload(result):
+    """Turns a CadAgent result (or any dict with a file_path) into the cad_data event payload."""
+    path = result.get('file_path')
+    if not path or not os.path.exists(path):
+        return result
+    artifact = artifact_store.register(path)
+    meta = {k: v for k, v in result.items() if k not in ('data', 'file_path', 'size')}
+    return artifact.to_handle(**meta)
+
+async def send_cad_preview(path, payload):
+    """
+    Follow-up to a cad_data event for an STL: its mesh stats (if missing) and, for large
+    meshes, a decimated `preview` handle, sent as 'cad_preview' keyed by the full mesh URL.
+    The UI shows the preview until the full mesh it is already fetching has loaded.
+    """
+    update = {}
+    try:
+        budget = SETTINGS.get('cad_preview_triangles', PREVIEW_TRIANGLES)
+        preview = await executors.run_in(executors.CPU_SUBPROCESS, ensure_preview, path, budget)
+        if preview:
+            preview_path, preview_triangles, _ = preview
+            update['preview'] = artifact_store.register(preview_path).to_handle(triangles=preview_triangles)
+        if not payload.get('mesh'):
+            update['mesh'] = await executors.run_in(executors.CPU_SUBPROCESS, mesh_stats, path)
+    except Exception as e:
+        print(f"[SERVER] [WARN] Could not build preview mesh: {e}")
+    if update:
+        await sio.emit('cad_preview', {'url': payload['url'], **update})
+
+async def emit_cad_data(result):
+    """Emits cad_data right away with the full mesh handle; the preview follows (see send_cad_preview)."""
+    payload = await cad_payload(result)
+    await sio.emit('cad_data', payload)
+    path = result.get('file_path')
+    if payload.get('url') and path and path.lower().endswith('.stl'):
+        asyncio.create_task(send_cad_preview(path, payload))
+    return payload
+
 import signal
 
 # --- SHUTDOWN HANDLER ---
@@ -52,7 +100,9 @@ signal.signal(signal.SIGTERM, signal_handler)
 
 # Global state
 audio_loop = None
+printer_telemetry = None  # Set while monitor_printers_loop runs
 loop_task = None
+audio_visualizer = None
 authenticator = None
 kasa_agent = KasaAgent()
 SETTINGS_FILE = "settings.json"
@@ -71,10 +121,28 @@ DEFAULT_SETTINGS = {
     },
     "printers": [], # List of {host, port, name, type}
     "kasa_devices": [], # List of {ip, alias, model}
-    "camera_flipped": False # Invert cursor horizontal direction
+    "camera_flipped": False, # Invert cursor horizontal direction
+    "audio_visualizer": {
+        "mode": "bands", # "bands" (uint8 levels), "pcm" (raw 16-bit PCM), "spectrum" or "envelope" (float32 levels computed in play_audio)
+        "frame_rate": 30, # Frames per second sent to the UI
+        "bands": 64 # Number of levels per frame
+    },
+    "audio_capture": {
+        "mode": "callback", # "callback" (PyAudio callback into a ring buffer) or "blocking" (stream.read in a worker thread)
+        "chunk_size": 1024, # Frames per chunk sent to Gemini
+        "latency_ms": 20, # PyAudio callback period
+        "overflow": "drop_oldest" # "drop_oldest" or "drop_newest" when the send side falls behind
+    },
+    "cad_speculative": {
+        "candidates": 1, # Concurrent Gemini generations raced on the first CAD attempt (1 = off); each gets a warm worker
+        "budget_s": 180 # Wall-clock budget for the race before falling back to sequential retries
+    },
+    "cad_preview_triangles": 20000, # Triangle budget of the decimated preview mesh sent before the full STL
+    "executors": {} # Per-pool overrides, e.g. {"cpu-subprocess": {"max_workers": 2, "max_queue": 8}} (applied at startup)
 }
 
-SETTINGS = DEFAULT_SETTINGS.copy()
+# Deep copy: updates to nested sections must not leak into the defaults
+SETTINGS = copy.deepcopy(DEFAULT_SETTINGS)
 
 def load_settings():
     global SETTINGS
@@ -104,6 +172,13 @@ def save_settings():
 # Load on startup
 load_settings()
 
+# Apply executor pool limits before any pool is created
+for pool_name, pool_cfg in SETTINGS.get("executors", {}).items():
+    try:
+        executors.registry.configure(pool_name, pool_cfg.get("max_workers"), pool_cfg.get("max_queue"))
+    except Exception as e:
+        print(f"[SERVER] Invalid executor settings for '{pool_name}': {e}")
+
 authenticator = None
 kasa_agent = KasaAgent(known_devices=SETTINGS.get("kasa_devices"))
 # tool_permissions is now SETTINGS["tool_permissions"]
@@ -126,7 +201,22 @@ async def startup_event():
 
 @app.get("/status")
 async def status():
-    return {"status": "running", "service": "Lou Backend"}
+    result = {"status": "running", "service": "Lou Backend"}
+    if audio_visualizer:
+        result["audio_visualizer"] = audio_visualizer.get_stats()
+    if audio_loop and audio_loop.playback:
+        result["playback"] = audio_loop.playback.get_stats()
+    if audio_loop and audio_loop.capture:
+        result["capture"] = audio_loop.capture.get_stats()
+    if audio_loop and audio_loop.cad_agent.worker_pool:
+        result["cad_worker_pool"] = audio_loop.cad_agent.worker_pool.get_stats()
+    if audio_loop:
+        result["cad_cache"] = audio_loop.cad_agent.get_cache_stats()
+    if audio_loop and audio_loop.printer_agent and audio_loop.printer_agent.gcode_cache:
+        result["gcode_cache"] = audio_loop.printer_agent.gcode_cache.get_stats()
+    result["executors"] = executors.registry.get_stats()
+    result["artifacts"] = artifact_store.get_stats()
+    return result
 
 @sio.event
 async def connect(sid, environ):
@@ -174,7 +264,7 @@ async def disconnect(sid):
 
 @sio.event
 async def start_audio(sid, data=None):
-    global audio_loop, loop_task
+    global audio_loop, loop_task, audio_visualizer
     
     # Optional: Block if not authenticated
     # Only block if auth is ENABLED and not authenticated
@@ -207,17 +297,47 @@ async def start_audio(sid, data=None):
              return
 
 
-    # Callback to send audio data to frontend
+    # Audio visualizer stream: coalesces playback chunks and emits binary frames on a fixed clock
+    if audio_visualizer:
+        audio_visualizer.stop()
+
+    async def emit_audio_frame(payload):
+        await sio.emit('audio_data', payload)
+
+    vis_settings = SETTINGS.get("audio_visualizer", {})
+    audio_visualizer = AudioVisualizerStream(
+        emit_audio_frame,
+        frame_rate=vis_settings.get("frame_rate", 30),
+        mode=vis_settings.get("mode", "bands"),
+        bands=vis_settings.get("bands", 64)
+    )
+    asyncio.create_task(audio_visualizer.run())
+
+    # Callback to send audio data to frontend. Bound to this session's visualizer:
+    # stop_audio clears the global while the audio thread may still call back.
+    push_audio = audio_visualizer.push
+
     def on_audio_data(data_bytes):
-        # We need to schedule this on the event loop
-        # This is high frequency, so we might want to downsample or batch if it's too much
-        asyncio.create_task(sio.emit('audio_data', {'data': list(data_bytes)}))
+        # High frequency - just buffer, the visualizer task emits on its frame clock
+        push_audio(data_bytes)
+
+    # In spectrum/envelope mode AudioLoop analyzes each chunk and we only receive the levels
+    audio_analyzer = None
+    if audio_visualizer.analyzed:
+        audio_analyzer = AudioAnalyzer(
+            mode=audio_visualizer.mode,
+            bands=audio_visualizer.bands,
+            sample_rate=ada.RECEIVE_SAMPLE_RATE
+        )
 
     # Callback to send CAL data to frontend
     def on_cad_data(data):
-        info = f"{len(data.get('vertices', []))} vertices" if 'vertices' in data else f"{len(data.get('data', ''))} bytes (STL)"
-        print(f"Sending CAD data to frontend: {info}")
-        asyncio.create_task(sio.emit('cad_data', data))
+        async def send():
+            payload = await emit_cad_data(data)
+            info = f"{len(data.get('vertices', []))} vertices" if 'vertices' in data else f"{payload.get('size', 0)} bytes (STL) at {payload.get('url')}"
+            print(f"Sent CAD data to frontend: {info}")
+            await emit_cad_state()
+        asyncio.create_task(send())
 
     # Callback to send Browser data to frontend
     def on_web_data(data):
@@ -271,9 +391,13 @@ async def start_audio(sid, data=None):
     # Initialize Lou
     try:
         print(f"Initializing AudioLoop with device_index={device_index}")
+        capture_cfg = {**DEFAULT_SETTINGS["audio_capture"], **SETTINGS.get("audio_capture", {})}
+        speculative_cfg = {**DEFAULT_SETTINGS["cad_speculative"], **SETTINGS.get("cad_speculative", {})}
         audio_loop = ada.AudioLoop(
             video_mode="none", 
-            on_audio_data=on_audio_data,
+            on_audio_data=None if audio_analyzer else on_audio_data,
+            on_audio_levels=audio_visualizer.push_levels,
+            audio_analyzer=audio_analyzer,
             on_cad_data=on_cad_data,
             on_web_data=on_web_data,
             on_transcription=on_transcription,
@@ -286,7 +410,13 @@ async def start_audio(sid, data=None):
 
             input_device_index=device_index,
             input_device_name=device_name,
-            kasa_agent=kasa_agent
+            kasa_agent=kasa_agent,
+            capture_mode=capture_cfg["mode"],
+            capture_chunk_size=capture_cfg["chunk_size"],
+            capture_latency_ms=capture_cfg["latency_ms"],
+            capture_overflow=capture_cfg["overflow"],
+            cad_candidates=speculative_cfg["candidates"],
+            cad_budget_s=speculative_cfg["budget_s"]
         )
         print("AudioLoop initialized successfully.")
 
@@ -328,6 +458,9 @@ async def start_audio(sid, data=None):
                     printer_type=p.get("type", "moonraker"),
                     camera_url=p.get("camera_url")
                 )
+        # Printers found by earlier discoveries are usable before any new discovery runs
+        if audio_loop.printer_agent:
+            audio_loop.printer_agent.restore_cached_printers()
         
         # Start Printer Monitor
         asyncio.create_task(monitor_printers_loop())
@@ -341,40 +474,35 @@ async def start_audio(sid, data=None):
 
 
 async def monitor_printers_loop():
-    """Background task to query printer status periodically."""
+    """Background task pushing printer status changes (Moonraker websockets, adaptive HTTP polls otherwise)."""
     print("[SERVER] Starting Printer Monitor Loop")
-    while audio_loop and audio_loop.printer_agent:
-        try:
-            agent = audio_loop.printer_agent
-            if not agent.printers:
-                await asyncio.sleep(5)
-                continue
-                
-            tasks = []
-            for host, printer in agent.printers.items():
-                if printer.printer_type.value != "unknown":
-                    tasks.append(agent.get_print_status(host))
-            
-            if tasks:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for res in results:
-                    if isinstance(res, Exception):
-                        pass # Ignore errors for now
-                    elif res:
-                        # res is PrintStatus object
-                        await sio.emit('print_status_update', res.to_dict())
-                        
-        except asyncio.CancelledError:
-            print("[SERVER] Printer Monitor Cancelled")
-            break
-        except Exception as e:
-            print(f"[SERVER] Monitor Loop Error: {e}")
-            
-        await asyncio.sleep(2) # Update every 2 seconds for responsiveness
+    agent = audio_loop.printer_agent
+
+    async def emit_status(status):
+        await sio.emit('print_status_update', status)
+
+    global printer_telemetry
+    telemetry = printer_telemetry = PrinterTelemetry(agent, emit_status)
+    try:
+        while audio_loop and audio_loop.printer_agent is agent:
+            try:
+                await telemetry.tick()
+            except Exception as e:
+                print(f"[SERVER] Monitor Loop Error: {e}")
+            await asyncio.sleep(1)
+    except asyncio.CancelledError:
+        print("[SERVER] Printer Monitor Cancelled")
+    finally:
+        await telemetry.close()
+        if printer_telemetry is telemetry:
+            printer_telemetry = None
 
 @sio.event
 async def stop_audio(sid):
-    global audio_loop
+    global audio_loop, audio_visualizer
+    if audio_visualizer:
+        audio_visualizer.stop()
+        audio_visualizer = None
     if audio_loop:
         audio_loop.stop() 
         print("Stopping Audio Loop")
@@ -605,12 +733,12 @@ async def iterate_cad(sid, data):
         
         # Call the agent with project path
         cad_output_dir = str(audio_loop.project_manager.get_current_project_path() / "cad")
-        result = await audio_loop.cad_agent.iterate_prototype(prompt, output_dir=cad_output_dir)
+        result = await audio_loop.run_cad_job(audio_loop.cad_agent.iterate_prototype(prompt, output_dir=cad_output_dir))
         
         if result:
-            info = f"{len(result.get('data', ''))} bytes (STL)"
-            print(f"Sending updated CAD data: {info}")
-            await sio.emit('cad_data', result)
+            payload = await emit_cad_data(result)
+            print(f"Sent updated CAD data: {payload.get('size', 0)} bytes (STL) at {payload.get('url')}")
+            await emit_cad_state()
             # Save to Project
             if 'file_path' in result:
                 saved_path = audio_loop.project_manager.save_cad_artifact(result['file_path'], prompt)
@@ -621,6 +749,8 @@ async def iterate_cad(sid, data):
         else:
             await sio.emit('error', {'msg': 'Failed to update design'})
             
+    except ada.CadJobCancelled:
+        await sio.emit('status', {'msg': 'Design iteration cancelled'})
     except Exception as e:
         print(f"Error iterating CAD: {e}")
         await sio.emit('error', {'msg': f"Iteration Error: {str(e)}"})
@@ -641,12 +771,12 @@ async def generate_cad(sid, data):
         
         # Use generate_prototype based on prompt with project path
         cad_output_dir = str(audio_loop.project_manager.get_current_project_path() / "cad")
-        result = await audio_loop.cad_agent.generate_prototype(prompt, output_dir=cad_output_dir)
+        result = await audio_loop.run_cad_job(audio_loop.cad_agent.generate_prototype(prompt, output_dir=cad_output_dir))
         
         if result:
-            info = f"{len(result.get('data', ''))} bytes (STL)"
-            print(f"Sending newly generated CAD data: {info}")
-            await sio.emit('cad_data', result)
+            payload = await emit_cad_data(result)
+            print(f"Sent newly generated CAD data: {payload.get('size', 0)} bytes (STL) at {payload.get('url')}")
+            await emit_cad_state()
 
 
             # Save to Project
@@ -659,10 +789,96 @@ async def generate_cad(sid, data):
         else:
             await sio.emit('error', {'msg': 'Failed to generate design'})
             
+    except ada.CadJobCancelled:
+        await sio.emit('status', {'msg': 'Design generation cancelled'})
     except Exception as e:
         print(f"Error generating CAD: {e}")
         await sio.emit('error', {'msg': f"Generation Error: {str(e)}"})
 
+@sio.event
+async def cancel_cad(sid):
+    if audio_loop and audio_loop.cancel_cad():
+        print("[SERVER] CAD job cancelled by user")
+
+def current_cad_dir():
+    return str(audio_loop.project_manager.get_current_project_path() / "cad")
+
+async def emit_cad_state():
+    """Sends the design history and the current version's parameter table."""
+    if not audio_loop or not audio_loop.cad_agent:
+        return
+    try:
+        history = await executors.run_in(executors.FILE_IO, audio_loop.cad_agent.get_history, current_cad_dir())
+        await sio.emit('cad_history', history)
+        parameters = await audio_loop.cad_agent.get_parameters(current_cad_dir())
+        await sio.emit('cad_parameters', {'parameters': parameters})
+    except Exception as e:
+        print(f"[SERVER] [WARN] Could not load CAD history: {e}")
+
+async def restore_cad_version(action, version=None):
+    if not audio_loop or not audio_loop.cad_agent:
+        await sio.emit('error', {'msg': "CAD Agent not available"})
+        return
+    try:
+        result = await audio_loop.cad_agent.restore_version(current_cad_dir(), action, version)
+    except Exception as e:
+        print(f"[SERVER] Error restoring CAD version: {e}")
+        await sio.emit('error', {'msg': f"Could not restore design: {e}"})
+        return
+    if not result:
+        await sio.emit('status', {'msg': f"Nothing to {action}"})
+        return
+    await emit_cad_data(result)
+    await sio.emit('status', {'msg': f"Design restored to v{result['version']}"})
+    await emit_cad_state()
+
+@sio.event
+async def get_cad_history(sid):
+    await emit_cad_state()
+
+@sio.event
+async def get_cad_parameters(sid):
+    await emit_cad_state()
+
+@sio.event
+async def set_cad_parameters(sid, data):
+    # data: { parameters: { num_teeth: 24, pitch_radius: 32.5 } }
+    updates = data.get('parameters') or {}
+    if not audio_loop or not audio_loop.cad_agent:
+        await sio.emit('error', {'msg': "CAD Agent not available"})
+        return
+    if not updates:
+        return
+    summary = ", ".join(f"{name}={value}" for name, value in updates.items())
+    try:
+        await sio.emit('cad_status', {'status': 'generating'})
+        result = await audio_loop.run_cad_job(audio_loop.cad_agent.set_parameters(updates, current_cad_dir()))
+    except ada.CadJobCancelled:
+        await sio.emit('status', {'msg': 'Parameter change cancelled'})
+        return
+    except Exception as e:
+        print(f"[SERVER] Error setting CAD parameters: {e}")
+        await sio.emit('cad_status', {'status': 'failed', 'error': str(e)})
+        await sio.emit('error', {'msg': f"Could not change parameters: {e}"})
+        return
+    await emit_cad_data(result)
+    await emit_cad_state()
+    audio_loop.project_manager.save_cad_artifact(result['file_path'], f"Set {summary}")
+    await sio.emit('status', {'msg': f"Design updated: {summary}"})
+
+@sio.event
+async def cad_undo(sid):
+    await restore_cad_version("undo")
+
+@sio.event
+async def cad_redo(sid):
+    await restore_cad_version("redo")
+
+@sio.event
+async def cad_checkout(sid, data):
+    # data: { version: 3 }
+    await restore_cad_version("checkout", int(data.get('version', 0)))
+
 @sio.event
 async def prompt_web_agent(sid, data):
     # data: { prompt: "find xyz" }
@@ -721,9 +937,23 @@ async def discover_printers(sid):
             return
         
     try:
-        printers = await audio_loop.printer_agent.discover_printers()
-        await sio.emit('printer_list', printers)
-        await sio.emit('status', {'msg': f"Found {len(printers)} printers"})
+        agent = audio_loop.printer_agent
+
+        async def send_list():
+            await sio.emit('printer_list', [p.to_dict() for p in agent.printers.values()])
+            # Statuses are only pushed on change: replay the current ones for the new list
+            if printer_telemetry:
+                for status in printer_telemetry.latest():
+                    await sio.emit('print_status_update', status)
+
+        # Each printer is sent as soon as it is identified, not after the whole browse window
+        found = 0
+        async for _ in agent.discover_printers_iter():
+            found += 1
+            await send_list()
+        if not found:
+            await send_list()
+        await sio.emit('status', {'msg': f"Found {len(agent.printers)} printers"})
     except Exception as e:
         print(f"Error discovering printers: {e}")
         await sio.emit('error', {'msg': f"Printer Discovery Failed: {str(e)}"})
@@ -837,17 +1067,12 @@ async def print_stl(sid, data):
         if resolved_stl and os.path.exists(resolved_stl):
             # Open the STL in the CAD module for preview
             try:
-                import base64
-                with open(resolved_stl, 'rb') as f:
-                    stl_data = f.read()
-                stl_b64 = base64.b64encode(stl_data).decode('utf-8')
                 stl_filename = os.path.basename(resolved_stl)
                 
                 print(f"[SERVER] Opening STL in CAD module: {stl_filename}")
-                await sio.emit('cad_data', {
+                await emit_cad_data({
                     'format': 'stl',
-                    'data': stl_b64,
-                    'filename': stl_filename
+                    'file_path': resolved_stl
                 })
             except Exception as e:
                 print(f"[SERVER] Warning: Could not preview STL: {e}")
@@ -878,15 +1103,24 @@ async def print_stl(sid, data):
         await sio.emit('error', {'msg': f"Print Failed: {str(e)}"})
 
 @sio.event
-async def get_slicer_profiles(sid):
-    """Get available OrcaSlicer profiles for manual selection."""
+async def get_slicer_profiles(sid, data=None):
+    """Get available OrcaSlicer profiles for manual selection, plus the auto-matched ones if a printer name is given."""
     print("Received get_slicer_profiles request")
     if not audio_loop or not audio_loop.printer_agent:
         await sio.emit('error', {'msg': "Printer Agent not available"})
         return
     
     try:
-        profiles = audio_loop.printer_agent.get_available_profiles()
+        agent = audio_loop.printer_agent
+        # Served from the persisted profile index; only the first call after a profile change reads the folders
+        profiles = await executors.run_in(executors.FILE_IO, agent.get_available_profiles)
+        printer_name = (data or {}).get('printer')
+        if printer_name:
+            matched = await executors.run_in(executors.FILE_IO, agent.get_profiles_for_printer, printer_name)
+            profiles['matched'] = {
+                kind: {'path': path, 'inherits': agent.profile_index.inheritance(path)[1:]} if path else None
+                for kind, path in matched.items()
+            }
         await sio.emit('slicer_profiles', profiles)
     except Exception as e:
         print(f"Error getting slicer profiles: {e}")
@@ -957,6 +1191,26 @@ async def update_settings(sid, data):
         SETTINGS["camera_flipped"] = data["camera_flipped"]
         print(f"[SERVER] Camera flip set to: {data['camera_flipped']}")
 
+    if "audio_visualizer" in data and isinstance(data["audio_visualizer"], dict):
+        SETTINGS.setdefault("audio_visualizer", {}).update(data["audio_visualizer"])
+        print(f"[SERVER] Audio visualizer settings (applied on next start): {SETTINGS['audio_visualizer']}")
+
+    if "audio_capture" in data and isinstance(data["audio_capture"], dict):
+        SETTINGS.setdefault("audio_capture", {}).update(data["audio_capture"])
+        print(f"[SERVER] Audio capture settings (applied on next start): {SETTINGS['audio_capture']}")
+
+    if "cad_speculative" in data and isinstance(data["cad_speculative"], dict):
+        SETTINGS.setdefault("cad_speculative", {}).update(data["cad_speculative"])
+        if audio_loop and audio_loop.cad_agent:
+            # Takes effect on the next generation; the script pools grow to fit K candidates
+            audio_loop.cad_agent.set_speculative(int(SETTINGS["cad_speculative"].get("candidates", 1)),
+                                                 SETTINGS["cad_speculative"].get("budget_s", 180))
+        print(f"[SERVER] CAD speculative settings: {SETTINGS['cad_speculative']}")
+
+    if "cad_preview_triangles" in data:
+        SETTINGS["cad_preview_triangles"] = int(data["cad_preview_triangles"])
+        print(f"[SERVER] CAD preview budget set to: {SETTINGS['cad_preview_triangles']} triangles")
+
     save_settings()
     # Broadcast new full settings
     await sio.emit('settings', SETTINGS)
@@ -0,0 +1,320 @@
+"""
+ProfileIndex - Catalog of OrcaSlicer system profiles, built once and kept on disk.
+
+OrcaSlicer ships thousands of JSON profiles under
+
+    <orca dir>/system/<vendor>/{machine,process,filament}/*.json
+
+Listing and scoring those folders on every slice is slow, so the index keeps
+one entry per profile (file, profile name, `inherits` parent, instantiation)
+and derives from them:
+
+- a token index: (vendor, type, name token) -> profiles, so a query only
+  scores profiles sharing a token with it instead of the whole folder;
+- the `inherits` chain of any profile, resolved by profile name.
+
+Entries are persisted to a JSON file together with the mtime of every
+profile folder. On load (and at most every `check_interval` seconds after)
+the folders are stat'ed and only those whose mtime changed are re-read.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+PROFILE_TYPES = ("machine", "process", "filament")
+LIST_KEYS = {"machine": "machines", "process": "processes", "filament": "filaments"}
+INDEX_VERSION = 1
+
+# Brand keywords that name a vendor folder without naming the vendor itself
+VENDOR_ALIASES = {
+    "creality": "Creality",
+    "ender": "Creality",
+    "cr-": "Creality",
+    "k1": "Creality",
+}
+DEFAULT_VENDOR = "Creality"
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lowercase alphanumeric tokens, keeping decimals such as "0.4" whole."""
+    return set(_TOKEN.findall(text.lower()))
+
+
+def score_profile(filename: str, terms: List[str], profile_type: str) -> int:
+    """How well a profile file name fits the whitespace-split, lowercased printer name `terms`."""
+    name_lower = filename.lower()
+    score = 0
+
+    # Score based on matching search terms
+    for term in terms:
+        if term in name_lower:
+            score += 10
+            # Bonus for exact model match at word boundary
+            # e.g., "k1 " or "k1." matches but "k1c" should score lower
+            if profile_type == "machine":
+                idx = name_lower.find(term)
+                after_idx = idx + len(term)
+                if after_idx < len(name_lower):
+                    next_char = name_lower[after_idx]
+                    if next_char.isalpha():
+                        # This is a variant like K1C - penalize it
+                        score -= 8
+                    elif next_char in ' .(-':
+                        # Direct match followed by delimiter - bonus
+                        score += 5
+
+    # Bonus for "0.4 nozzle" (most common)
+    if "0.4" in name_lower:
+        score += 2
+
+    # Bonus for "standard" or "optimal" process profiles
+    if profile_type == "process":
+        if "standard" in name_lower:
+            score += 5
+        elif "optimal" in name_lower:
+            score += 3
+
+    # Bonus for generic PLA filament (non-silk preferred for general use)
+    if profile_type == "filament":
+        if "pla" in name_lower and "generic" in name_lower:
+            score += 5
+            # Penalize specialty variants
+            if "-cf" in name_lower or "-gf" in name_lower:
+                score -= 5  # Carbon fiber / glass fiber variants
+            if "silk" in name_lower or "matte" in name_lower:
+                score -= 2  # Specialty finishes
+            if "high speed" in name_lower:
+                score -= 1  # Less common
+            # Plain PLA gets a bonus
+            if "@k1" in name_lower and "-" not in name_lower.split("pla")[-1].split("@")[0]:
+                score += 3  # Plain PLA for K1
+
+    return score
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _read_profile(path: str) -> Dict[str, Any]:
+    """The fields of one profile file the index needs. Unreadable files are still listed, by file name."""
+    filename = os.path.basename(path)
+    entry = {"file": filename, "name": os.path.splitext(filename)[0], "inherits": None, "instantiation": True}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[PROFILES] [WARN] Could not parse {path}: {e}")
+        return entry
+    if isinstance(data, dict):
+        entry["name"] = str(data.get("name") or entry["name"])
+        entry["inherits"] = data.get("inherits") or None
+        entry["instantiation"] = str(data.get("instantiation", "true")).lower() != "false"
+    return entry
+
+
+class ProfileIndex:
+    def __init__(self, orca_dir: Optional[str], cache_path: Optional[str] = None, check_interval: float = 60.0):
+        self.orca_dir = orca_dir
+        self.system_dir = os.path.join(orca_dir, "system") if orca_dir else None
+        self.cache_path = cache_path
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._checked = 0.0
+        # (vendor, type) -> {"mtime": folder mtime, "profiles": [entry, ...]}
+        self._folders: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Derived from _folders by _reindex
+        self._tokens: Dict[Tuple[str, str, str], Set[str]] = {}  # (vendor, type, token) -> relative paths
+        self._entries: Dict[str, Dict[str, Any]] = {}  # relative path -> entry
+        self._by_name: Dict[Tuple[Optional[str], str], str] = {}  # (vendor or None for any, profile name) -> relative path
+        self._vendor_names: Dict[str, str] = {}  # lowercase vendor -> vendor folder
+
+    # --- persistence ---
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[PROFILES] [WARN] Ignoring unreadable profile index {self.cache_path}: {e}")
+            return
+        if data.get("version") != INDEX_VERSION or data.get("orca_dir") != self.orca_dir:
+            return
+        for folder in data.get("folders", []):
+            self._folders[(folder["vendor"], folder["type"])] = {"mtime": folder["mtime"], "profiles": folder["profiles"]}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        payload = {
+            "version": INDEX_VERSION,
+            "orca_dir": self.orca_dir,
+            "folders": [{"vendor": vendor, "type": profile_type, **folder}
+                        for (vendor, profile_type), folder in sorted(self._folders.items())],
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"[PROFILES] [WARN] Could not save profile index {self.cache_path}: {e}")
+
+    # --- building ---
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Brings the index up to date with the profile folders. Cheap when nothing changed:
+        one stat per folder, at most every `check_interval` seconds. Returns True if anything was re-read.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+                force = True
+            elif not force and time.monotonic() - self._checked < self.check_interval:
+                return False
+            self._checked = time.monotonic()
+
+            seen = set()
+            changed = False
+            vendors = []
+            if self.system_dir and os.path.isdir(self.system_dir):
+                vendors = sorted(v for v in os.listdir(self.system_dir) if os.path.isdir(os.path.join(self.system_dir, v)))
+            for vendor in vendors:
+                for profile_type in PROFILE_TYPES:
+                    folder_path = os.path.join(self.system_dir, vendor, profile_type)
+                    mtime = _mtime(folder_path)
+                    if mtime is None:
+                        continue
+                    key = (vendor, profile_type)
+                    seen.add(key)
+                    folder = self._folders.get(key)
+                    if folder is not None and folder["mtime"] == mtime:
+                        continue
+                    profiles = [_read_profile(os.path.join(folder_path, f))
+                                for f in sorted(os.listdir(folder_path)) if f.endswith(".json")]
+                    self._folders[key] = {"mtime": mtime, "profiles": profiles}
+                    changed = True
+            for key in set(self._folders) - seen:
+                del self._folders[key]
+                changed = True
+
+            if changed or force:
+                self._reindex()
+            if changed:
+                count = sum(len(folder["profiles"]) for folder in self._folders.values())
+                print(f"[PROFILES] Indexed {count} OrcaSlicer profiles from {len(vendors)} vendors")
+                self._save()
+            return changed
+
+    def _reindex(self):
+        self._tokens = {}
+        self._entries = {}
+        self._by_name = {}
+        self._vendor_names = {}
+        for (vendor, profile_type), folder in self._folders.items():
+            self._vendor_names[vendor.lower()] = vendor
+            for entry in folder["profiles"]:
+                rel_path = f"system/{vendor}/{profile_type}/{entry['file']}"
+                self._entries[rel_path] = dict(entry, vendor=vendor, type=profile_type)
+                self._by_name[(vendor, entry["name"])] = rel_path
+                self._by_name.setdefault((None, entry["name"]), rel_path)
+                for token in tokenize(entry["file"]):
+                    self._tokens.setdefault((vendor, profile_type, token), set()).add(rel_path)
+
+    # --- queries ---
+
+    def path(self, rel_path: str) -> str:
+        return os.path.join(self.orca_dir, *rel_path.split("/"))
+
+    def vendors(self) -> List[str]:
+        self.refresh()
+        return sorted(self._vendor_names.values())
+
+    def available(self) -> Dict[str, List[str]]:
+        """Every profile, as 'system/<vendor>/<type>/<file>' paths, by type."""
+        self.refresh()
+        profiles = {key: [] for key in LIST_KEYS.values()}
+        with self._lock:
+            for rel_path, entry in self._entries.items():
+                profiles[LIST_KEYS[entry["type"]]].append(rel_path)
+        for paths in profiles.values():
+            paths.sort()
+        return profiles
+
+    def detect_vendor(self, printer_name: str) -> str:
+        """The vendor folder a printer name belongs to: a vendor named outright, a known brand keyword, or the default."""
+        self.refresh()
+        for token in sorted(tokenize(printer_name)):
+            if token in self._vendor_names:
+                return self._vendor_names[token]
+        for term in printer_name.lower().split():
+            for key, vendor in VENDOR_ALIASES.items():
+                if key in term:
+                    return vendor
+        return DEFAULT_VENDOR
+
+    def match(self, printer_name: str, profile_type: str) -> Optional[Tuple[str, int]]:
+        """
+        The best-scoring profile of `profile_type` for a printer name, as (absolute path, score).
+        Only profiles sharing a name token with the printer name are scored; when none do,
+        the vendor's profiles of that type are scored from memory instead.
+        """
+        self.refresh()
+        terms = printer_name.lower().split()
+        with self._lock:
+            vendor = self.detect_vendor(printer_name)
+            if (vendor, profile_type) not in self._folders:
+                print(f"[PROFILES] No {profile_type} profiles for vendor: {vendor}")
+                return None
+            candidates = set()
+            for token in tokenize(printer_name):
+                candidates |= self._tokens.get((vendor, profile_type, token), set())
+            if not candidates:
+                candidates = {f"system/{vendor}/{profile_type}/{entry['file']}"
+                              for entry in self._folders[(vendor, profile_type)]["profiles"]}
+
+            best_match, best_score = None, 0
+            for rel_path in sorted(candidates):
+                entry = self._entries[rel_path]
+                if not entry["instantiation"]:
+                    continue  # Abstract base profiles cannot be sliced with
+                score = score_profile(entry["file"], terms, profile_type)
+                if score > best_score:
+                    best_match, best_score = rel_path, score
+        if best_match is None:
+            return None
+        return self.path(best_match), best_score
+
+    def inheritance(self, path: str) -> List[str]:
+        """
+        The `inherits` chain of a profile as absolute paths, starting with the profile itself.
+        Parents are looked up by profile name, in the same vendor folder first (shared bases such as
+        OrcaFilamentLibrary live in their own); the chain stops at a missing parent.
+        """
+        self.refresh()
+        rel_path = os.path.relpath(path, self.orca_dir).replace(os.sep, "/") if os.path.isabs(path) else path
+        chain = []
+        with self._lock:
+            while rel_path in self._entries and rel_path not in chain:
+                chain.append(rel_path)
+                entry = self._entries[rel_path]
+                if not entry["inherits"]:
+                    break
+                rel_path = (self._by_name.get((entry["vendor"], entry["inherits"]))
+                            or self._by_name.get((None, entry["inherits"])))
+        return [self.path(p) for p in chain]
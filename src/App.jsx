@@ -51,6 +51,8 @@ function App() {
     const [inputValue, setInputValue] = useState('');
     const [cadData, setCadData] = useState(null);
     const [cadThoughts, setCadThoughts] = useState(''); // Streaming AI thoughts
+    const [cadHistory, setCadHistory] = useState({ current: null, can_undo: false, can_redo: false, versions: [] }); // Design versions
+    const [cadParameters, setCadParameters] = useState([]); // Numeric constants of the current design
     const [cadRetryInfo, setCadRetryInfo] = useState({ attempt: 1, maxAttempts: 3, error: null }); // Retry status
     const [browserData, setBrowserData] = useState({ image: null, logs: [] });
     // showMemoryPrompt removed - memory is now actively saved to project
@@ -336,7 +338,29 @@ function App() {
             }
         });
         socket.on('audio_data', (data) => {
-            setAiAudioData(data.data);
+            // Binary frame from AudioVisualizerStream (see backend/audio_visualizer.py)
+            if (data.format === 'pcm') {
+                // Raw 16-bit PCM: reduce to 64 peak levels (0-255) like "bands" mode
+                const samples = new Int16Array(data.data, 0, Math.floor(data.data.byteLength / 2));
+                const bands = 64;
+                const size = Math.max(1, Math.floor(samples.length / bands));
+                const levels = new Array(bands).fill(0);
+                for (let b = 0; b < bands; b++) {
+                    let peak = 0;
+                    for (let i = b * size; i < Math.min((b + 1) * size, samples.length); i++) {
+                        const v = Math.abs(samples[i]);
+                        if (v > peak) peak = v;
+                    }
+                    levels[b] = Math.min(255, peak >> 7);
+                }
+                setAiAudioData(levels);
+            } else if (data.format === 'spectrum' || data.format === 'envelope') {
+                // Float32 levels (0-1) computed server-side
+                const levels = new Float32Array(data.data, 0, Math.floor(data.data.byteLength / 4));
+                setAiAudioData(Array.from(levels, (v) => Math.round(v * 255)));
+            } else {
+                setAiAudioData(Array.from(new Uint8Array(data.data)));
+            }
         });
         socket.on('auth_status', (data) => {
             console.log("Auth Status:", data);
@@ -387,15 +411,22 @@ function App() {
                 }));
             }
         });
+        // Follow-up to cad_data: decimated preview (large meshes) and mesh stats, keyed by the full mesh URL
+        socket.on('cad_preview', (data) => {
+            setCadData(prev => (prev && prev.url === data.url) ? { ...prev, ...data } : prev);
+        });
         socket.on('cad_status', (data) => {
             console.log("Received CAD Status:", data);
             // Extract retry info from extended payload
             if (data.attempt) {
-                setCadRetryInfo({
+                setCadRetryInfo(prev => ({
                     attempt: data.attempt,
                     maxAttempts: data.max_attempts || 3,
-                    error: data.error
-                });
+                    error: data.error,
+                    // Speculative mode: number of racing candidates and, once decided, the winner
+                    candidates: data.candidates || (data.status === 'retrying' ? undefined : prev.candidates),
+                    winner: data.status === 'candidate_won' ? data.candidate : undefined
+                }));
             }
             if (data.status === 'generating' || data.status === 'retrying') {
                 setCadData({ format: 'loading' });
@@ -415,12 +446,22 @@ function App() {
             } else if (data.status === 'failed') {
                 // Keep loading state but show error
                 setCadData({ format: 'loading' });
+            } else if (data.status === 'cancelled') {
+                // Running script was killed; back to the prompt
+                setCadData(null);
+                setCadRetryInfo({});
             }
         });
         socket.on('cad_thought', (data) => {
             // Append streaming thought text
             setCadThoughts(prev => prev + data.text);
         });
+        socket.on('cad_history', (data) => {
+            setCadHistory(data);
+        });
+        socket.on('cad_parameters', (data) => {
+            setCadParameters(data.parameters || []);
+        });
         socket.on('browser_frame', (data) => {
             setBrowserData(prev => ({
                 image: data.image,
@@ -623,7 +664,10 @@ function App() {
             socket.off('status');
             socket.off('audio_data');
             socket.off('cad_data');
+            socket.off('cad_preview');
             socket.off('cad_thought');
+            socket.off('cad_history');
+            socket.off('cad_parameters');
             socket.off('cad_status');
             socket.off('browser_frame');
             socket.off('transcription');
@@ -1569,6 +1613,8 @@ function App() {
                                 data={cadData}
                                 thoughts={cadThoughts}
                                 retryInfo={cadRetryInfo}
+                                history={cadHistory}
+                                parameters={cadParameters}
                                 onClose={() => setShowCadWindow(false)}
                                 socket={socket}
                             />
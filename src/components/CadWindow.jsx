@@ -1,4 +1,4 @@
-import React, { useMemo, useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Canvas, useLoader, useFrame } from '@react-three/fiber';
 import { OrbitControls, Center, Stage } from '@react-three/drei';
 import * as THREE from 'three';
@@ -27,11 +27,31 @@ const LoadingCube = () => {
     );
 };
 
-const CadWindow = ({ data, thoughts, retryInfo = {}, onClose, socket }) => {
-    // data format: { format: "stl", data: "base64..." }
+// Same backend the Socket.IO client connects to (see App.jsx); serves /artifacts/{id}
+const BACKEND_URL = 'http://localhost:8000';
+
+const stlLoader = new STLLoader();
+
+const parseStl = (buffer) => {
+    const geom = stlLoader.parse(buffer);
+    geom.center(); // Optional: Center the geometry
+    return geom;
+};
+
+const fetchMesh = (url, signal) => fetch(`${BACKEND_URL}${url}`, { signal })
+    .then(res => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        return res.arrayBuffer();
+    })
+    .then(parseStl);
+
+const CadWindow = ({ data, thoughts, retryInfo = {}, history = {}, parameters = [], onClose, socket }) => {
+    // data format: { format: "stl", url: "/artifacts/<id>", size, etag, filename }
     const [isIterating, setIsIterating] = useState(false);
     const [prompt, setPrompt] = useState("");
     const [isSending, setIsSending] = useState(false);
+    const [showParams, setShowParams] = useState(false);
+    const [paramEdits, setParamEdits] = useState({}); // name -> text being typed
     const thoughtsEndRef = useRef(null);
 
     // Debug log
@@ -39,6 +59,23 @@ const CadWindow = ({ data, thoughts, retryInfo = {}, onClose, socket }) => {
         if (data) console.log("CadWindow Data:", data.format);
     }, [data]);
 
+    // A new parameter table (new version) replaces any half-typed values
+    useEffect(() => {
+        setParamEdits({});
+    }, [parameters]);
+
+    const applyParameters = () => {
+        const updates = {};
+        for (const param of parameters) {
+            const text = paramEdits[param.name];
+            if (text === undefined || text === '' || Number(text) === param.value) continue;
+            updates[param.name] = Number(text);
+        }
+        if (socket && Object.keys(updates).length > 0) {
+            socket.emit('set_cad_parameters', { parameters: updates });
+        }
+    };
+
     // Auto-scroll thoughts panel
     useEffect(() => {
         if (thoughtsEndRef.current) {
@@ -46,28 +83,67 @@ const CadWindow = ({ data, thoughts, retryInfo = {}, onClose, socket }) => {
         }
     }, [thoughts]);
 
-    const geometry = useMemo(() => {
-        if (!data || data.format !== 'stl' || !data.data) return null;
+    const [geometry, setGeometry] = useState(null);
+    // What is on screen for the current payload: null, 'preview' or 'full'
+    const shownRef = useRef(null);
+
+    useEffect(() => {
+        shownRef.current = null;
+        if (!data || data.format !== 'stl') {
+            setGeometry(null);
+            return;
+        }
 
-        try {
-            // Convert Base64 to ArrayBuffer
-            const byteCharacters = atob(data.data);
-            const byteNumbers = new Array(byteCharacters.length);
-            for (let i = 0; i < byteCharacters.length; i++) {
-                byteNumbers[i] = byteCharacters.charCodeAt(i);
+        // Legacy payload: base64 STL inlined in the event
+        if (data.data) {
+            try {
+                const binary = atob(data.data);
+                const bytes = new Uint8Array(binary.length);
+                for (let i = 0; i < binary.length; i++) {
+                    bytes[i] = binary.charCodeAt(i);
+                }
+                setGeometry(parseStl(bytes.buffer));
+                shownRef.current = 'full';
+            } catch (e) {
+                console.error("Failed to decode/parse STL:", e);
+                setGeometry(null);
             }
-            const byteArray = new Uint8Array(byteNumbers);
-
-            // Parse directly using THREE.STLLoader
-            const loader = new STLLoader();
-            const geom = loader.parse(byteArray.buffer);
-            geom.center(); // Optional: Center the geometry
-            return geom;
-        } catch (e) {
-            console.error("Failed to decode/parse STL:", e);
-            return null;
+            return;
         }
-    }, [data]);
+
+        // Artifact handle: fetch the binary mesh from the backend.
+        // Large meshes get a decimated preview in a follow-up event (see below).
+        if (!data.url) return;
+        const controller = new AbortController();
+        fetchMesh(data.url, controller.signal)
+            .then(geom => {
+                shownRef.current = 'full';
+                setGeometry(geom);
+            })
+            .catch(e => {
+                if (e.name === 'AbortError') return;
+                console.error("Failed to fetch/parse STL:", e);
+                if (shownRef.current !== 'preview') setGeometry(null);
+            });
+        return () => controller.abort();
+    }, [data?.format, data?.url, data?.data]);
+
+    // The decimated preview, shown only until the full mesh has loaded
+    const previewUrl = data?.preview?.url;
+    useEffect(() => {
+        if (!previewUrl) return;
+        const controller = new AbortController();
+        fetchMesh(previewUrl, controller.signal)
+            .then(geom => {
+                if (shownRef.current !== null) return;
+                shownRef.current = 'preview';
+                setGeometry(geom);
+            })
+            .catch(e => {
+                if (e.name !== 'AbortError') console.error("Failed to fetch/parse preview STL:", e);
+            });
+        return () => controller.abort();
+    }, [previewUrl]);
 
     const handleGenerate = () => {
         if (!prompt.trim()) return;
@@ -133,8 +209,61 @@ const CadWindow = ({ data, thoughts, retryInfo = {}, onClose, socket }) => {
                 >
                     <Printer size={12} /> PRINT
                 </button>
+                {/* Design history: restores stored versions without regenerating */}
+                <button
+                    onClick={() => socket && socket.emit('cad_undo')}
+                    disabled={!history.can_undo}
+                    className="bg-cyan-500/20 hover:bg-cyan-500/50 disabled:opacity-30 text-cyan-400 text-xs px-2 py-1 rounded border border-cyan-500/30 backdrop-blur-sm"
+                >
+                    UNDO
+                </button>
+                <button
+                    onClick={() => socket && socket.emit('cad_redo')}
+                    disabled={!history.can_redo}
+                    className="bg-cyan-500/20 hover:bg-cyan-500/50 disabled:opacity-30 text-cyan-400 text-xs px-2 py-1 rounded border border-cyan-500/30 backdrop-blur-sm"
+                >
+                    REDO
+                </button>
+                {parameters.length > 0 && (
+                    <button
+                        onClick={() => setShowParams(prev => !prev)}
+                        className="bg-cyan-500/20 hover:bg-cyan-500/50 text-cyan-400 text-xs px-2 py-1 rounded border border-cyan-500/30 backdrop-blur-sm"
+                    >
+                        PARAMS
+                    </button>
+                )}
+                {history.current && (
+                    <span className="text-cyan-400/70 text-xs font-mono px-1 py-1">
+                        v{history.current}/{(history.versions || []).length}
+                    </span>
+                )}
             </div>
 
+            {/* Parametric fast path: re-runs the script with new numbers, no model call */}
+            {showParams && parameters.length > 0 && data?.format !== 'loading' && (
+                <div className="absolute top-10 left-2 z-10 bg-black/80 backdrop-blur-sm border border-cyan-500/30 rounded p-2 max-h-[70%] overflow-y-auto">
+                    {parameters.map(param => (
+                        <label key={param.name} className="flex items-center justify-between gap-2 mb-1 text-xs font-mono" title={param.comment || ''}>
+                            <span className="text-cyan-400/80">{param.name}</span>
+                            <input
+                                type="number"
+                                step={param.type === 'int' ? 1 : 'any'}
+                                value={paramEdits[param.name] ?? param.value}
+                                onChange={(e) => setParamEdits(prev => ({ ...prev, [param.name]: e.target.value }))}
+                                onKeyDown={(e) => e.key === 'Enter' && applyParameters()}
+                                className="w-20 bg-gray-900 border border-gray-700 rounded px-1 text-white focus:outline-none focus:border-cyan-500"
+                            />
+                        </label>
+                    ))}
+                    <button
+                        onClick={applyParameters}
+                        className="w-full mt-1 bg-cyan-600 hover:bg-cyan-500 text-white text-xs px-2 py-0.5 rounded"
+                    >
+                        Apply
+                    </button>
+                </div>
+            )}
+
             {/* Iteration / Generation Overlay */}
             {/* Show if iterating OR if no data exists (and not loading) */}
             {(isIterating || (!data && data?.format !== 'loading')) && (
@@ -204,11 +333,22 @@ const CadWindow = ({ data, thoughts, retryInfo = {}, onClose, socket }) => {
                             <span className="w-2 h-2 bg-green-500 rounded-full animate-pulse"></span>
                             Designer Thinking...
                         </h4>
-                        {retryInfo.attempt && (
-                            <span className={`text-xs font-mono px-2 py-0.5 rounded ${retryInfo.error ? 'bg-yellow-500/20 text-yellow-400' : 'bg-cyan-500/20 text-cyan-400'}`}>
-                                Attempt {retryInfo.attempt}/{retryInfo.maxAttempts || 3}
-                            </span>
-                        )}
+                        <div className="flex items-center gap-2">
+                            {retryInfo.attempt && (
+                                <span className={`text-xs font-mono px-2 py-0.5 rounded ${retryInfo.error ? 'bg-yellow-500/20 text-yellow-400' : 'bg-cyan-500/20 text-cyan-400'}`}>
+                                    Attempt {retryInfo.attempt}/{retryInfo.maxAttempts || 3}
+                                    {retryInfo.candidates > 1 && (retryInfo.winner !== undefined
+                                        ? ` · candidate ${retryInfo.winner + 1}/${retryInfo.candidates} won`
+                                        : ` · ${retryInfo.candidates} candidates`)}
+                                </span>
+                            )}
+                            <button
+                                onClick={() => socket && socket.emit('cancel_cad')}
+                                className="bg-red-500/20 hover:bg-red-500/50 text-red-400 text-xs px-2 py-0.5 rounded border border-red-500/30"
+                            >
+                                CANCEL
+                            </button>
+                        </div>
                     </div>
                     {retryInfo.error && (
                         <div className="mb-2 p-2 bg-red-500/10 border border-red-500/30 rounded text-red-400 text-xs font-mono">
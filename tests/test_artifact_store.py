@@ -0,0 +1,89 @@
+"""
+Tests for the artifact store and its HTTP endpoint.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from artifact_store import ArtifactStore, add_artifact_routes, parse_range
+
+
+@pytest.fixture
+def stl_file(tmp_path):
+    path = tmp_path / "part.stl"
+    path.write_bytes(bytes(range(256)) * 4)
+    return path
+
+
+@pytest.fixture
+def store():
+    return ArtifactStore(max_entries=4)
+
+
+@pytest.fixture
+def client(store):
+    app = FastAPI()
+    add_artifact_routes(app, store)
+    return TestClient(app)
+
+
+class TestParseRange:
+    """Test Range header parsing."""
+
+    def test_ranges(self):
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=50-500", 100) == (50, 99)
+
+    def test_ignored_and_invalid(self):
+        assert parse_range("bytes=0-1,5-6", 100) is None
+        assert parse_range("items=0-1", 100) is None
+        with pytest.raises(ValueError):
+            parse_range("bytes=100-", 100)
+        with pytest.raises(ValueError):
+            parse_range("bytes=abc", 100)
+
+
+class TestArtifactEndpoint:
+    """Test GET /artifacts/{id}."""
+
+    def test_handle_has_no_content(self, store, stl_file):
+        handle = store.register(str(stl_file)).to_handle(format="stl")
+        assert handle["url"] == f"/artifacts/{handle['artifact_id']}"
+        assert handle["size"] == 1024
+        assert handle["mime_type"] == "model/stl"
+        assert "data" not in handle
+
+    def test_full_download(self, store, client, stl_file):
+        artifact = store.register(str(stl_file))
+        response = client.get(f"/artifacts/{artifact.artifact_id}")
+        assert response.status_code == 200
+        assert response.content == stl_file.read_bytes()
+        assert response.headers["etag"] == artifact.etag
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["access-control-allow-origin"] == "*"
+
+    def test_if_none_match(self, store, client, stl_file):
+        artifact = store.register(str(stl_file))
+        response = client.get(f"/artifacts/{artifact.artifact_id}", headers={"If-None-Match": artifact.etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_range_request(self, store, client, stl_file):
+        artifact = store.register(str(stl_file))
+        response = client.get(f"/artifacts/{artifact.artifact_id}", headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == bytes(range(10, 20))
+        assert response.headers["content-range"] == "bytes 10-19/1024"
+
+        response = client.get(f"/artifacts/{artifact.artifact_id}", headers={"Range": "bytes=2000-"})
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */1024"
+
+    def test_unknown_and_evicted(self, store, client, stl_file):
+        first = store.register(str(stl_file))
+        for _ in range(4):
+            store.register(str(stl_file))
+        assert client.get(f"/artifacts/{first.artifact_id}").status_code == 404
+        assert client.get("/artifacts/not-an-id").status_code == 404
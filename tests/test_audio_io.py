@@ -0,0 +1,147 @@
+"""
+Tests for the audio I/O engines (ring buffer, playback and capture).
+"""
+import asyncio
+import threading
+
+import pytest
+
+from audio_io import CaptureEngine, PcmRingBuffer, PlaybackEngine
+
+
+class TestPcmRingBuffer:
+    """Test the pre-allocated SPSC ring."""
+
+    def test_write_read_wraparound(self):
+        ring = PcmRingBuffer(8)
+        out = bytearray(8)
+        assert ring.write(b"abcdef") == 6
+        assert ring.read_into(memoryview(out)[:4]) == 4
+        assert bytes(out[:4]) == b"abcd"
+        # Wraps around the end of the buffer
+        assert ring.write(b"ghijkl") == 6
+        assert ring.available == 8
+        assert ring.read_into(out) == 8
+        assert bytes(out) == b"efghijkl"
+        assert ring.available == 0
+
+    def test_overrun_counts_dropped_bytes(self):
+        ring = PcmRingBuffer(4)
+        assert ring.write(b"abcdef") == 4
+        assert ring.overruns == 1
+        assert ring.bytes_dropped == 2
+
+    def test_flush_is_applied_by_reader(self):
+        ring = PcmRingBuffer(16)
+        ring.write(b"old-audio")
+        ring.flush()
+        assert ring.available == 0
+        ring.write(b"new")
+        out = bytearray(16)
+        n = ring.read_into(out)
+        assert bytes(out[:n]) == b"new"
+
+    def test_invalid_capacity(self):
+        with pytest.raises(ValueError):
+            PcmRingBuffer(0)
+
+
+class TestPlaybackEngine:
+    """Test jitter buffering and counters (no audio device needed)."""
+
+    @pytest.fixture
+    def engine(self):
+        # 1 kHz mono 16-bit: 2 bytes per ms; 10 frames per callback = 20 bytes
+        return PlaybackEngine(None, rate=1000, buffer_seconds=1.0, jitter_target_ms=50, frames_per_buffer=10)
+
+    def test_waits_for_jitter_target(self, engine):
+        engine.feed(b"\x01" * 40)  # 20 ms, below the 50 ms target
+        assert engine.render(20) == bytes(20)
+        engine.feed(b"\x01" * 80)  # now 60 ms buffered
+        assert engine.render(20) == b"\x01" * 20
+
+    def test_short_tail_plays_after_target_time(self, engine):
+        engine.feed(b"\x02" * 10)
+        assert engine.render(20) == bytes(20)
+        engine._prime_since -= 0.1
+        assert engine.render(20) == b"\x02" * 10 + bytes(10)
+        assert engine.underruns == 1
+
+    def test_flush_drops_queued_audio(self, engine):
+        engine.feed(b"\x03" * 200)
+        engine.render(20)
+        assert engine.flush() == 180
+        assert engine.buffered_ms == 0
+        assert engine.render(20) == bytes(20)
+        assert engine.get_stats()["flushes"] == 1
+
+    def test_overrun_reported(self, engine):
+        engine.feed(b"\x00" * 3000)
+        stats = engine.get_stats()
+        assert stats["overruns"] == 1
+        assert stats["bytes_dropped"] == 1000
+
+    def test_tap_records_played_audio(self, engine):
+        engine.feed(b"\x04" * 120)
+        engine.render(20)
+        engine.render(20)
+        assert b"".join(engine.tap) == b"\x04" * 40
+
+
+class TestCaptureEngine:
+    """Test callback capture, wake-ups and overflow policies (no audio device needed)."""
+
+    def make(self, **kw):
+        # 1 kHz mono 16-bit: 4-frame chunks are 8 bytes; the ring holds the 2-chunk minimum (16 bytes)
+        kw.setdefault("buffer_seconds", 0.002)
+        return CaptureEngine(None, rate=1000, chunk_size=4, latency_ms=2, **kw)
+
+    @pytest.mark.asyncio
+    async def test_read_waits_for_full_chunk(self):
+        engine = self.make()
+        engine._loop = asyncio.get_running_loop()
+        reader = asyncio.create_task(engine.read())
+        await asyncio.sleep(0)
+        engine.capture(b"\x01" * 4, 10.0)
+        await asyncio.sleep(0.01)
+        assert not reader.done()
+
+        # Second callback completes the chunk; the wake-up arrives via call_soon_threadsafe
+        threading.Thread(target=engine.capture, args=(b"\x02" * 4, 10.5)).start()
+        data, captured_at = await asyncio.wait_for(reader, 1.0)
+        assert data == b"\x01" * 4 + b"\x02" * 4
+        assert captured_at == 10.5
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_keeps_recent_audio(self):
+        engine = self.make(overflow="drop_oldest")
+        for i in range(3):
+            engine.capture(bytes([i]) * 8, float(i))
+        data, captured_at = await engine.read()
+        assert data == b"\x01" * 8
+        assert captured_at == 1.0
+        assert engine.overflows == 1
+        assert engine.get_stats()["bytes_dropped"] == 8
+
+    @pytest.mark.asyncio
+    async def test_drop_newest_keeps_queued_audio(self):
+        engine = self.make(overflow="drop_newest")
+        for i in range(3):
+            engine.capture(bytes([i]) * 8, float(i))
+        data, _ = await engine.read()
+        assert data == b"\x00" * 8
+        assert engine.get_stats()["bytes_dropped"] == 8
+
+    def test_latency_metric(self):
+        engine = self.make()
+        engine.record_latency(1.0, sent_at=1.03)
+        engine.record_latency(2.0, sent_at=2.01)
+        latency = engine.get_stats()["capture_to_send_ms"]
+        assert latency["count"] == 2
+        assert latency["last"] == pytest.approx(10.0)
+        assert latency["max"] == pytest.approx(30.0)
+        assert latency["avg"] == pytest.approx(20.0)
+
+    def test_invalid_overflow_policy(self):
+        with pytest.raises(ValueError):
+            self.make(overflow="block")
@@ -0,0 +1,115 @@
+"""
+Tests for the microphone VAD engine.
+"""
+import math
+import struct
+
+import numpy as np
+import pytest
+
+from audio_vad import (
+    AdaptiveNoiseFloorDetector,
+    EnergyDetector,
+    VadStateMachine,
+    ZeroCrossingDetector,
+    create_detector,
+)
+
+
+def pcm_tone(amplitude, freq=220, n=1024, rate=16000):
+    t = np.arange(n) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes()
+
+
+def pcm_noise(amplitude, n=1024, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-amplitude, amplitude, n).astype("<i2").tobytes()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDetectors:
+    """Test individual detectors on synthetic PCM."""
+
+    def test_rms_matches_legacy(self):
+        """numpy RMS agrees with the old struct.unpack implementation."""
+        data = pcm_tone(3000)
+        count = len(data) // 2
+        shorts = struct.unpack(f"<{count}h", data)
+        legacy = int(math.sqrt(sum(s**2 for s in shorts) / count))
+
+        detector = EnergyDetector()
+        detector.is_speech(np.frombuffer(data, dtype="<i2"))
+        assert abs(int(detector.level) - legacy) <= 1
+
+    def test_energy_threshold(self):
+        detector = EnergyDetector(threshold=800)
+        assert detector.is_speech(np.frombuffer(pcm_tone(3000), dtype="<i2"))
+        assert not detector.is_speech(np.frombuffer(pcm_tone(100), dtype="<i2"))
+
+    def test_empty_chunk(self):
+        detector = EnergyDetector()
+        assert not detector.is_speech(np.frombuffer(b"", dtype="<i2"))
+        assert detector.level == 0.0
+
+    def test_zero_crossing_rejects_loud_noise(self):
+        """Loud broadband noise crosses zero too often to be voiced speech."""
+        detector = ZeroCrossingDetector(threshold=500)
+        assert detector.is_speech(np.frombuffer(pcm_tone(3000), dtype="<i2"))
+        assert not detector.is_speech(np.frombuffer(pcm_noise(8000), dtype="<i2"))
+        assert detector.rate > detector.max_rate
+
+    def test_adaptive_floor_tracks_background(self):
+        detector = AdaptiveNoiseFloorDetector(ratio=3.0, min_threshold=100, initial_floor=100)
+        medium = np.frombuffer(pcm_tone(900), dtype="<i2")
+        # Against the initial floor a medium tone counts as speech
+        assert detector.is_speech(medium)
+
+        hum = np.frombuffer(pcm_tone(350, freq=60), dtype="<i2")
+        for _ in range(200):
+            assert not detector.is_speech(hum)
+        # Floor has risen to the hum level, so the same tone is now background
+        assert detector.noise_floor > 200
+        assert not detector.is_speech(medium)
+        assert detector.is_speech(np.frombuffer(pcm_tone(6000), dtype="<i2"))
+
+    def test_create_detector_unknown(self):
+        with pytest.raises(ValueError):
+            create_detector("nope")
+
+
+class TestVadStateMachine:
+    """Test hangover handling."""
+
+    def test_start_and_end_events(self):
+        clock = FakeClock()
+        vad = VadStateMachine(EnergyDetector(threshold=800), hangover=0.5, clock=clock)
+        loud, quiet = pcm_tone(3000), pcm_tone(50)
+
+        assert vad.process(loud) == VadStateMachine.SPEECH_START
+        assert vad.is_speaking
+        assert vad.process(loud) is None
+
+        # Short pause inside the hangover keeps the utterance open
+        assert vad.process(quiet) is None
+        clock.now += 0.3
+        assert vad.process(quiet) is None
+        assert vad.is_speaking
+
+        # Speech resumes: silence timer resets
+        assert vad.process(loud) is None
+        clock.now += 0.1
+        assert vad.process(quiet) is None
+        clock.now += 0.6
+        assert vad.process(quiet) == VadStateMachine.SPEECH_END
+        assert not vad.is_speaking
+
+    def test_accepts_odd_length_buffers(self):
+        vad = VadStateMachine()
+        assert vad.process(pcm_tone(3000) + b"\x00") == VadStateMachine.SPEECH_START
@@ -0,0 +1,119 @@
+"""
+Tests for the audio visualizer stream (batched binary fan-out).
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from audio_visualizer import AudioAnalyzer, AudioVisualizerStream
+
+
+def pcm(values):
+    return np.asarray(values, dtype="<i2").tobytes()
+
+
+async def _noop_emit(payload):
+    pass
+
+
+class TestFrameCoalescing:
+    """Test buffering and frame payloads."""
+
+    def test_chunks_are_coalesced(self):
+        stream = AudioVisualizerStream(_noop_emit, mode="pcm")
+        stream.push(pcm([1, 2]))
+        stream.push(pcm([3, 4]))
+        assert stream.take_frame() == pcm([1, 2, 3, 4])
+        assert stream.take_frame() is None
+
+    def test_bands_payload(self):
+        stream = AudioVisualizerStream(_noop_emit, mode="bands", bands=4)
+        stream.push(pcm([0, 0, 32767, -32768, 1280, -1280, 0, 128]))
+        levels = np.frombuffer(stream.take_frame(), dtype=np.uint8)
+        assert levels.tolist() == [0, 255, 10, 1]
+
+    def test_bands_short_frame(self):
+        stream = AudioVisualizerStream(_noop_emit, mode="bands", bands=8)
+        stream.push(pcm([12800]))
+        payload = stream.take_frame()
+        assert len(payload) == 8
+        assert payload[0] == 100
+
+    def test_backlog_is_bounded(self):
+        stream = AudioVisualizerStream(_noop_emit, mode="pcm", max_pending_bytes=8)
+        for i in range(5):
+            stream.push(pcm([i, i]))
+        assert stream.take_frame() == pcm([3, 3, 4, 4])
+        assert stream.bytes_dropped == 12
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError):
+            AudioVisualizerStream(_noop_emit, mode="json")
+
+
+def tone(freq, amplitude=16000, n=2400, rate=24000):
+    t = np.arange(n) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes()
+
+
+class TestAudioAnalyzer:
+    """Test server-side spectrum/envelope analysis."""
+
+    def test_spectrum_peaks_in_matching_band(self):
+        analyzer = AudioAnalyzer(mode="spectrum", bands=16, sample_rate=24000)
+        low = analyzer.analyze(tone(200))
+        high = analyzer.analyze(tone(4000))
+        assert low.shape == (16,) and low.dtype == np.float32
+        assert low.argmax() < high.argmax()
+        assert 0.0 <= low.min() and low.max() <= 1.0
+        # Half-scale sine is about -6 dBFS -> ~0.9 on the -60..0 dB scale
+        assert low.max() > 0.8
+
+    def test_spectrum_silence(self):
+        analyzer = AudioAnalyzer(mode="spectrum", bands=8)
+        assert analyzer.analyze(bytes(4800)).max() == 0.0
+
+    def test_envelope(self):
+        analyzer = AudioAnalyzer(mode="envelope", bands=4)
+        data = np.concatenate([np.zeros(100), np.full(100, 16384)]).astype("<i2").tobytes()
+        levels = analyzer.analyze(data)
+        assert levels[0] == 0.0
+        assert abs(levels[-1] - 0.5) < 1e-3
+
+    def test_levels_payload_is_small(self):
+        """A frame of levels is a tiny fraction of the PCM it summarises."""
+        analyzer = AudioAnalyzer(mode="spectrum", bands=32)
+        stream = AudioVisualizerStream(_noop_emit, mode="spectrum", bands=32)
+        chunk = tone(440, n=4800)
+        stream.push_levels(analyzer.analyze(chunk))
+        stream.push_levels(analyzer.analyze(chunk))
+        payload = stream.take_frame()
+        assert len(payload) == 32 * 4
+        assert len(chunk) * 2 / len(payload) > 70
+        assert stream.take_frame() is None
+
+
+class TestFrameClock:
+    """Test the emit loop."""
+
+    @pytest.mark.asyncio
+    async def test_emits_binary_frames(self):
+        frames = []
+
+        async def emit(payload):
+            frames.append(payload)
+
+        stream = AudioVisualizerStream(emit, frame_rate=100, mode="bands", bands=4)
+        task = asyncio.create_task(stream.run())
+        for _ in range(10):
+            stream.push(pcm([1000] * 64))
+        await asyncio.sleep(0.05)
+        stream.stop()
+        await task
+
+        # Ten chunks pushed in one go are delivered as a single frame
+        assert len(frames) == 1
+        assert frames[0]["format"] == "bands"
+        assert isinstance(frames[0]["data"], bytes)
+        assert stream.get_stats()["chunks_in"] == 10
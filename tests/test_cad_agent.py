@@ -6,6 +6,7 @@ import asyncio
 import os
 
 from cad_agent import CadAgent
+from cad_stream import CodeFenceExtractor
 
 
 class TestCadAgentInit:
@@ -130,3 +131,96 @@ class TestBuild123dImport:
             print(f"build123d version: {build123d.__version__}")
         except ImportError:
             pytest.skip("build123d not installed")
+
+
+STL_SCRIPT = """from build123d import *
+
+def export_stl(part, path):
+    with open(path, 'w') as f:
+        f.write('solid t\\nfacet normal 0 0 1\\nouter loop\\nvertex 0 0 0\\nvertex 1 0 0\\nvertex 0 1 0\\nendloop\\nendfacet\\nendsolid t\\n')
+
+result_part = None
+export_stl(result_part, 'output.stl')
+"""
+
+FAILING_SCRIPT = """from build123d import *
+result_part = None
+raise ValueError('bad fillet')
+export_stl(result_part, 'output.stl')
+"""
+
+
+def fenced(code):
+    reply = CodeFenceExtractor()
+    reply.feed(f"```python\n{code}\n```")
+    return reply
+
+
+class TestSpeculativeGeneration:
+    """Test racing several candidates on the first attempt (no API calls: responses are faked)."""
+
+    @pytest.fixture
+    def agent(self):
+        statuses = []
+        agent = CadAgent(on_status=statuses.append, use_worker_pool=False, use_cache=False,
+                         speculative_candidates=3, speculative_budget=20)
+        agent.statuses = statuses
+        return agent
+
+    @pytest.mark.asyncio
+    async def test_first_valid_candidate_wins(self, agent, tmp_path):
+        responses = {
+            1.0: fenced(FAILING_SCRIPT),
+            0.7: fenced(STL_SCRIPT),
+            1.3: fenced("import time\ntime.sleep(30)\n" + STL_SCRIPT),
+        }
+
+        async def fake_request(contents, temperature=1.0, stream_thoughts=True):
+            return responses[temperature]
+
+        agent._request_code = fake_request
+        start = asyncio.get_running_loop().time()
+        result = await agent.generate_prototype("a triangle", output_dir=str(tmp_path))
+        assert asyncio.get_running_loop().time() - start < 20
+
+        assert result["candidate"] == 1
+        assert os.path.exists(result["file_path"])
+        assert result["mesh"]["triangles"] == 1
+        with open(tmp_path / "current_design.py") as f:
+            assert result["file_path"].replace("\\", "\\\\") in f.read()
+
+        kinds = [s["status"] for s in agent.statuses]
+        assert kinds[0] == "generating" and agent.statuses[0]["candidates"] == 3
+        assert "candidate_won" in kinds
+        won = next(s for s in agent.statuses if s["status"] == "candidate_won")
+        assert won["candidate"] == 1 and won["temperature"] == 0.7
+
+    @pytest.mark.asyncio
+    async def test_budget_exhausted(self, agent, tmp_path):
+        agent.speculative_budget = 0.5
+
+        async def slow_request(contents, temperature=1.0, stream_thoughts=True):
+            await asyncio.sleep(10)
+            return fenced(STL_SCRIPT)
+
+        agent._request_code = slow_request
+        winner, first_error = await agent._speculate("a triangle", str(tmp_path), 3)
+        assert winner is None and first_error is None
+
+    @pytest.mark.asyncio
+    async def test_all_fail_falls_back_to_retries(self, agent, tmp_path):
+        calls = []
+
+        async def fake_request(contents, temperature=1.0, stream_thoughts=True):
+            calls.append(contents)
+            if len(calls) <= 3:
+                return fenced(FAILING_SCRIPT)
+            return fenced(STL_SCRIPT)
+
+        agent._request_code = fake_request
+        result = await agent.generate_prototype("a triangle", output_dir=str(tmp_path))
+        assert result is not None and "candidate" not in result
+        # Three speculative calls, then one sequential fix-up that sees the error
+        assert len(calls) == 4
+        assert "bad fillet" in calls[3]
+        assert sum(1 for s in agent.statuses if s["status"] == "candidate_failed") == 3
@@ -0,0 +1,70 @@
+"""
+Tests for the content-addressed CAD cache.
+"""
+import os
+
+from cad_cache import CadCache, normalize_script, prompt_key, script_key
+
+
+class TestKeys:
+    """Test key normalization."""
+
+    def test_prompt_key_normalizes_text(self):
+        a = prompt_key("A simple  10mm cube.", "model-a", "instructions")
+        b = prompt_key("a simple 10mm cube", "model-a", "instructions")
+        assert a == b
+        assert a.startswith("prompt:")
+
+    def test_prompt_key_depends_on_model_and_instruction(self):
+        base = prompt_key("cube", "model-a", "instructions")
+        assert prompt_key("cube", "model-b", "instructions") != base
+        assert prompt_key("cube", "model-a", "other instructions") != base
+
+    def test_script_key_ignores_output_path_and_trailing_space(self):
+        generated = "from build123d import *\nresult_part = Box(1, 1, 1)\nexport_stl(result_part, 'output.stl')\n"
+        injected = generated.replace("'output.stl'", "'/projects/p/cad/output_20250101_120000.stl'") + "   \n"
+        assert script_key(generated) == script_key(injected)
+        assert script_key(generated) != script_key(generated.replace("Box(1, 1, 1)", "Box(2, 1, 1)"))
+        assert "output.stl" in normalize_script(injected)
+
+
+class TestCadCache:
+    """Test storage, LRU eviction and persistence."""
+
+    def test_put_get_roundtrip(self, tmp_path):
+        cache = CadCache(str(tmp_path / "cache"))
+        assert cache.get("prompt:x") is None
+        cache.put("prompt:x", "code", b"solid", {"prompt": "cube"})
+        entry = cache.get("prompt:x")
+        assert entry.script == "code" and entry.stl == b"solid"
+        assert entry.meta == {"prompt": "cube"}
+        assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 1
+
+    def test_keys_share_objects(self, tmp_path):
+        cache = CadCache(str(tmp_path))
+        cache.put("prompt:a", "code", b"mesh")
+        cache.put("script:b", "code", b"mesh")
+        assert len(os.listdir(tmp_path / "objects")) == 2
+        assert cache.get_stats()["bytes"] == len("code") + len(b"mesh")
+
+    def test_lru_eviction(self, tmp_path):
+        cache = CadCache(str(tmp_path), max_bytes=250)
+        cache.put("prompt:old", "a", b"1" * 100)
+        cache.put("prompt:used", "b", b"2" * 100)
+        cache.get("prompt:old")  # now more recent than "used"
+        cache.put("prompt:new", "c", b"3" * 100)
+        assert cache.get("prompt:used") is None
+        assert cache.get("prompt:old") is not None
+        assert cache.get("prompt:new") is not None
+        assert cache.get_stats()["evictions"] == 1
+        # The evicted mesh is removed from disk
+        assert len(os.listdir(tmp_path / "objects")) == 4
+
+    def test_persists_and_drops_corrupt_objects(self, tmp_path):
+        CadCache(str(tmp_path)).put("prompt:x", "code", b"mesh")
+        reopened = CadCache(str(tmp_path))
+        assert reopened.get("prompt:x").stl == b"mesh"
+
+        for name in os.listdir(tmp_path / "objects"):
+            (tmp_path / "objects" / name).write_bytes(b"garbage")
+        assert CadCache(str(tmp_path)).get("prompt:x") is None
@@ -0,0 +1,122 @@
+"""
+Tests for CAD parameter extraction and the parametric fast path.
+"""
+import pytest
+
+from cad_params import ParameterError, apply_parameters, extract_parameters
+
+SCRIPT = """from build123d import *
+
+# gear teeth
+num_teeth = 20
+pitch_radius = 30.0  # mm
+offset = -2.5
+thickness = pitch_radius / 5
+label = "gear"
+flag = True
+
+result_part = Cylinder(pitch_radius, thickness)
+export_stl(result_part, 'output.stl')
+"""
+
+
+class TestExtractParameters:
+    """Test which assignments become parameters."""
+
+    def test_literals_only(self):
+        params = extract_parameters(SCRIPT)
+        assert [(p.name, p.value, p.type) for p in params] == [
+            ("num_teeth", 20, "int"),
+            ("pitch_radius", 30.0, "float"),
+            ("offset", -2.5, "float"),
+        ]
+
+    def test_comments(self):
+        params = {p.name: p for p in extract_parameters(SCRIPT)}
+        assert params["num_teeth"].comment == "gear teeth"
+        assert params["pitch_radius"].comment == "mm"
+        assert params["num_teeth"].line == 4
+
+    def test_nested_assignments_ignored(self):
+        code = "def f():\n    inner = 3\n\nfor i in range(3):\n    step = 2\n"
+        assert extract_parameters(code) == []
+
+    def test_unparsable(self):
+        assert extract_parameters("num_teeth = (") == []
+
+
+class TestApplyParameters:
+    """Test rewriting literals in place."""
+
+    def test_rewrites_only_the_literal(self):
+        code = apply_parameters(SCRIPT, {"num_teeth": 24, "offset": 1})
+        assert "num_teeth = 24\n" in code
+        assert "offset = 1.0\n" in code
+        assert "pitch_radius = 30.0  # mm" in code
+        assert code.count("\n") == SCRIPT.count("\n")
+
+    def test_roundtrip(self):
+        code = apply_parameters(SCRIPT, {"pitch_radius": 12.5})
+        assert {p.name: p.value for p in extract_parameters(code)}["pitch_radius"] == 12.5
+
+    def test_int_accepts_whole_floats_and_strings(self):
+        assert "num_teeth = 30\n" in apply_parameters(SCRIPT, {"num_teeth": 30.0})
+        assert "num_teeth = 18\n" in apply_parameters(SCRIPT, {"num_teeth": "18"})
+
+    @pytest.mark.parametrize("updates", [
+        {"num_teeth": 20.5},
+        {"num_teeth": True},
+        {"pitch_radius": float("nan")},
+        {"pitch_radius": "wide"},
+        {"thickness": 3},
+        {"result_part": 1},
+    ])
+    def test_rejected(self, updates):
+        with pytest.raises(ParameterError):
+            apply_parameters(SCRIPT, updates)
+
+
+class TestCadAgentParameters:
+    """Test that set_parameters re-runs the script without a model call and records a version."""
+
+    @pytest.mark.asyncio
+    async def test_set_parameters(self, tmp_path):
+        from cad_agent import CadAgent
+
+        agent = CadAgent(use_worker_pool=False, use_cache=False)
+        agent._get_store(str(tmp_path)).record(SCRIPT, b"solid v1\nendsolid v1\n", "a gear", "generate")
+
+        async def no_request(*args, **kwargs):
+            raise AssertionError("the model must not be called")
+
+        async def fake_run(script_path, work_dir, output_stl):
+            with open(script_path) as f:
+                assert "num_teeth = 24" in f.read()
+            return None, b"solid v2\nendsolid v2\n"
+
+        agent._request_code = no_request
+        agent._run_script = fake_run
+        result = await agent.set_parameters({"num_teeth": 24}, str(tmp_path))
+        assert result["version"] == 2
+        assert {p["name"]: p["value"] for p in result["parameters"]}["num_teeth"] == 24
+        with open(tmp_path / "current_design.py") as f:
+            assert "num_teeth = 24" in f.read()
+        history = agent.get_history(str(tmp_path))
+        assert history["versions"][-1]["kind"] == "parameters"
+        assert history["versions"][-1]["parent"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_run_keeps_current_design(self, tmp_path):
+        from cad_agent import CadAgent
+
+        agent = CadAgent(use_worker_pool=False, use_cache=False)
+        agent._get_store(str(tmp_path)).record(SCRIPT, b"solid v1\nendsolid v1\n", "a gear", "generate")
+
+        async def failing_run(script_path, work_dir, output_stl):
+            return "Traceback...\nValueError: radius must be positive", None
+
+        agent._run_script = failing_run
+        with pytest.raises(ParameterError, match="radius must be positive"):
+            await agent.set_parameters({"pitch_radius": -1}, str(tmp_path))
+        assert len(agent._get_store(str(tmp_path))) == 1
+        assert not (tmp_path / "current_design.py").exists()
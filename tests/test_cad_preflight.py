@@ -0,0 +1,125 @@
+"""
+Tests for static pre-flight checks of generated build123d scripts.
+"""
+import ast
+
+import pytest
+
+from cad_preflight import preflight
+from cad_stream import CodeFenceExtractor
+
+
+GOOD_SCRIPT = """from build123d import *
+
+with BuildPart() as p:
+    Box(10, 10, 10)
+    fillet(p.edges(), radius=1)
+
+result_part = p.part
+export_stl(result_part, 'output.stl')
+"""
+
+
+class TestPreflightChecks:
+    """Test detection and repair of common script mistakes."""
+
+    def test_good_script_untouched(self):
+        result = preflight(GOOD_SCRIPT)
+        assert result.ok and not result.fixes
+        assert result.code == GOOD_SCRIPT
+        assert result.error_message is None
+
+    def test_pascal_case_renamed(self):
+        code = GOOD_SCRIPT.replace("fillet(", "Fillet(").replace("Box(10, 10, 10)", "Extrude(Rectangle(5, 5), amount=2)")
+        result = preflight(code)
+        assert result.ok
+        assert "fillet(p.edges(), radius=1)" in result.code
+        assert "extrude(Rectangle(5, 5), amount=2)" in result.code
+        # Real classes are left alone
+        assert "Rectangle(" in result.code
+
+    def test_user_defined_pascal_name_kept(self):
+        code = "def Fillet(x):\n    return x\n\n" + GOOD_SCRIPT.replace("fillet(p.edges(), radius=1)", "Fillet(1)")
+        result = preflight(code)
+        assert "Fillet(1)" in result.code
+
+    def test_star_import_added(self):
+        code = '"""Bracket."""\nimport build123d\n' + GOOD_SCRIPT.split("\n", 1)[1]
+        result = preflight(code)
+        lines = result.code.splitlines()
+        assert lines[0] == '"""Bracket."""'
+        assert lines[1] == "from build123d import *"
+
+    def test_missing_result_part_from_builder(self):
+        code = GOOD_SCRIPT.replace("result_part = p.part\nexport_stl(result_part, 'output.stl')\n", "")
+        result = preflight(code)
+        assert result.ok
+        assert result.code.rstrip().endswith("result_part = p.part\nexport_stl(result_part, 'output.stl')")
+
+    def test_missing_result_part_from_export(self):
+        code = "from build123d import *\npart = Box(1, 2, 3) - Cylinder(0.5, 3)\nexport_stl(part, 'part.stl')\n"
+        result = preflight(code)
+        assert result.ok
+        tree = ast.parse(result.code)
+        assigned = [node.targets[0].id for node in tree.body if isinstance(node, ast.Assign)]
+        assert assigned == ["part", "result_part"]
+        assert "export_stl(part, 'output.stl')" in result.code
+
+    def test_viewer_calls_removed(self):
+        code = "from ocp_vscode import show\n" + GOOD_SCRIPT + "show(result_part)\n"
+        result = preflight(code)
+        assert result.ok
+        assert "ocp_vscode" not in result.code and "show(" not in result.code
+
+    def test_comments_kept(self):
+        code = GOOD_SCRIPT.replace("fillet(", "# round the edges\n    Fillet(")
+        assert "# round the edges" in preflight(code).code
+
+    def test_unfixable(self):
+        result = preflight("from build123d import *\nradius = 5\n")
+        assert not result.ok
+        assert "result_part" in result.error_message
+        assert "export_stl" in result.error_message
+
+    def test_syntax_error(self):
+        result = preflight("from build123d import *\nwith BuildPart() as p\n    Box(1, 1, 1)\n")
+        assert not result.ok
+        assert "SyntaxError" in result.error_message and "line 2" in result.error_message
+
+    def test_fast(self):
+        result = preflight(GOOD_SCRIPT * 20)
+        assert result.duration < 0.05
+
+
+class TestCadAgentPreflight:
+    """Test that CadAgent does not launch scripts that fail pre-flight."""
+
+    @pytest.mark.asyncio
+    async def test_rejected_script_not_run(self, tmp_path):
+        from cad_agent import CadAgent
+
+        agent = CadAgent(use_worker_pool=False, use_cache=False)
+        responses = iter([
+            "```python\nfrom build123d import *\nwith BuildPart() as p\n    Box(1, 1, 1)\n```",
+            f"```python\n{GOOD_SCRIPT}```",
+            f"```python\n{GOOD_SCRIPT}```",
+        ])
+        prompts = []
+        runs = []
+
+        async def fake_request(contents, temperature=1.0, stream_thoughts=True):
+            prompts.append(contents)
+            reply = CodeFenceExtractor()
+            reply.feed(next(responses))
+            return reply
+
+        async def fake_run(script_path, work_dir, output_stl):
+            runs.append(script_path)
+            return "boom", None
+
+        agent._request_code = fake_request
+        agent._run_script = fake_run
+        assert await agent.generate_prototype("a cube", output_dir=str(tmp_path)) is None
+        # The syntax error never reached a process, and the retry prompt carries it
+        assert len(runs) == 2
+        assert "Pre-flight check failed" in prompts[1]
@@ -0,0 +1,156 @@
+"""
+Tests for the CAD script runner (timeouts, cancellation, streamed stderr).
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from cad_runner import ScriptRunner, TracebackCollector
+
+
+def write_script(tmp_path, body, name="script.py"):
+    path = tmp_path / name
+    path.write_text(body)
+    return str(path)
+
+
+class TestTracebackCollector:
+    """Test first-error detection on stderr lines."""
+
+    def test_detects_end_of_first_traceback(self):
+        collector = TracebackCollector()
+        lines = [
+            "some warning\n",
+            "Traceback (most recent call last):\n",
+            '  File "x.py", line 3, in <module>\n',
+            "    box = Box(1, 2)\n",
+            "          ^^^^^^^^^\n",
+            "TypeError: Box() missing 1 required positional argument: 'height'\n",
+        ]
+        completed = [collector.feed(line) for line in lines]
+        assert completed == [False] * 5 + [True]
+        assert collector.first_error.startswith("Traceback")
+        assert collector.first_error.endswith("'height'")
+        assert "some warning" not in collector.first_error
+
+    def test_non_python_exception_names(self):
+        collector = TracebackCollector()
+        collector.feed("Traceback (most recent call last):\n")
+        collector.feed('  File "x.py", line 1\n')
+        assert collector.feed("OCP.Standard.Standard_Failure: BRep_API: command not done\n")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Process-group kill and RLIMIT_AS are POSIX-only")
+class TestScriptRunner:
+    """Run real child processes."""
+
+    @pytest.mark.asyncio
+    async def test_success(self, tmp_path):
+        script = write_script(tmp_path, "print('hello')\n")
+        result = await ScriptRunner(timeout=30).run(script, cwd=str(tmp_path))
+        assert result.ok
+        assert result.stdout.strip() == "hello"
+
+    @pytest.mark.asyncio
+    async def test_first_error_returned_before_exit(self, tmp_path):
+        # The script prints a traceback, then keeps running; the runner stops it at the first error
+        script = write_script(tmp_path, (
+            "import sys, time, traceback\n"
+            "try:\n"
+            "    1 / 0\n"
+            "except Exception:\n"
+            "    traceback.print_exc()\n"
+            "    sys.stderr.flush()\n"
+            "time.sleep(30)\n"
+        ))
+        streamed = []
+        start = time.monotonic()
+        result = await ScriptRunner(timeout=30).run(script, on_stderr=streamed.append)
+        assert time.monotonic() - start < 10
+        assert not result.ok
+        assert result.first_error.splitlines()[-1] == "ZeroDivisionError: division by zero"
+        assert "ZeroDivisionError: division by zero" in streamed
+        assert "ZeroDivisionError" in result.error_message
+
+    @pytest.mark.asyncio
+    async def test_handled_traceback_does_not_fail(self, tmp_path):
+        # A library logs a traceback it recovered from; the script goes on and exports
+        script = write_script(tmp_path, (
+            "import traceback\n"
+            "try:\n"
+            "    1 / 0\n"
+            "except Exception:\n"
+            "    traceback.print_exc()\n"
+            "open('out.stl', 'w').write('solid')\n"
+        ))
+        result = await ScriptRunner(timeout=30).run(script, cwd=str(tmp_path), output_path="out.stl")
+        assert result.ok
+        assert result.output == b"solid"
+        assert result.first_error.splitlines()[-1] == "ZeroDivisionError: division by zero"
+
+    @pytest.mark.asyncio
+    async def test_missing_output_fails(self, tmp_path):
+        script = write_script(tmp_path, "print('no export')\n")
+        result = await ScriptRunner(timeout=30).run(script, cwd=str(tmp_path), output_path="out.stl")
+        assert result.returncode == 0
+        assert not result.ok and result.missing_output
+        assert "did not export" in result.error_message
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_process(self, tmp_path):
+        script = write_script(tmp_path, "import time\ntime.sleep(30)\n")
+        start = time.monotonic()
+        result = await ScriptRunner(timeout=0.5).run(script)
+        assert time.monotonic() - start < 10
+        assert result.timed_out
+        assert not result.ok
+        assert "time limit" in result.error_message
+
+    @pytest.mark.asyncio
+    async def test_memory_limit(self, tmp_path):
+        script = write_script(tmp_path, "data = bytearray(1024 * 1024 * 1024)\n")
+        result = await ScriptRunner(timeout=30, memory_limit_mb=256).run(script)
+        assert not result.ok
+        assert result.memory_exceeded
+
+    @pytest.mark.asyncio
+    async def test_cancellation_kills_child(self, tmp_path):
+        marker = tmp_path / "pid"
+        script = write_script(tmp_path, (
+            "import os, time\n"
+            f"open({str(marker)!r}, 'w').write(str(os.getpid()))\n"
+            "time.sleep(30)\n"
+        ))
+        task = asyncio.create_task(ScriptRunner(timeout=30).run(script))
+        for _ in range(100):
+            if marker.exists() and marker.read_text():
+                break
+            await asyncio.sleep(0.05)
+        pid = int(marker.read_text())
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        for _ in range(100):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            # Reap if it is our zombie
+            try:
+                os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                pass
+            await asyncio.sleep(0.05)
+        else:
+            pytest.fail("child process still alive after cancellation")
+
+    @pytest.mark.asyncio
+    async def test_thread_fallback(self, tmp_path):
+        script = write_script(tmp_path, "import sys\nprint('out')\nraise ValueError('bad value')\n")
+        result = await ScriptRunner(timeout=30)._run_threaded([sys.executable, script], None, None)
+        assert not result.ok
+        assert result.first_error.endswith("ValueError: bad value")
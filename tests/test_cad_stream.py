@@ -0,0 +1,108 @@
+"""
+Tests for streaming code-fence extraction.
+"""
+import asyncio
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from cad_stream import CodeFenceExtractor
+
+ANSWER = """Here is the script:
+
+```python
+from build123d import *
+
+result_part = Box(10, 10, 10)
+export_stl(result_part, 'output.stl')
+```
+
+This creates a 10mm cube. You can change the dimensions as needed.
+"""
+
+
+def regex_extract(text):
+    return re.search(r'```python(.*?)```', text, re.DOTALL).group(1).strip()
+
+
+class TestCodeFenceExtractor:
+    """Test fence detection over arbitrary chunk boundaries."""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(ANSWER)])
+    def test_matches_regex(self, size):
+        extractor = CodeFenceExtractor()
+        results = [extractor.feed(ANSWER[i:i + size]) for i in range(0, len(ANSWER), size)]
+        codes = [r for r in results if r is not None]
+        assert codes == [regex_extract(ANSWER)]
+        assert extractor.done and extractor.code == codes[0]
+        assert extractor.text == ANSWER
+
+    def test_returns_on_closing_chunk(self):
+        extractor = CodeFenceExtractor()
+        head, tail = ANSWER.split("```\n\nThis creates")
+        assert extractor.feed(head) is None
+        assert extractor.in_code
+        assert extractor.feed("```") == regex_extract(ANSWER)
+        # Later chunks are kept as text only
+        assert extractor.feed("\n\nMore prose") is None
+
+    def test_no_fence(self):
+        extractor = CodeFenceExtractor()
+        extractor.feed("import build123d\nprint('hi')\n")
+        assert not extractor.done and extractor.code is None
+
+    def test_unclosed_fence(self):
+        extractor = CodeFenceExtractor()
+        extractor.feed("```python\nx = 1\n``")
+        assert extractor.in_code and extractor.code is None
+
+
+def fake_chunk(text, thought=False):
+    part = SimpleNamespace(text=text, thought=thought)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+class TestCadAgentStreaming:
+    """Test that CadAgent stops reading the stream once the code block is complete."""
+
+    @pytest.mark.asyncio
+    async def test_stops_after_closing_fence(self):
+        from cad_agent import CadAgent
+
+        agent = CadAgent(use_worker_pool=False, use_cache=False)
+        thoughts = []
+        agent.on_thought = thoughts.append
+        consumed = []
+        closed = []
+
+        async def stream():
+            try:
+                for chunk in [fake_chunk("Planning a cube", thought=True)] + [fake_chunk(ANSWER[i:i + 10]) for i in range(0, len(ANSWER), 10)]:
+                    consumed.append(chunk)
+                    yield chunk
+            finally:
+                closed.append(True)
+
+        async def generate_content_stream(**kwargs):
+            return stream()
+
+        agent.client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream)))
+        reply = await agent._request_code("a cube")
+
+        assert thoughts == ["Planning a cube"]
+        assert reply.code == regex_extract(ANSWER)
+        assert agent._reply_code(reply) == reply.code
+        assert "as needed" not in reply.text
+        assert len(consumed) < 1 + len(range(0, len(ANSWER), 10))
+        # The stream is closed in the background, after the code was handed back
+        await asyncio.gather(*agent._closing)
+        assert closed == [True]
+
+    def test_reply_without_closed_fence_falls_back(self):
+        from cad_agent import CadAgent
+
+        reply = CodeFenceExtractor()
+        reply.feed("import build123d\nresult_part = None\n")
+        assert not reply.done
+        assert CadAgent._reply_code(reply) == "import build123d\nresult_part = None\n"
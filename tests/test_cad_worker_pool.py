@@ -0,0 +1,96 @@
+"""
+Tests for the warm CAD worker pool.
+"""
+import asyncio
+import os
+
+import pytest
+
+from cad_worker_pool import CadWorkerPool
+
+
+def write_script(tmp_path, body, name="script.py"):
+    path = tmp_path / name
+    path.write_text(body)
+    return str(path)
+
+
+@pytest.fixture
+def pool():
+    # No preload keeps worker start-up fast; the scripts below do not need build123d
+    pool = CadWorkerPool(size=1, max_jobs=2, preload=(), timeout=30, start_timeout=30)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Worker memory accounting uses the resource module")
+class TestCadWorkerPool:
+    """Run scripts on real worker processes."""
+
+    @pytest.mark.asyncio
+    async def test_returns_output_bytes(self, pool, tmp_path):
+        out = tmp_path / "out.stl"
+        script = write_script(tmp_path, f"print('built')\nopen({str(out)!r}, 'wb').write(b'solid x')\n")
+        result = await pool.run(script, output_path=str(out))
+        assert result.ok
+        assert result.output == b"solid x"
+        assert result.stdout.strip() == "built"
+
+    @pytest.mark.asyncio
+    async def test_traceback_and_isolated_namespace(self, pool, tmp_path):
+        first = write_script(tmp_path, "import os\nleaked = 1\nprint(os.getpid())\n", "a.py")
+        second = write_script(tmp_path, "import os\nprint(os.getpid())\nprint(leaked)\n", "b.py")
+        first_result = await pool.run(first)
+        result = await pool.run(second)
+        assert not result.ok
+        assert result.first_error.strip().endswith("NameError: name 'leaked' is not defined")
+        # Same process served both jobs
+        assert result.stdout.strip() == first_result.stdout.strip()
+
+    @pytest.mark.asyncio
+    async def test_recycles_after_max_jobs(self, pool, tmp_path):
+        script = write_script(tmp_path, "import os\nprint(os.getpid())\n")
+        pids = [int((await pool.run(script)).stdout) for _ in range(3)]
+        assert pids[0] == pids[1] != pids[2]
+        assert pool.get_stats()["workers_recycled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_recycles_on_rss_high_water(self, tmp_path):
+        pool = CadWorkerPool(size=1, max_rss_mb=1, preload=(), timeout=30)
+        try:
+            script = write_script(tmp_path, "pass\n")
+            assert (await pool.run(script)).ok
+            assert pool.get_stats()["workers_recycled"] == 1
+        finally:
+            pool.close()
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_worker(self, pool, tmp_path):
+        script = write_script(tmp_path, "import time\ntime.sleep(30)\n")
+        result = await pool.run(script, timeout=0.5)
+        assert result.timed_out
+        assert pool.get_stats()["workers_killed"] == 1
+        # The pool recovers with a fresh worker
+        assert (await pool.run(write_script(tmp_path, "pass\n", "ok.py"))).ok
+
+    @pytest.mark.asyncio
+    async def test_cancellation_kills_worker(self, pool, tmp_path):
+        script = write_script(tmp_path, "import time\ntime.sleep(30)\n")
+        task = asyncio.create_task(pool.run(script))
+        await asyncio.sleep(1.0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert pool.get_stats()["workers_killed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_reserve_runs_more_scripts_at_once(self, pool, tmp_path):
+        script = write_script(tmp_path, "import time\ntime.sleep(1.0)\n")
+        await pool.run(write_script(tmp_path, "pass\n", "warm.py"))  # Pool in use at size 1
+        pool.reserve(2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(pool.run(script), pool.run(script))
+        assert all(r.ok for r in results)
+        assert loop.time() - started < 1.9
+        assert pool.get_stats()["size"] == 2
@@ -0,0 +1,235 @@
+"""
+Tests for the versioned CAD design store and iteration edit blocks.
+"""
+import json
+import os
+
+import pytest
+
+from cad_stream import CodeFenceExtractor
+from design_store import DesignStore, EditError, apply_edit_blocks
+
+SCRIPT_V1 = """from build123d import *
+
+result_part = Box(10, 10, 10)
+export_stl(result_part, 'output.stl')
+"""
+
+SCRIPT_V2 = SCRIPT_V1.replace("Box(10, 10, 10)", "Box(20, 10, 10)")
+
+
+def model_reply(text, languages=("python",)):
+    """The model's answer as CadAgent._request_code hands it back."""
+    reply = CodeFenceExtractor(languages)
+    reply.feed(text)
+    return reply
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DesignStore(str(tmp_path))
+
+
+class TestDesignStore:
+    """Test the append-only version log, undo/redo and persistence."""
+
+    def test_record_and_lookup(self, store):
+        v1 = store.record(SCRIPT_V1, b"stl-1", "a cube", "generate", duration=1.5)
+        v2 = store.record(SCRIPT_V2, b"stl-2", "make it longer", "iterate")
+        assert (v1.version, v1.parent) == (1, None)
+        assert (v2.version, v2.parent) == (2, 1)
+        assert store.current == 2
+        assert store.get(1).prompt == "a cube" and store.get(1).duration == 1.5
+        assert store.script(2) == SCRIPT_V2 and store.stl(1) == b"stl-1"
+        assert store.get(3) is None
+
+    def test_identical_content_stored_once(self, store, tmp_path):
+        store.record(SCRIPT_V1, b"stl", "a cube", "generate")
+        store.record(SCRIPT_V1, b"stl", "a cube", "generate")
+        assert len(os.listdir(tmp_path / ".designs" / "objects")) == 2
+
+    def test_undo_redo(self, store):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        store.record(SCRIPT_V2, b"stl-2", "longer", "iterate")
+        assert store.undo().version == 1
+        assert store.undo() is None
+        assert store.history()["can_redo"]
+        assert store.redo().version == 2
+        assert store.redo() is None
+
+    def test_new_version_clears_redo(self, store):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        store.record(SCRIPT_V2, b"stl-2", "longer", "iterate")
+        store.undo()
+        v3 = store.record(SCRIPT_V1.replace("10, 10, 10", "10, 10, 5"), b"stl-3", "flatter", "iterate")
+        assert v3.parent == 1
+        assert not store.history()["can_redo"]
+        assert [v.version for v in store.lineage()] == [1, 3]
+
+    def test_persistence(self, store, tmp_path):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        store.record(SCRIPT_V2, b"stl-2", "longer", "iterate")
+        store.undo()
+
+        reopened = DesignStore(str(tmp_path))
+        assert len(reopened) == 2
+        assert reopened.current == 1
+        assert reopened.current_script() == SCRIPT_V1
+        assert reopened.redo().version == 2
+
+    def test_torn_last_line_ignored(self, store, tmp_path):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        with open(tmp_path / ".designs" / "log.jsonl", "a") as f:
+            f.write('{"version": 2, "par')
+        assert len(DesignStore(str(tmp_path))) == 1
+
+    def test_log_is_append_only(self, store, tmp_path):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        store.record(SCRIPT_V2, b"stl-2", "longer", "iterate")
+        store.undo()
+        with open(tmp_path / ".designs" / "log.jsonl") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["version"] for r in records] == [1, 2]
+
+    def test_generation_parent_and_lineage(self, store):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        store.record(SCRIPT_V2, b"stl-2", "longer", "iterate")
+        v3 = store.record("sphere", b"stl-3", "a sphere", "generate")
+        v4 = store.record("bigger sphere", b"stl-4", "bigger", "iterate")
+        assert v3.parent == 2
+        # The lineage stops where the current design was generated
+        assert [v.version for v in store.lineage()] == [3, 4]
+        assert store.undo().version == 3
+        assert store.undo().version == 2
+        assert v4.parent == 3
+
+    def test_diff(self, store):
+        store.record(SCRIPT_V1, b"stl-1", "a cube", "generate")
+        store.record(SCRIPT_V2, b"stl-2", "longer", "iterate")
+        diff = store.diff(1, 2)
+        assert "-result_part = Box(10, 10, 10)" in diff
+        assert "+result_part = Box(20, 10, 10)" in diff
+
+
+class TestEditBlocks:
+    """Test SEARCH/REPLACE edits against the current script."""
+
+    def edit(self, search, replace):
+        return f"```edit\n<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE\n```"
+
+    def test_apply(self):
+        text = self.edit("result_part = Box(10, 10, 10)", "result_part = Box(20, 10, 10)")
+        assert apply_edit_blocks(SCRIPT_V1, text) == SCRIPT_V2
+
+    def test_multiple_blocks(self):
+        text = (self.edit("from build123d import *", "from build123d import *\nimport math")
+                + "\n" + self.edit("Box(10, 10, 10)", "Box(20, 10, 10)"))
+        result = apply_edit_blocks(SCRIPT_V1, text)
+        assert "import math" in result and "Box(20, 10, 10)" in result
+
+    def test_trailing_whitespace_tolerated(self):
+        text = self.edit("result_part = Box(10, 10, 10)   ", "result_part = Box(20, 10, 10)")
+        assert apply_edit_blocks(SCRIPT_V1, text) == SCRIPT_V2
+
+    def test_not_found(self):
+        with pytest.raises(EditError):
+            apply_edit_blocks(SCRIPT_V1, self.edit("Cylinder(1, 2)", "Cylinder(2, 2)"))
+
+    def test_ambiguous(self):
+        with pytest.raises(EditError):
+            apply_edit_blocks(SCRIPT_V1 + SCRIPT_V1, self.edit("result_part = Box(10, 10, 10)", "x = 1"))
+
+
+class TestCadAgentVersions:
+    """Test that CadAgent records versions and restores them without regenerating."""
+
+    @pytest.mark.asyncio
+    async def test_iterate_with_edits_and_undo(self, tmp_path):
+        from cad_agent import CadAgent
+
+        agent = CadAgent(use_worker_pool=False, use_cache=False)
+        agent._get_store(str(tmp_path)).record(SCRIPT_V1, b"solid v1\nendsolid v1\n", "a cube", "generate")
+        prompts = []
+
+        async def fake_request(contents, temperature=1.0, stream_thoughts=True):
+            prompts.append(contents)
+            return model_reply(TestEditBlocks().edit("result_part = Box(10, 10, 10)", "result_part = Box(20, 10, 10)"),
+                               ("python", "edit"))
+
+        async def fake_run(script_path, work_dir, output_stl):
+            with open(script_path) as f:
+                assert "Box(20, 10, 10)" in f.read()
+            return None, b"solid v2\nendsolid v2\n"
+
+        agent._request_code = fake_request
+        agent._run_script = fake_run
+        result = await agent.iterate_prototype("make it longer", output_dir=str(tmp_path))
+        assert result["version"] == 2
+        assert "SEARCH/REPLACE" in prompts[0]
+        assert "- v1 (generate): a cube" in prompts[0]
+        assert "+result_part = Box(20, 10, 10)" in result["diff"]
+
+        restored = await agent.restore_version(str(tmp_path), "undo")
+        assert restored["version"] == 1
+        with open(restored["file_path"], "rb") as f:
+            assert f.read() == b"solid v1\nendsolid v1\n"
+        with open(tmp_path / "current_design.py") as f:
+            assert "Box(10, 10, 10)" in f.read()
+        assert agent.get_history(str(tmp_path))["can_redo"]
+        assert await agent.restore_version(str(tmp_path), "undo") is None
+
+    @pytest.mark.asyncio
+    async def test_unchanged_script_is_retried_not_recorded(self, tmp_path):
+        from cad_agent import CadAgent
+        from cad_cache import script_key
+
+        agent = CadAgent(use_worker_pool=False, use_cache=True)
+        agent._get_store(str(tmp_path)).record(SCRIPT_V1, b"solid v1\nendsolid v1\n", "a cube", "generate")
+        # Without the check the cached mesh of the unchanged script would be served as the result
+        agent._get_cache(str(tmp_path)).put(script_key(SCRIPT_V1), SCRIPT_V1, b"solid v1\nendsolid v1\n")
+        prompts = []
+
+        async def fake_request(contents, temperature=1.0, stream_thoughts=True):
+            prompts.append(contents)
+            return model_reply(f"```python\n{SCRIPT_V1}```")
+
+        async def fake_run(script_path, work_dir, output_stl):
+            raise AssertionError("unchanged code must not be executed")
+
+        agent._request_code = fake_request
+        agent._run_script = fake_run
+        assert await agent.iterate_prototype("make it longer", output_dir=str(tmp_path)) is None
+        assert len(prompts) == 3
+        assert "left the script unchanged" in prompts[1]
+        assert len(agent._get_store(str(tmp_path))) == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_edits_apply_to_failed_script(self, tmp_path):
+        from cad_agent import CadAgent
+
+        agent = CadAgent(use_worker_pool=False, use_cache=False)
+        agent._get_store(str(tmp_path)).record(SCRIPT_V1, b"solid v1\nendsolid v1\n", "a cube", "generate")
+        broken = SCRIPT_V1.replace("Box(10, 10, 10)", "Box(20, 10)")
+        replies = [
+            TestEditBlocks().edit("result_part = Box(10, 10, 10)", "result_part = Box(20, 10)"),
+            # Only matches the failed candidate, not the original script
+            TestEditBlocks().edit("result_part = Box(20, 10)", "result_part = Box(20, 10, 10)"),
+        ]
+        prompts = []
+
+        async def fake_request(contents, temperature=1.0, stream_thoughts=True):
+            prompts.append(contents)
+            return model_reply(replies[len(prompts) - 1], ("python", "edit"))
+
+        async def fake_run(script_path, work_dir, output_stl):
+            with open(script_path) as f:
+                if "Box(20, 10)\n" in f.read():
+                    return "TypeError: Box() missing 1 required positional argument: 'height'", None
+            return None, b"solid v2\nendsolid v2\n"
+
+        agent._request_code = fake_request
+        agent._run_script = fake_run
+        result = await agent.iterate_prototype("make it longer", output_dir=str(tmp_path))
+        assert result["version"] == 2
+        assert broken in prompts[1]
+        assert agent._get_store(str(tmp_path)).script(2) == SCRIPT_V2
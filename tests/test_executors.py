@@ -0,0 +1,104 @@
+"""
+Tests for the bounded executor registry.
+"""
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from executors import BoundedExecutor, ExecutorRegistry, ExecutorSaturatedError
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class TestBoundedExecutor:
+    """Test queue limits and counters."""
+
+    @pytest.mark.asyncio
+    async def test_run_returns_result_and_propagates_context(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+        request_id.set("abc")
+        assert await executor.run(lambda x, y=0: x + y, 2, y=3) == 5
+        assert await executor.run(request_id.get) == "abc"
+        stats = executor.get_stats()
+        assert stats["completed"] == 2 and stats["active"] == 0 and stats["queued"] == 0
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_saturated(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+        release = threading.Event()
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(release.wait)
+        assert executor.get_stats()["rejected"] == 1
+        assert executor.get_stats()["peak_pending"] == 2
+
+        release.set()
+        running.result(timeout=1)
+        queued.result(timeout=1)
+        assert executor.get_stats()["completed"] == 2
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_failures_are_counted_and_raised(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+
+        def boom():
+            raise ValueError("bad")
+
+        with pytest.raises(ValueError):
+            await executor.run(boom)
+        assert executor.get_stats()["failed"] == 1
+        assert executor.pending == 0
+        executor.shutdown()
+
+
+class TestExecutorRegistry:
+    """Test pool isolation and configuration."""
+
+    @pytest.mark.asyncio
+    async def test_busy_pool_does_not_block_others(self):
+        registry = ExecutorRegistry({"slow": (1, 0), "fast": (1, 0)})
+        release = threading.Event()
+        slow = asyncio.ensure_future(registry.run("slow", release.wait, 2))
+        await asyncio.sleep(0.01)
+        # The slow pool is full, the fast pool still has a worker
+        assert await asyncio.wait_for(registry.run("fast", lambda: "ok"), 1.0) == "ok"
+        release.set()
+        await slow
+        registry.shutdown()
+
+    def test_configure_and_stats(self):
+        registry = ExecutorRegistry()
+        registry.configure("cpu-subprocess", max_workers=1, max_queue=3)
+        assert registry.get("cpu-subprocess").max_workers == 1
+        stats = registry.get_stats()
+        assert set(stats) == {"realtime-audio", "vision", "cpu-subprocess", "cad-scripts", "file-io"}
+        assert stats["cpu-subprocess"]["max_queue"] == 3
+        registry.shutdown()
+
+    def test_reserve_only_raises(self):
+        registry = ExecutorRegistry()
+        registry.reserve("cad-scripts", 6)
+        registry.reserve("cad-scripts", 2)
+        assert registry.get("cad-scripts").max_workers == 6
+        registry.shutdown()
+
+    def test_reserve_grows_running_pool(self):
+        registry = ExecutorRegistry({"cad-scripts": (1, 4)})
+        executor = registry.get("cad-scripts")
+        barrier = threading.Barrier(3, timeout=5)
+        registry.reserve("cad-scripts", 3)
+        assert executor.max_workers == 3
+        # Three jobs that only finish together: they must all be running at once
+        futures = [executor.submit(barrier.wait) for _ in range(3)]
+        for future in futures:
+            future.result(timeout=10)
+        registry.shutdown()
+
+    def test_unknown_pool(self):
+        with pytest.raises(ValueError):
+            ExecutorRegistry().get("gpu")
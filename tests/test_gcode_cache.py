@@ -0,0 +1,173 @@
+"""
+Tests for the content-addressed G-code cache and its use by PrinterAgent.slice_stl.
+"""
+import os
+import stat
+import sys
+
+import numpy as np
+import pytest
+
+from gcode_cache import GcodeCache, file_sha256, profile_hash, slice_key
+from mesh_tools import write_stl
+
+FAKE_SLICER = """#!{python}
+import sys
+args = sys.argv[1:]
+output = args[args.index("--output") + 1]
+with open({counter!r}, "a") as f:
+    f.write("run\\n")
+with open(output, "w") as f:
+    f.write("; sliced " + args[-1] + "\\nG28\\n")
+"""
+
+
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GcodeCache(str(tmp_path / "cache"))
+
+
+class TestGcodeCache:
+    """Test hits, misses, integrity checks and LRU eviction."""
+
+    def test_put_and_get(self, cache, tmp_path):
+        gcode = write_file(tmp_path / "part.gcode", b"G28\nG1 X10\n")
+        dest = str(tmp_path / "out" / "copy.gcode")
+        assert cache.get("k", dest) is False
+        cache.put("k", gcode, {"stl": "part.stl"})
+        assert cache.get("k", dest) is True
+        with open(dest, "rb") as f:
+            assert f.read() == b"G28\nG1 X10\n"
+        stats = cache.get_stats()
+        assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+    def test_identical_gcode_stored_once(self, cache, tmp_path):
+        gcode = write_file(tmp_path / "part.gcode", b"G28\n")
+        cache.put("a", gcode)
+        cache.put("b", gcode)
+        assert len(os.listdir(tmp_path / "cache" / "objects")) == 1
+
+    def test_corrupted_entry_is_a_miss(self, cache, tmp_path):
+        gcode = write_file(tmp_path / "part.gcode", b"G28\n")
+        cache.put("k", gcode)
+        digest = file_sha256(gcode)
+        write_file(tmp_path / "cache" / "objects" / f"{digest}.gcode", b"garbage")
+        assert cache.get("k", str(tmp_path / "copy.gcode")) is False
+        assert cache.get_stats()["entries"] == 0
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        cache = GcodeCache(str(tmp_path / "cache"), max_bytes=250)
+        for name in ("a", "b", "c"):
+            cache.put(name, write_file(tmp_path / f"{name}.gcode", name.encode() * 100))
+            cache.get("a", str(tmp_path / "touch.gcode"))  # Keep "a" recently used
+        assert cache.get("a", str(tmp_path / "x.gcode")) is True
+        assert cache.get("b", str(tmp_path / "x.gcode")) is False
+        assert cache.get("c", str(tmp_path / "x.gcode")) is True
+        assert cache.get_stats()["evictions"] == 1
+        assert len(os.listdir(tmp_path / "cache" / "objects")) == 2
+
+    def test_persistence(self, cache, tmp_path):
+        cache.put("k", write_file(tmp_path / "part.gcode", b"G28\n"))
+        reopened = GcodeCache(str(tmp_path / "cache"))
+        assert reopened.get("k", str(tmp_path / "copy.gcode")) is True
+
+    def test_key_depends_on_every_input(self):
+        base = slice_key("stl", {"machine": "m", "process": "p"}, "orca:1")
+        assert base == slice_key("stl", {"process": "p", "machine": "m"}, "orca:1")
+        assert base != slice_key("stl2", {"machine": "m", "process": "p"}, "orca:1")
+        assert base != slice_key("stl", {"machine": "m", "process": "p2"}, "orca:1")
+        assert base != slice_key("stl", {"machine": "m", "process": "p"}, "orca:2")
+
+    def test_profile_hash_covers_inherited_profiles(self, tmp_path):
+        leaf = write_file(tmp_path / "leaf.json", b'{"inherits": "base"}')
+        base = write_file(tmp_path / "base.json", b'{"layer_height": "0.2"}')
+        before = profile_hash([leaf, base])
+        write_file(tmp_path / "base.json", b'{"layer_height": "0.28"}')
+        assert profile_hash([leaf, base]) != before
+
+
+class TestSliceWithCache:
+    """Test that slice_stl skips the slicer on a cache hit."""
+
+    @pytest.fixture
+    def agent(self, tmp_path):
+        from printer_agent import PrinterAgent
+
+        counter = tmp_path / "slicer_runs.txt"
+        slicer = tmp_path / "bin" / "prusa-slicer"
+        slicer.parent.mkdir()
+        slicer.write_text(FAKE_SLICER.format(python=sys.executable, counter=str(counter)))
+        slicer.chmod(slicer.stat().st_mode | stat.S_IEXEC)
+
+        agent = PrinterAgent(profiles_dir=str(tmp_path / "profiles"), discovery_cache_path=None,
+                             profile_index_path=None, gcode_cache_dir=str(tmp_path / "gcode_cache"))
+        agent.slicer_path = str(slicer)
+        agent.slicer_runs = lambda: len(counter.read_text().splitlines()) if counter.exists() else 0
+        return agent
+
+    def stl(self, tmp_path, name="part.stl", size=10.0):
+        corners = np.array([[0, 0, 0], [size, 0, 0], [0, size, 0], [0, 0, size]], dtype=np.float32)
+        faces = [(0, 2, 1), (0, 1, 3), (0, 3, 2), (1, 2, 3)]
+        return write_file(tmp_path / name, write_stl(np.array([corners[list(f)] for f in faces])))
+
+    @pytest.mark.asyncio
+    async def test_second_slice_is_cached(self, agent, tmp_path):
+        stl_path = self.stl(tmp_path)
+        first = await agent.slice_stl(stl_path, output_path=str(tmp_path / "first.gcode"))
+        second = await agent.slice_stl(stl_path, output_path=str(tmp_path / "second.gcode"))
+        assert agent.slicer_runs() == 1
+        with open(first) as f1, open(second) as f2:
+            assert f1.read() == f2.read()
+        assert agent.gcode_cache.get_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_inputs_reslice(self, agent, tmp_path):
+        stl_path = self.stl(tmp_path)
+        await agent.slice_stl(stl_path, output_path=str(tmp_path / "a.gcode"))
+        await agent.slice_stl(self.stl(tmp_path, "bigger.stl", size=20.0), output_path=str(tmp_path / "b.gcode"))
+        profile = write_file(tmp_path / "fine.ini", b"layer_height = 0.1\n")
+        await agent.slice_stl(stl_path, output_path=str(tmp_path / "c.gcode"), profile_path=profile)
+        assert agent.slicer_runs() == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrent_slices_run_slicer_once(self, agent, tmp_path):
+        import asyncio
+
+        stl_path = self.stl(tmp_path)
+        results = await asyncio.gather(*(agent.slice_stl(stl_path, output_path=str(tmp_path / f"k1_{i}.gcode"))
+                                         for i in range(2)))
+        assert all(results)
+        assert agent.slicer_runs() == 1
+        assert agent._slice_locks == {}
+
+    @pytest.mark.asyncio
+    async def test_cache_disabled(self, agent, tmp_path):
+        agent.gcode_cache = None
+        stl_path = self.stl(tmp_path)
+        await agent.slice_stl(stl_path, output_path=str(tmp_path / "a.gcode"))
+        await agent.slice_stl(stl_path, output_path=str(tmp_path / "b.gcode"))
+        assert agent.slicer_runs() == 2
+
+    @pytest.mark.asyncio
+    async def test_missing_output_is_not_cached(self, agent, tmp_path):
+        stl_path = self.stl(tmp_path)
+        output = tmp_path / "part.gcode"
+        output.write_text("; stale G-code from an earlier slice\n")
+        # Exits cleanly without writing any G-code
+        with open(agent.slicer_path, "w") as f:
+            f.write(f"#!{sys.executable}\n")
+        assert await agent.slice_stl(stl_path, output_path=str(output)) is None
+        assert agent.gcode_cache.get_stats()["entries"] == 0
+
+    def test_default_cache_dir_is_anchored(self, tmp_path, monkeypatch):
+        from printer_agent import BACKEND_DIR, PrinterAgent
+
+        monkeypatch.chdir(tmp_path)
+        agent = PrinterAgent(profiles_dir=str(tmp_path / "profiles"), discovery_cache_path=None, profile_index_path=None)
+        assert agent.gcode_cache.root == os.path.join(BACKEND_DIR, ".cache", "gcode")
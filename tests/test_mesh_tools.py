@@ -0,0 +1,239 @@
+"""
+Tests for STL reading/writing, indexed meshes and preview decimation.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from mesh_tools import (IndexedMesh, analysis_path_for, analyze, decimate, describe, ensure_preview, load_indexed,
+                        load_mesh, mesh_path_for, mesh_stats, preview_path_for, read_stl, save_mesh, weld, write_stl)
+
+
+def uv_sphere(radius=10.0, rings=60, segments=120):
+    """Closed triangulated sphere with 2 * segments * (rings - 1) triangles."""
+    theta = np.linspace(0, np.pi, rings + 1)
+    phi = np.linspace(0, 2 * np.pi, segments + 1)
+    grid = np.stack([
+        radius * np.sin(theta)[:, None] * np.cos(phi)[None, :],
+        radius * np.sin(theta)[:, None] * np.sin(phi)[None, :],
+        radius * np.cos(theta)[:, None] * np.ones_like(phi)[None, :],
+    ], axis=-1).astype(np.float32)
+    # Share the seam and pole vertices exactly so welding sees one surface
+    grid[:, -1] = grid[:, 0]
+    grid[0, :] = grid[0, 0]
+    grid[-1, :] = grid[-1, 0]
+    triangles = []
+    for i in range(rings):
+        for j in range(segments):
+            a, b, c, d = grid[i, j], grid[i + 1, j], grid[i + 1, j + 1], grid[i, j + 1]
+            if i != 0:
+                triangles.append([a, b, d])
+            if i != rings - 1:
+                triangles.append([b, c, d])
+    return np.array(triangles, dtype=np.float32)
+
+
+def box(size=10.0, z=0.0):
+    """Outward-wound cube with its lower face at height z."""
+    corners = np.array([[x, y, zz] for x in (0, size) for y in (0, size) for zz in (z, z + size)], dtype=np.float32)
+    center = corners.mean(axis=0)
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    triangles = []
+    for a, b, c, d in quads:
+        for tri in ([a, b, c], [a, c, d]):
+            points = corners[tri]
+            normal = np.cross(points[1] - points[0], points[2] - points[0])
+            if np.dot(normal, points.mean(axis=0) - center) < 0:
+                points = points[::-1]
+            triangles.append(points)
+    return np.array(triangles, dtype=np.float32)
+
+
+class TestStlIO:
+    """Test binary and ASCII STL parsing."""
+
+    def test_binary_roundtrip(self):
+        triangles = uv_sphere(rings=6, segments=8)
+        data = write_stl(triangles)
+        assert len(data) == 84 + 50 * len(triangles)
+        np.testing.assert_array_equal(read_stl(data), triangles)
+
+    def test_ascii(self):
+        data = b"""solid cube
+facet normal 0 0 1
+  outer loop
+    vertex 0 0 0
+    vertex 1 0 0
+    vertex 0 1 0
+  endloop
+endfacet
+endsolid cube
+"""
+        triangles = read_stl(data)
+        assert triangles.shape == (1, 3, 3)
+        assert triangles[0, 1, 0] == 1.0
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            read_stl(b"not a mesh")
+
+    def test_weld(self):
+        triangles = uv_sphere(rings=6, segments=8)
+        vertices, faces = weld(triangles)
+        # Closed sphere: 2 poles + (rings - 1) * segments ring vertices
+        assert len(vertices) == 2 + 5 * 8
+        np.testing.assert_array_equal(vertices[faces], triangles)
+
+
+class TestIndexedMesh:
+    """Test the indexed mesh format and its on-disk cache."""
+
+    def test_stats(self):
+        mesh = IndexedMesh.from_triangles(uv_sphere(radius=10.0))
+        assert mesh.faces.dtype == np.uint32 and mesh.vertices.dtype == np.float32
+        stats = mesh.stats()
+        assert stats["triangles"] == len(mesh.faces)
+        np.testing.assert_allclose(stats["size"], [20.0, 20.0, 20.0], atol=0.1)
+        assert stats["volume"] == pytest.approx(4 / 3 * np.pi * 1000, rel=0.01)
+
+    def test_save_and_memory_map(self, tmp_path):
+        mesh = IndexedMesh.from_triangles(uv_sphere(rings=6, segments=8))
+        path = str(tmp_path / "part.mesh")
+        save_mesh(mesh, path)
+
+        loaded = load_mesh(path)
+        assert isinstance(loaded.vertices, np.memmap) and isinstance(loaded.faces, np.memmap)
+        np.testing.assert_array_equal(loaded.vertices, mesh.vertices)
+        np.testing.assert_array_equal(loaded.faces, mesh.faces)
+
+    def test_rejects_bad_files(self, tmp_path):
+        path = tmp_path / "part.mesh"
+        path.write_bytes(b"garbage" * 10)
+        with pytest.raises(ValueError):
+            load_mesh(str(path))
+
+    def test_load_indexed_caches(self, tmp_path):
+        stl = tmp_path / "output.stl"
+        stl.write_bytes(write_stl(uv_sphere(rings=6, segments=8)))
+
+        mesh = load_indexed(str(stl))
+        mesh_path = mesh_path_for(str(stl))
+        assert os.path.dirname(mesh_path) == str(tmp_path / ".cache" / "meshes")
+        mtime = os.path.getmtime(mesh_path)
+        assert load_indexed(str(stl)).triangle_count == mesh.triangle_count
+        assert os.path.getmtime(mesh_path) == mtime
+
+        # A newer STL invalidates the cache
+        stl.write_bytes(write_stl(uv_sphere(rings=8, segments=8)))
+        os.utime(stl, (mtime + 10, mtime + 10))
+        assert load_indexed(str(stl)).triangle_count != mesh.triangle_count
+
+
+class TestAnalysis:
+    """Test watertightness, areas and the filament estimate."""
+
+    def test_box_on_bed(self):
+        report = analyze(IndexedMesh.from_triangles(box(10.0)))
+        assert report["watertight"]
+        assert report["volume"] == pytest.approx(1000.0)
+        assert report["surface_area"] == pytest.approx(600.0)
+        # The bottom face rests on the bed and needs no support
+        assert report["overhang_area"] == 0.0
+        assert report["filament_g"] == pytest.approx(1.24)
+        assert report["filament_m"] == pytest.approx(1000.0 / (np.pi * 0.875 ** 2) / 1000.0)
+
+    def test_floating_overhang(self):
+        # A second block hanging in the air: its underside needs support, the first block's does not
+        floating = box(10.0, z=20.0) + np.float32([20, 0, 0])
+        report = analyze(IndexedMesh.from_triangles(np.concatenate([box(10.0), floating])))
+        assert report["overhang_area"] == pytest.approx(100.0)
+        assert "1.0 cm^2 of overhangs" in describe(report)
+
+    def test_open_mesh(self):
+        report = analyze(IndexedMesh.from_triangles(box()[:-1]))
+        assert not report["watertight"]
+        assert report["boundary_edges"] == 3
+        assert "not watertight" in describe(report)
+
+    def test_flipped_triangle_is_not_watertight(self):
+        triangles = box().copy()
+        triangles[0] = triangles[0][::-1]
+        report = analyze(IndexedMesh.from_triangles(triangles))
+        assert report["boundary_edges"] == 0 and not report["watertight"]
+
+    def test_sphere(self):
+        report = analyze(IndexedMesh.from_triangles(uv_sphere(radius=10.0)))
+        assert report["watertight"]
+        assert report["surface_area"] == pytest.approx(4 * np.pi * 100, rel=0.01)
+
+    def test_mesh_stats_cached(self, tmp_path):
+        stl = tmp_path / "output.stl"
+        stl.write_bytes(write_stl(box()))
+        report = mesh_stats(str(stl))
+        path = analysis_path_for(str(stl))
+        assert os.path.dirname(path) == str(tmp_path / ".cache" / "meshes")
+        mtime = os.path.getmtime(path)
+        assert mesh_stats(str(stl)) == report
+        assert os.path.getmtime(path) == mtime
+        assert "10.0 x 10.0 x 10.0 mm" in describe(report)
+
+    def test_concurrent_builds_of_one_stl(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+
+        stl = tmp_path / "output.stl"
+        stl.write_bytes(write_stl(uv_sphere()))
+        with ThreadPoolExecutor(8) as pool:
+            reports = list(pool.map(lambda _: mesh_stats(str(stl)), range(8)))
+        assert all(r == reports[0] for r in reports)
+        assert not [f for f in os.listdir(tmp_path / ".cache" / "meshes") if f.endswith(".tmp")]
+
+
+class TestDecimate:
+    """Test vertex-clustering decimation."""
+
+    def test_within_budget(self):
+        triangles = uv_sphere()
+        assert len(triangles) > 10000
+
+        preview = decimate(triangles, 2000)
+        assert 0 < len(preview) <= 2000
+        # Close enough to the original to stand in for it
+        radii = np.linalg.norm(preview.reshape(-1, 3), axis=1)
+        assert np.all(np.abs(radii - 10.0) < 1.0)
+        lo, hi = preview.reshape(-1, 3).min(axis=0), preview.reshape(-1, 3).max(axis=0)
+        np.testing.assert_allclose(lo, -10.0, atol=1.0)
+        np.testing.assert_allclose(hi, 10.0, atol=1.0)
+
+    def test_no_degenerate_triangles(self):
+        preview = decimate(uv_sphere(), 1000)
+        a, b, c = preview[:, 0], preview[:, 1], preview[:, 2]
+        assert not np.any(np.all(a == b, axis=1) | np.all(b == c, axis=1) | np.all(a == c, axis=1))
+
+    def test_small_mesh_untouched(self):
+        triangles = uv_sphere(rings=6, segments=8)
+        assert decimate(triangles, 1000) is triangles
+
+
+class TestEnsurePreview:
+    """Test preview files next to exported meshes."""
+
+    def test_builds_and_reuses(self, tmp_path):
+        stl = tmp_path / "output.stl"
+        stl.write_bytes(write_stl(uv_sphere()))
+
+        preview_path, preview_count, full_count = ensure_preview(str(stl), 2000)
+        assert preview_path == preview_path_for(str(stl))
+        assert os.path.dirname(preview_path) == str(tmp_path / ".cache" / "previews")
+        assert preview_count <= 2000 < full_count
+        assert len(read_stl(open(preview_path, "rb").read())) == preview_count
+
+        mtime = os.path.getmtime(preview_path)
+        assert ensure_preview(str(stl), 2000) == (preview_path, preview_count, full_count)
+        assert os.path.getmtime(preview_path) == mtime
+
+    def test_small_mesh_has_no_preview(self, tmp_path):
+        stl = tmp_path / "output.stl"
+        stl.write_bytes(write_stl(uv_sphere(rings=6, segments=8)))
+        assert ensure_preview(str(stl), 2000) is None
+        assert not os.path.exists(preview_path_for(str(stl)))
@@ -7,7 +7,7 @@ import asyncio
 
 # Try to import the agent, skip all tests if dependencies missing
 try:
-    from printer_agent import PrinterAgent, PrinterType, Printer
+    from printer_agent import PrinterAgent, PrinterType, Printer, PrintStatus, StatusScheduler
     HAS_PRINTER = True
 except ImportError as e:
     HAS_PRINTER = False
@@ -16,6 +16,8 @@ except ImportError as e:
     PrinterAgent = None
     PrinterType = None
     Printer = None
+    PrintStatus = None
+    StatusScheduler = None
 
 pytestmark = pytest.mark.skipif(not HAS_PRINTER, reason=f"Printer dependencies not installed: {IMPORT_ERROR if not HAS_PRINTER else ''}")
 
@@ -58,7 +60,7 @@ class TestPrinterDiscovery:
     @pytest.mark.asyncio
     async def test_discover_printers(self):
         """Test discovering printers on network."""
-        agent = PrinterAgent()
+        agent = PrinterAgent(discovery_cache_path=None)
         printers = await agent.discover_printers(timeout=3.0)
         
         print(f"Discovered {len(printers)} printers:")
@@ -242,3 +244,412 @@ class TestPrinterDataclass:
         assert d['name'] == "Test"
         assert d['host'] == "192.168.1.1"
         assert 'printer_type' in d
+
+
+class TestConnectionPool:
+    """Test that printer API calls share one keep-alive session."""
+
+    @pytest.mark.asyncio
+    async def test_status_polls_reuse_connection(self):
+        from aiohttp import web
+
+        peers = []
+
+        async def query(request):
+            peers.append(request.transport.get_extra_info("peername"))
+            return web.json_response({"result": {"status": {
+                "print_stats": {"state": "printing", "filename": "part.gcode", "print_duration": 61},
+                "display_status": {"progress": 0.25},
+                "extruder": {"temperature": 210.0, "target": 210.0},
+                "heater_bed": {"temperature": 60.0, "target": 60.0},
+            }}})
+
+        app = web.Application()
+        app.router.add_get("/printer/objects/query", query)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        agent = PrinterAgent()
+        try:
+            agent.add_printer_manually("Mock Klipper", "127.0.0.1", port=port, printer_type="moonraker")
+            for _ in range(3):
+                status = await agent.get_print_status("Mock Klipper", max_age=0)
+                assert status.state == "printing" and status.progress_percent == 25
+            session = await agent._get_session()
+            assert len(peers) == 3 and len(set(peers)) == 1
+        finally:
+            await agent.close()
+            await runner.cleanup()
+        assert session.closed
+
+
+def make_status(state):
+    return PrintStatus(printer="P", state=state, progress_percent=0, time_remaining=None, time_elapsed=None, filename=None)
+
+
+class TestStatusScheduler:
+    """Test request coalescing, adaptive intervals and backoff for unreachable printers."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_fetch(self):
+        scheduler = StatusScheduler()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return make_status("printing")
+
+        results = await asyncio.gather(*[scheduler.get("h", fetch) for _ in range(5)])
+        assert len(calls) == 1 and all(r is results[0] for r in results)
+        # Fresh enough: reused without a fetch
+        assert await scheduler.get("h", fetch, max_age=10) is results[0]
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_fetch_errors_reach_every_caller(self):
+        scheduler = StatusScheduler()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise OSError("boom")
+
+        results = await asyncio.gather(scheduler.get("h", fetch), scheduler.get("h", fetch), return_exceptions=True)
+        assert all(isinstance(r, OSError) for r in results)
+        assert scheduler.due("h")
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_joiners(self):
+        scheduler = StatusScheduler()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return make_status("printing")
+
+        owner = asyncio.ensure_future(scheduler.get("h", fetch))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(scheduler.get("h", fetch))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        assert (await joiner).state == "printing"
+        assert owner.cancelled() and len(calls) == 1
+        assert "h" not in scheduler._inflight
+
+    def test_interval_follows_state(self):
+        scheduler = StatusScheduler(active_interval=2.0, idle_interval=15.0)
+        assert scheduler.due("h")
+        scheduler.record("h", make_status("printing"))
+        assert scheduler.interval("h") == 2.0 and not scheduler.due("h")
+        scheduler.record("h", make_status("Operational"))
+        assert scheduler.interval("h") == 15.0
+
+    @pytest.mark.asyncio
+    async def test_backoff_for_unreachable_host(self):
+        scheduler = StatusScheduler(base_backoff=2.0, max_backoff=8.0)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return make_status("Error: Cannot connect to host")
+
+        await scheduler.get("h", fetch)
+        assert scheduler.interval("h") == 2.0
+        # Within the backoff window even max_age=0 returns the last result
+        assert (await scheduler.get("h", fetch, max_age=0)).state.startswith("Error")
+        assert len(calls) == 1
+        for expected in (4.0, 8.0, 8.0):
+            scheduler._fetched_at["h"] -= 100
+            await scheduler.get("h", fetch, max_age=0)
+            assert scheduler.interval("h") == expected
+
+        scheduler.record("h", make_status("standby"))
+        assert scheduler.interval("h") == scheduler.idle_interval
+
+    @pytest.mark.asyncio
+    async def test_force_bypasses_backoff(self):
+        scheduler = StatusScheduler(base_backoff=60.0)
+        states = iter(["Error: Cannot connect to host", "printing"])
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return make_status(next(states))
+
+        await scheduler.get("h", fetch)
+        # Background polls keep backing off; a forced request reaches the printer
+        assert (await scheduler.get("h", fetch, max_age=0)).state.startswith("Error")
+        assert (await scheduler.get("h", fetch, force=True)).state == "printing"
+        assert len(calls) == 2 and scheduler.interval("h") == scheduler.active_interval
+
+
+class FakeZeroconf:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_mdns(monkeypatch, tmp_path):
+    import threading
+    import printer_agent
+
+    hits = []  # (delay, Printer) announced from a background thread, like Zeroconf does
+
+    class FakeBrowser:
+        started = False
+
+        def __init__(self, zc, service, listener):
+            if FakeBrowser.started:
+                return
+            FakeBrowser.started = True
+
+            def announce():
+                import time
+                for delay, printer in hits:
+                    time.sleep(delay)
+                    listener.printers.append(printer)
+                    listener.on_printer(printer)
+
+            threading.Thread(target=announce, daemon=True).start()
+
+    monkeypatch.setattr(printer_agent, "Zeroconf", FakeZeroconf)
+    monkeypatch.setattr(printer_agent, "ServiceBrowser", FakeBrowser)
+    return hits
+
+
+class TestStreamingDiscovery:
+    """Test that discovery yields printers as they are identified, with capped concurrent probes."""
+
+    @pytest.mark.asyncio
+    async def test_first_printer_arrives_early(self, fake_mdns):
+        fake_mdns.append((0.01, Printer("Klipper", "10.0.0.2", 7125, PrinterType.MOONRAKER)))
+        fake_mdns.append((0.3, Printer("Octo", "10.0.0.3", 80, PrinterType.OCTOPRINT)))
+        agent = PrinterAgent(discovery_cache_path=None)
+
+        async def no_camera(host, port):
+            return None
+
+        agent._probe_camera = no_camera
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        arrivals = []
+        async for printer in agent.discover_printers_iter(timeout=1.0):
+            arrivals.append((printer.name, loop.time() - started))
+        assert [name for name, _ in arrivals] == ["Klipper", "Octo"]
+        assert arrivals[0][1] < 0.25
+        assert set(agent.printers) == {"10.0.0.2", "10.0.0.3"}
+
+    @pytest.mark.asyncio
+    async def test_probes_run_concurrently_under_cap(self, fake_mdns):
+        for i in range(6):
+            fake_mdns.append((0.0, Printer(f"http-{i}", f"10.0.1.{i}", 80, PrinterType.UNKNOWN)))
+        # The same host announced again on another service is probed once
+        fake_mdns.append((0.0, Printer("http-0 again", "10.0.1.0", 80, PrinterType.UNKNOWN)))
+        agent = PrinterAgent(discovery_cache_path=None)
+        active, peak, probed = 0, 0, []
+
+        async def slow_probe(host, port):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            probed.append(host)
+            await asyncio.sleep(0.1)
+            active -= 1
+            return PrinterType.OCTOPRINT
+
+        async def no_camera(host, port):
+            return None
+
+        agent._probe_printer_type = slow_probe
+        agent._probe_camera = no_camera
+        printers = [p async for p in agent.discover_printers_iter(timeout=0.3, max_concurrency=3)]
+        assert len(printers) == 6 and all(p.printer_type == PrinterType.OCTOPRINT for p in printers)
+        assert sorted(probed) == sorted(f"10.0.1.{i}" for i in range(6))
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_settle_returns_before_timeout(self, fake_mdns):
+        fake_mdns.append((0.01, Printer("Klipper", "10.0.0.2", 7125, PrinterType.MOONRAKER)))
+        agent = PrinterAgent(discovery_cache_path=None)
+
+        async def no_camera(host, port):
+            return None
+
+        agent._probe_camera = no_camera
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        printers = await agent.discover_printers(timeout=5.0, settle=0.2)
+        assert [p["name"] for p in printers] == ["Klipper"]
+        assert loop.time() - started < 1.0
+
+    @pytest.mark.asyncio
+    async def test_early_close_waits_for_cancelled_tasks(self, fake_mdns, monkeypatch):
+        import printer_agent
+
+        closed = []
+        monkeypatch.setattr(FakeZeroconf, "close", lambda self: closed.append(True))
+        fake_mdns.append((0.01, Printer("Klipper", "10.0.0.2", 7125, PrinterType.MOONRAKER)))
+        fake_mdns.append((0.01, Printer("slow", "10.0.0.3", 80, PrinterType.UNKNOWN)))
+        agent = PrinterAgent(discovery_cache_path=None)
+        probing = asyncio.Event()
+
+        async def hanging_probe(host, port):
+            probing.set()
+            await asyncio.sleep(60)
+
+        async def no_camera(host, port):
+            return None
+
+        agent._probe_printer_type = hanging_probe
+        agent._probe_camera = no_camera
+        results = agent.discover_printers_iter(timeout=5.0)
+        assert (await results.__anext__()).name == "Klipper"
+        await probing.wait()
+        await results.aclose()
+        # Nothing keeps running once the iterator is closed
+        assert closed == [True]
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        assert all(t.done() for t in others)
+
+    @pytest.mark.asyncio
+    async def test_probe_endpoints_against_local_server(self):
+        from aiohttp import web
+
+        async def info(request):
+            return web.json_response({"result": {"hostname": "k1"}})
+
+        async def stream(request):
+            return web.Response(body=b"--frame", content_type="multipart/x-mixed-replace")
+
+        app = web.Application()
+        app.router.add_get("/printer/info", info)
+        app.router.add_get("/webcam/stream", stream)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        agent = PrinterAgent()
+        try:
+            assert await agent._probe_printer_type("127.0.0.1", port) == PrinterType.MOONRAKER
+            assert await agent._probe_camera("127.0.0.1", port) == f"http://127.0.0.1:{port}/webcam/stream"
+        finally:
+            await agent.close()
+            await runner.cleanup()
+
+
+
+def cached_entry(name, host, port, printer_type, camera_url=None, verified_ago=0.0):
+    import time
+    now = time.time()
+    return {"name": name, "host": host, "port": port, "printer_type": printer_type,
+            "camera_url": camera_url, "last_seen": now, "verified": now - verified_ago}
+
+
+class TestDiscoveryCache:
+    """Test that known printers come from the cache and are only re-probed when stale."""
+
+    def write_cache(self, path, *entries):
+        import json
+        from printer_agent import DiscoveryCache
+        with open(path, "w") as f:
+            json.dump({DiscoveryCache.key(e["host"], e["port"], e["name"]): e for e in entries}, f)
+
+    @pytest.mark.asyncio
+    async def test_restore_at_startup(self, tmp_path):
+        path = str(tmp_path / "printer_cache.json")
+        self.write_cache(path,
+                         cached_entry("K1", "10.0.0.2", 7125, "moonraker", "http://10.0.0.2/webcam/stream"),
+                         cached_entry("Old", "10.0.0.3", 80, "octoprint", verified_ago=3 * 24 * 3600),
+                         dict(cached_entry("Gone", "10.0.0.4", 80, "octoprint"), last_seen=0))
+        agent = PrinterAgent(discovery_cache_path=path)
+        reprobed = []
+
+        async def probe(printer):
+            reprobed.append(printer.host)
+            printer.printer_type = PrinterType.OCTOPRINT
+
+        agent._identify_printer = probe
+        agent.add_printer_manually("Saved K1", "10.0.0.2", port=7125, printer_type="moonraker")
+        restored = agent.restore_cached_printers()
+        # Settings win; entries not seen for a month were dropped on load
+        assert [p.name for p in restored] == ["Old"]
+        assert agent.printers["10.0.0.2"].name == "Saved K1"
+        assert agent.printers["10.0.0.2"].camera_url == "http://10.0.0.2/webcam/stream"
+        await asyncio.gather(*agent._revalidations.values())
+        assert reprobed == ["10.0.0.3"]
+        await agent.close()
+
+    @pytest.mark.asyncio
+    async def test_discovery_skips_probes_for_cached_hosts(self, fake_mdns, tmp_path):
+        path = str(tmp_path / "cache.json")
+        self.write_cache(path,
+                         cached_entry("k1", "10.0.0.2", 80, "moonraker", "http://10.0.0.2/webcam/stream"),
+                         cached_entry("octo", "10.0.0.3", 80, "octoprint", verified_ago=3 * 24 * 3600))
+        fake_mdns.append((0.0, Printer("k1", "10.0.0.2", 80, PrinterType.UNKNOWN)))
+        fake_mdns.append((0.0, Printer("octo", "10.0.0.3", 80, PrinterType.UNKNOWN)))
+        fake_mdns.append((0.0, Printer("new", "10.0.0.5", 80, PrinterType.UNKNOWN)))
+        agent = PrinterAgent(discovery_cache_path=path)
+        probed = []
+
+        async def probe_type(host, port):
+            probed.append(host)
+            return PrinterType.OCTOPRINT
+
+        async def no_camera(host, port):
+            return None
+
+        agent._probe_printer_type = probe_type
+        agent._probe_camera = no_camera
+        printers = {p.host: p async for p in agent.discover_printers_iter(timeout=0.5)}
+        assert printers["10.0.0.2"].printer_type == PrinterType.MOONRAKER
+        assert printers["10.0.0.2"].camera_url == "http://10.0.0.2/webcam/stream"
+        # Only the new host was probed inline; the stale one is re-verified in the background
+        await asyncio.gather(*agent._revalidations.values())
+        assert sorted(probed) == ["10.0.0.3", "10.0.0.5"]
+
+        reloaded = PrinterAgent(discovery_cache_path=path).discovery_cache
+        assert reloaded.get("10.0.0.5", 80, "new")["printer_type"] == "octoprint"
+        assert reloaded.is_fresh(reloaded.get("10.0.0.3", 80, "octo"))
+        await agent.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_probe_is_retried_next_discovery(self, fake_mdns, tmp_path):
+        path = str(tmp_path / "cache.json")
+        # An unidentified entry written by an older version is neither restored nor trusted
+        self.write_cache(path, cached_entry("old", "10.0.0.6", 80, "unknown"))
+        fake_mdns.append((0.0, Printer("new", "10.0.0.5", 80, PrinterType.UNKNOWN)))
+        fake_mdns.append((0.0, Printer("old", "10.0.0.6", 80, PrinterType.UNKNOWN)))
+        agent = PrinterAgent(discovery_cache_path=path)
+        assert agent.restore_cached_printers() == []
+        probed = []
+        answers = {"10.0.0.5": PrinterType.UNKNOWN, "10.0.0.6": PrinterType.UNKNOWN}
+
+        async def probe_type(host, port):
+            probed.append(host)
+            return answers[host]
+
+        async def no_camera(host, port):
+            return None
+
+        agent._probe_printer_type = probe_type
+        agent._probe_camera = no_camera
+        [p async for p in agent.discover_printers_iter(timeout=0.3)]
+        assert sorted(probed) == ["10.0.0.5", "10.0.0.6"]
+        assert agent.discovery_cache.get("10.0.0.5", 80, "new") is None
+
+        # The printer comes online: the next discovery probes it again and caches it
+        answers["10.0.0.5"] = PrinterType.MOONRAKER
+        fake_mdns[:] = [(0.0, Printer("new", "10.0.0.5", 80, PrinterType.UNKNOWN))]
+        import printer_agent
+        printer_agent.ServiceBrowser.started = False
+        printers = {p.host: p async for p in agent.discover_printers_iter(timeout=0.3)}
+        assert printers["10.0.0.5"].printer_type == PrinterType.MOONRAKER
+        assert probed.count("10.0.0.5") == 2
+        assert agent.discovery_cache.get("10.0.0.5", 80, "new")["printer_type"] == "moonraker"
+        await agent.close()
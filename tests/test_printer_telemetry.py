@@ -0,0 +1,223 @@
+"""
+Tests for push-based printer telemetry, against a local stand-in Moonraker server.
+"""
+import asyncio
+
+import pytest
+from aiohttp import WSMsgType, web
+
+from printer_agent import PrinterAgent, PrintStatus
+from printer_telemetry import PrinterTelemetry
+
+INITIAL_STATUS = {
+    "print_stats": {"state": "printing", "filename": "part.gcode", "print_duration": 60},
+    "display_status": {"progress": 0.1},
+    "extruder": {"temperature": 210.0, "target": 210.0},
+    "heater_bed": {"temperature": 60.0, "target": 60.0},
+}
+
+
+class FakeMoonraker:
+    """Answers printer.objects.subscribe and lets the test push notify_status_update messages."""
+
+    def __init__(self):
+        self.sockets = []
+        self.subscribed = asyncio.Event()
+        self.http_queries = 0
+        self.runner = None
+        self.port = None
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            data = msg.json()
+            if data.get("method") == "printer.objects.subscribe":
+                assert set(data["params"]["objects"]) == set(INITIAL_STATUS)
+                await ws.send_json({"jsonrpc": "2.0", "id": data["id"],
+                                    "result": {"eventtime": 1.0, "status": INITIAL_STATUS}})
+                self.subscribed.set()
+        return ws
+
+    async def query(self, request):
+        self.http_queries += 1
+        return web.json_response({"result": {"status": INITIAL_STATUS}})
+
+    async def notify(self, delta):
+        await self.sockets[-1].send_json({"jsonrpc": "2.0", "method": "notify_status_update", "params": [delta, 2.0]})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/websocket", self.websocket)
+        app.router.add_get("/printer/objects/query", self.query)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for ws in self.sockets:
+            await ws.close()
+        await self.runner.cleanup()
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def moonraker():
+    server = FakeMoonraker()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+class TestMoonrakerTelemetry:
+    """Test the websocket subscription, delta merging and change-only publishing."""
+
+    @pytest.mark.asyncio
+    async def test_deltas(self, moonraker):
+        agent = PrinterAgent()
+        agent.add_printer_manually("Klipper", "127.0.0.1", port=moonraker.port, printer_type="moonraker")
+        sent = []
+
+        async def on_status(status):
+            sent.append(status)
+
+        telemetry = PrinterTelemetry(agent, on_status)
+        try:
+            await telemetry.tick()
+            await asyncio.wait_for(moonraker.subscribed.wait(), 5)
+            await wait_for(lambda: telemetry.subscriptions["127.0.0.1"].connected and sent)
+            assert sent[-1]["state"] == "printing"
+            assert sent[-1]["temperatures"]["hotend"]["current"] == 210.0
+
+            # A delta only carries the changed fields; the rest comes from the snapshot
+            count = len(sent)
+            await moonraker.notify({"extruder": {"temperature": 212.5}})
+            await wait_for(lambda: len(sent) > count)
+            assert sent[-1]["temperatures"]["hotend"] == {"current": 212.5, "target": 210.0}
+            assert sent[-1]["filename"] == "part.gcode"
+
+            # Nothing changed: nothing is published
+            count = len(sent)
+            await moonraker.notify({"extruder": {"temperature": 212.5}})
+            await moonraker.notify({"display_status": {"progress": 0.5}})
+            await wait_for(lambda: len(sent) > count)
+            assert len(sent) == count + 1 and sent[-1]["progress_percent"] == 50
+
+            # While subscribed, ticks do not poll over HTTP
+            queries = moonraker.http_queries
+            for _ in range(3):
+                await telemetry.tick()
+            assert moonraker.http_queries == queries
+            assert telemetry.latest() == [sent[-1]]
+
+            # Pushed statuses are shared with get_print_status callers: no HTTP request
+            status = await agent.get_print_status("Klipper", max_age=5.0)
+            assert status.progress_percent == 50
+            assert moonraker.http_queries == queries
+        finally:
+            await telemetry.close()
+            await agent.close()
+
+    @pytest.mark.asyncio
+    async def test_burst_is_merged_into_one_publish(self, moonraker):
+        agent = PrinterAgent()
+        agent.add_printer_manually("Klipper", "127.0.0.1", port=moonraker.port, printer_type="moonraker")
+        sent = []
+
+        async def on_status(status):
+            sent.append(status)
+
+        telemetry = PrinterTelemetry(agent, on_status, min_interval=0.3)
+        try:
+            await telemetry.tick()
+            await wait_for(lambda: sent)
+            count = len(sent)
+            for i in range(10):
+                await moonraker.notify({"extruder": {"temperature": 200.0 + i}})
+            await wait_for(lambda: len(sent) > count)
+            await asyncio.sleep(0.4)
+            # One publish, holding the newest values
+            assert len(sent) == count + 1
+            assert sent[-1]["temperatures"]["hotend"]["current"] == 209.0
+
+            # A state change is not held back
+            count = len(sent)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await moonraker.notify({"print_stats": {"state": "paused"}})
+            await wait_for(lambda: len(sent) > count)
+            assert sent[-1]["state"] == "paused"
+            assert loop.time() - started < 0.2
+        finally:
+            await telemetry.close()
+            await agent.close()
+
+    @pytest.mark.asyncio
+    async def test_removed_printer_unsubscribes(self, moonraker):
+        agent = PrinterAgent()
+        agent.add_printer_manually("Klipper", "127.0.0.1", port=moonraker.port, printer_type="moonraker")
+
+        async def on_status(status):
+            pass
+
+        telemetry = PrinterTelemetry(agent, on_status)
+        try:
+            await telemetry.tick()
+            await asyncio.wait_for(moonraker.subscribed.wait(), 5)
+            agent.printers.clear()
+            await telemetry.tick()
+            assert telemetry.subscriptions == {}
+        finally:
+            await telemetry.close()
+            await agent.close()
+
+
+class TestPolling:
+    """Test HTTP polling of printers without a websocket, paced by the agent's StatusScheduler."""
+
+    @pytest.mark.asyncio
+    async def test_polls_when_due_and_publishes_changes(self):
+        agent = PrinterAgent()
+        agent.add_printer_manually("Octo", "10.0.0.9", port=80, printer_type="octoprint")
+        states = iter(["printing", "printing", "operational"])
+        sent = []
+
+        async def fake_status(printer):
+            return PrintStatus(printer="Octo", state=next(states), progress_percent=0,
+                               time_remaining=None, time_elapsed=None, filename=None)
+
+        async def on_status(status):
+            sent.append(status)
+
+        agent._status_octoprint = fake_status
+        telemetry = PrinterTelemetry(agent, on_status)
+        await telemetry.tick()
+        await telemetry._polls["10.0.0.9"]
+
+        # Not due yet: no new poll
+        await telemetry.tick()
+        assert telemetry._polls["10.0.0.9"].done()
+
+        # Same status again is not re-sent
+        agent.status_scheduler._fetched_at["10.0.0.9"] -= 60
+        await telemetry.tick()
+        await telemetry._polls["10.0.0.9"]
+        assert len(sent) == 1
+
+        agent.status_scheduler._fetched_at["10.0.0.9"] -= 60
+        await telemetry.tick()
+        await telemetry._polls["10.0.0.9"]
+        assert [s["state"] for s in sent] == ["printing", "operational"]
+        await telemetry.close()
+        await agent.close()
@@ -20,6 +20,22 @@ MODULES = {
     "web": "test_web_agent.py",
     "auth": "test_authenticator.py",
     "tools": "test_ada_tools.py",
+    "vad": "test_audio_vad.py",
+    "visualizer": "test_audio_visualizer.py",
+    "audio_io": "test_audio_io.py",
+    "executors": "test_executors.py",
+    "cad_runner": "test_cad_runner.py",
+    "cad_pool": "test_cad_worker_pool.py",
+    "cad_cache": "test_cad_cache.py",
+    "artifacts": "test_artifact_store.py",
+    "mesh": "test_mesh_tools.py",
+    "cad_preflight": "test_cad_preflight.py",
+    "cad_stream": "test_cad_stream.py",
+    "designs": "test_design_store.py",
+    "cad_params": "test_cad_params.py",
+    "telemetry": "test_printer_telemetry.py",
+    "slicer_profiles": "test_slicer_profiles.py",
+    "gcode_cache": "test_gcode_cache.py",
 }
 
 TESTS_DIR = Path(__file__).parent
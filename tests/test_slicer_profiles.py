@@ -0,0 +1,161 @@
+"""
+Tests for the persisted OrcaSlicer profile index, against a small fake profile tree.
+"""
+import json
+import os
+
+import pytest
+
+from slicer_profiles import ProfileIndex, score_profile, tokenize
+
+PROFILES = {
+    ("Creality", "machine"): {
+        "fdm_creality_common": {"instantiation": "false"},
+        "Creality K1 (0.4 nozzle)": {"inherits": "fdm_creality_common"},
+        "Creality K1C 0.4 nozzle": {"inherits": "fdm_creality_common"},
+        "Creality Ender-3 V3 (0.4 nozzle)": {"inherits": "fdm_creality_common"},
+    },
+    ("Creality", "process"): {
+        "fdm_process_common": {"instantiation": "false"},
+        "0.20mm Standard @Creality K1 (0.4 nozzle)": {"inherits": "fdm_process_common"},
+        "0.12mm Fine @Creality K1 (0.4 nozzle)": {"inherits": "fdm_process_common"},
+    },
+    ("Creality", "filament"): {
+        "Generic PLA @K1": {"inherits": "Generic PLA @base"},
+        "Generic PLA Silk @K1": {"inherits": "Generic PLA @base"},
+    },
+    ("OrcaFilamentLibrary", "filament"): {
+        "Generic PLA @base": {"instantiation": "false"},
+    },
+    ("Voron", "machine"): {
+        "Voron 2.4 300 0.4 nozzle": {},
+    },
+}
+
+
+def write_profile(orca_dir, vendor, profile_type, name, fields):
+    folder = orca_dir / "system" / vendor / profile_type
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / f"{name}.json").write_text(json.dumps({"name": name, **fields}))
+
+
+@pytest.fixture
+def orca_dir(tmp_path):
+    root = tmp_path / "OrcaSlicer"
+    for (vendor, profile_type), profiles in PROFILES.items():
+        for name, fields in profiles.items():
+            write_profile(root, vendor, profile_type, name, fields)
+    return root
+
+
+@pytest.fixture
+def index(orca_dir, tmp_path):
+    return ProfileIndex(str(orca_dir), str(tmp_path / "index.json"))
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+class TestProfileIndex:
+    """Test listing, matching and inheritance from the index."""
+
+    def test_tokenize(self):
+        assert tokenize("Creality K1 (0.4 nozzle)") == {"creality", "k1", "0.4", "nozzle"}
+
+    def test_available(self, index):
+        profiles = index.available()
+        assert "system/Creality/machine/Creality K1 (0.4 nozzle).json" in profiles["machines"]
+        assert len(profiles["processes"]) == 3
+        assert len(profiles["filaments"]) == 3
+
+    def test_match_prefers_exact_model(self, index, orca_dir):
+        path, score = index.match("Creality K1", "machine")
+        assert path == str(orca_dir / "system" / "Creality" / "machine" / "Creality K1 (0.4 nozzle).json")
+        assert score == score_profile("Creality K1 (0.4 nozzle).json", ["creality", "k1"], "machine")
+
+    def test_match_process_and_filament(self, index):
+        assert os.path.basename(index.match("Creality K1", "process")[0]).startswith("0.20mm Standard")
+        assert os.path.basename(index.match("Creality K1", "filament")[0]) == "Generic PLA @K1.json"
+
+    def test_match_skips_base_profiles(self, index):
+        path, _ = index.match("fdm creality common", "machine")
+        assert "fdm_creality_common" not in path
+
+    def test_vendor_named_in_printer_name(self, index):
+        assert index.detect_vendor("Voron 2.4") == "Voron"
+        assert index.detect_vendor("ender3") == "Creality"
+        assert "Voron 2.4" in index.match("Voron 2.4", "machine")[0]
+
+    def test_no_token_overlap_falls_back_to_vendor_profiles(self, index):
+        path, _ = index.match("Workshop", "process")
+        assert "Standard" in path
+
+    def test_inheritance(self, index, orca_dir):
+        path, _ = index.match("Creality K1", "filament")
+        chain = index.inheritance(path)
+        assert [os.path.basename(p) for p in chain] == ["Generic PLA @K1.json", "Generic PLA @base.json"]
+        assert "OrcaFilamentLibrary" in chain[1]
+
+    def test_no_orca_dir(self, tmp_path):
+        index = ProfileIndex(None, str(tmp_path / "index.json"))
+        assert index.available() == {"machines": [], "processes": [], "filaments": []}
+        assert index.match("Creality K1", "machine") is None
+
+
+class TestPersistence:
+    """Test that the index is reused from disk and re-reads only changed folders."""
+
+    def test_reloaded_without_reading_profiles(self, index, orca_dir, tmp_path, monkeypatch):
+        index.refresh()
+        assert os.path.exists(tmp_path / "index.json")
+
+        import slicer_profiles
+        reads = []
+        monkeypatch.setattr(slicer_profiles, "_read_profile", lambda path: reads.append(path))
+        reopened = ProfileIndex(str(orca_dir), str(tmp_path / "index.json"))
+        assert reopened.refresh() is False
+        assert reads == []
+        assert reopened.match("Creality K1", "machine") is not None
+
+    def test_changed_folder_is_rescanned(self, index, orca_dir, tmp_path):
+        index.refresh()
+        write_profile(orca_dir, "Creality", "machine", "Creality K2 Plus (0.4 nozzle)", {})
+        bump_mtime(orca_dir / "system" / "Creality" / "machine")
+
+        reopened = ProfileIndex(str(orca_dir), str(tmp_path / "index.json"))
+        assert reopened.refresh() is True
+        assert "K2 Plus" in reopened.match("Creality K2 Plus", "machine")[0]
+
+    def test_check_interval_throttles_refresh(self, orca_dir, tmp_path):
+        index = ProfileIndex(str(orca_dir), str(tmp_path / "index.json"), check_interval=3600)
+        index.refresh()
+        write_profile(orca_dir, "Voron", "machine", "Voron Trident 250 0.4 nozzle", {})
+        bump_mtime(orca_dir / "system" / "Voron" / "machine")
+        assert index.refresh() is False
+        assert index.refresh(force=True) is True
+
+    def test_removed_vendor_dropped(self, index, orca_dir):
+        index.refresh()
+        for name in PROFILES[("Voron", "machine")]:
+            os.remove(orca_dir / "system" / "Voron" / "machine" / f"{name}.json")
+        os.rmdir(orca_dir / "system" / "Voron" / "machine")
+        os.rmdir(orca_dir / "system" / "Voron")
+        assert index.refresh(force=True) is True
+        assert "Voron" not in index.vendors()
+
+
+class TestPrinterAgentProfiles:
+    """Test that PrinterAgent answers profile queries from the index."""
+
+    def test_profiles_for_printer(self, orca_dir, tmp_path, monkeypatch):
+        from printer_agent import PrinterAgent
+
+        monkeypatch.setattr(PrinterAgent, "_detect_orca_profiles_dir", lambda self: str(orca_dir))
+        agent = PrinterAgent(profiles_dir=str(tmp_path / "profiles"), discovery_cache_path=None,
+                             profile_index_path=str(tmp_path / "index.json"))
+        profiles = agent.get_profiles_for_printer("Creality K1")
+        assert os.path.basename(profiles["machine"]) == "Creality K1 (0.4 nozzle).json"
+        assert os.path.basename(profiles["filament"]) == "Generic PLA @K1.json"
+        assert len(agent.get_available_profiles()["machines"]) == 5